@@ -15,6 +15,9 @@ See the License for the specific language governing permissions and limitations
 import ElGamal as eg
 import Redis
 import ast
+import Utils
+
+Utils.configureLogging()
 
 RCh = Redis.RedisChannel()
 print("Alice creates her ElGamal Keys: ")
@@ -29,4 +32,4 @@ print('Alice encrypts her message:')
 encrypted = AliceElGamal.encrypt(data=plainText, receiverPubKey=BobPubKey)
 print(encrypted)
 print('Alice sends her message.')
-RCh.redisPublish(str(encrypted))
+RCh.redisPublish(encrypted.toBytes())
@@ -0,0 +1,350 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# Mersenne primes of increasing size.
+PRIMES = {
+    31: 2 ** 31 - 1,
+    61: 2 ** 61 - 1,
+    127: 2 ** 127 - 1,
+    521: 2 ** 521 - 1,
+    1279: 2 ** 1279 - 1,
+    2203: 2 ** 2203 - 1,
+}
+ORDER_BITS = [256, 512, 1024, 2048]  # Sizes of the primes with known p - 1 factorization.
+ENTRY_POINTS = {  # The modules imported by each process.
+    'Alice.py': ['ElGamal', 'Redis', 'ast', 'Utils'],
+    'Bob.py': ['ElGamal', 'Redis', 'Utils'],
+    'Eve.py': ['ElGamal', 'Redis', 'ast', 'IndexCalculusDiscreteLogSolver', 'Utils'],
+    'EveWorker.py': ['Redis', 'IndexCalculusDiscreteLogSolver.Distributed', 'Utils'],
+}
+INDEX_CALCULUS_CASES = [  # (a, b, p): a^(x) = b (mod p), with x = 3, 20, 30, then 20 for p of 20, 24 and 28 bits.
+    (7, 343, 15485863),
+    (45, 2930230, 15485863),
+    (1520, 15203215, 15485863),
+    (2, 3, 1048573),
+    (5, 15141779, 16777213),
+    (5, 130371168, 268435367),
+]
+
+
+def measureImportTime(modules):
+    '''
+    Imports modules in a fresh interpreter with -X importtime.
+    :param modules: list of strings; the modules to import.
+    :return: integer; the cumulative import time of the top level imports, in microseconds.
+    '''
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+                               capture_output=True, text=True, check=True)
+    total = 0
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not name[1:].startswith(' '):  # Not nested in another import.
+            total += int(cumulative)
+    return total
+
+
+def measure(function, repeat=5, number=1):
+    '''
+    Times function.
+    :param function: callable without arguments.
+    :param repeat: integer; the number of samples.
+    :param number: integer; the number of calls in each sample.
+    :return: dict; min, median and mean seconds per call.
+    '''
+    samples = []
+    for _ in range(0, repeat):
+        start = time.perf_counter()
+        for _ in range(0, number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return {'min': min(samples), 'median': statistics.median(samples), 'mean': statistics.mean(samples),
+            'repeat': repeat, 'number': number}
+
+
+class BenchmarkSuite:
+    '''
+    Reproducible benchmarks of the ElGamal, IndexCalculus and Redis paths.
+    Every benchmark reseeds the random module and the Utils.Random pool, so the same seed always measures the same
+    inputs.
+    '''
+    __seed = None
+    __quick = None
+    __results = None
+
+    def __init__(self, seed=0, quick=False):
+        '''
+        :param seed: integer; the seed of the random module.
+        :param quick: boolean; if True, fewer sizes and samples are measured.
+        '''
+        assert isinstance(seed, int)
+        self.__seed = seed
+        self.__quick = quick
+        self.__results = []
+
+    def getResults(self):
+        return self.__results
+
+    def record(self, name, params, stats):
+        '''
+        :param name: string; the benchmark name.
+        :param params: dict; the benchmark parameters.
+        :param stats: dict; the measure() result.
+        :return:
+        '''
+        self.__results.append({'name': name, 'params': params, 'stats': stats})
+        print(name + ' ' + json.dumps(params) + ': ' + '{:.6f}'.format(stats['median']) + ' s', file=sys.stderr)
+
+    def reseed(self):
+        from Utils import Random
+        random.seed(self.__seed)
+        Random.setDefault(Random.EntropyPool(seed=self.__seed))  # Keys and ephemeral k are reproducible too.
+
+    def getRepeat(self):
+        return 3 if self.__quick else 7
+
+    def getBitSizes(self):
+        return [31, 127, 521] if self.__quick else sorted(PRIMES.keys())
+
+    def benchmarkKeyGeneration(self):
+        import ElGamal
+        keys = ElGamal.ElGamalKeyPair(pBounds=[16777259, 16777259 + 1000])
+        for bits in self.getBitSizes():
+            self.reseed()
+            p = PRIMES[bits]
+            self.record('keygen', {'bits': bits}, measure(lambda: keys.generate(p), repeat=self.getRepeat()))
+
+    def benchmarkEncryption(self):
+        import ElGamal
+        self.reseed()
+        elGamal = ElGamal.ElGamalEncryption(keyBounds=[16777259, 16777259 + 1000])
+        elGamal.getKeys().generate(PRIMES[61])
+        publicKey = elGamal.getKeys().getPublicKey()
+        sizes = [30, 3000] if self.__quick else [30, 3000, 30000, 300000]
+        for size in sizes:
+            self.reseed()
+            text = ''.join(chr(random.randint(32, 126)) for _ in range(0, size))
+            stats = measure(lambda: elGamal.encrypt(data=text, receiverPubKey=publicKey), repeat=self.getRepeat())
+            stats['bytesPerSecond'] = size / stats['median']
+            self.record('encrypt', {'bits': 61, 'size': size}, stats)
+            r, tVector = elGamal.encrypt(data=text, receiverPubKey=publicKey)
+            stats = measure(lambda: elGamal.decrypt(r=r, tVector=list(tVector)), repeat=self.getRepeat())
+            stats['bytesPerSecond'] = size / stats['median']
+            self.record('decrypt', {'bits': 61, 'size': size}, stats)
+
+    def benchmarkParallelEncryption(self):
+        import os
+        import ElGamal
+        self.reseed()
+        workers = os.cpu_count() or 1
+        keys = ElGamal.ElGamalKeyPair(pBounds=[16777259, 16777259 + 1000])
+        publicKey = keys.getPublicKey()
+        size = 300000 if self.__quick else 3000000
+        data = bytes(random.getrandbits(8) for _ in range(0, size))
+        for n in sorted({1, workers}):
+            elGamal = ElGamal.ElGamalEncryption(keys=(publicKey, keys.getPrivateKey()), workers=n,
+                                                parallelThreshold=1000)
+            ciphertext = elGamal.encryptBytes(data, publicKey)  # Also starts the pool.
+            stats = measure(lambda: elGamal.encryptBytes(data, publicKey), repeat=self.getRepeat())
+            stats['bytesPerSecond'] = size / stats['median']
+            self.record('encryptBytes', {'bits': publicKey.getBitLength(), 'size': size, 'workers': n}, stats)
+            stats = measure(lambda: elGamal.decryptBytes(ciphertext, size), repeat=self.getRepeat())
+            stats['bytesPerSecond'] = size / stats['median']
+            self.record('decryptBytes', {'bits': publicKey.getBitLength(), 'size': size, 'workers': n}, stats)
+            elGamal.close()
+
+    def benchmarkHomomorphic(self):
+        import ElGamal
+        size = 3000
+        count = 10 if self.__quick else 100
+        for bits in (31, 127):
+            self.reseed()
+            keys = ElGamal.ElGamalKeyPair(pBounds=[16777259, 16777259 + 1000])
+            keys.generate(PRIMES[bits])
+            publicKey = keys.getPublicKey()
+            elGamal = ElGamal.ElGamalEncryption(keys=(publicKey, keys.getPrivateKey()))
+            relay = ElGamal.ElGamalEncryption(keys=(publicKey, None))
+            data = bytes(random.getrandbits(8) for _ in range(0, size))
+            batch = [elGamal.encryptBytes(data, publicKey) for _ in range(0, count)]
+            params = {'bits': bits, 'size': size, 'ciphertexts': count}
+            self.record('homomorphic.rerandomize', params,
+                        measure(lambda: relay.rerandomizeBatch(batch, publicKey), repeat=self.getRepeat()))
+            pairs = list(zip(batch, reversed(batch)))
+            self.record('homomorphic.multiply', params,
+                        measure(lambda: relay.multiplyCiphertextsBatch(pairs, publicKey), repeat=self.getRepeat()))
+            self.record('homomorphic.decryptAndEncrypt', params,
+                        measure(lambda: [elGamal.encryptBytes(elGamal.decryptBytes(ciphertext, size), publicKey)
+                                         for ciphertext in batch], repeat=self.getRepeat()))
+
+    def benchmarkModularArithmetics(self):
+        from Utils import ModularArithmetics
+        ma = ModularArithmetics()
+        for bits in self.getBitSizes():
+            self.reseed()
+            p = PRIMES[bits]
+            a = random.randint(2, p - 2)
+            e = random.randint(2, p - 2)
+            self.record('modularPower', {'bits': bits},
+                        measure(lambda: ma.modularPower(a=a, e=e, m=p), repeat=self.getRepeat(), number=10))
+            self.record('modularInverse', {'bits': bits},
+                        measure(lambda: ma.modularInverse(a=a, m=p), repeat=self.getRepeat(), number=10))
+
+    def benchmarkIndexCalculus(self):
+        import IndexCalculusDiscreteLogSolver as IC
+        cases = INDEX_CALCULUS_CASES[0:1] if self.__quick else INDEX_CALCULUS_CASES
+        for a, b, p in cases:
+            for r in ([20] if self.__quick else [20, 30]):
+                self.reseed()
+                params = {'a': a, 'b': b, 'p': p, 'bits': p.bit_length(), 'r': r}
+                ic = IC.IndexCalculus(a, b, p)
+                state = {}
+
+                def relations():
+                    state['m'], state['base'] = ic.generateCongruencesMatrix(r)
+
+                def linearAlgebra():
+                    m = [list(row) for row in state['m']]
+                    state['base2'] = list(state['base'])
+                    state['logs'] = ic.computeLogarithms(m=m, base=state['base2'])
+
+                def descent():
+                    # Bigger p need more rounds to find a smooth b * a^(l); the search stops at the first one.
+                    ic.findIndividualLog(base=state['base2'], primesLogarithms=list(state['logs']), maxRounds=20000)
+
+                self.record('indexCalculus.relations', params, measure(relations, repeat=self.getRepeat()))
+                self.record('indexCalculus.linearAlgebra', params, measure(linearAlgebra, repeat=self.getRepeat()))
+                self.record('indexCalculus.descent', params, measure(descent, repeat=self.getRepeat()))
+
+    def benchmarkRandom(self):
+        import secrets
+        from Utils import Random
+        draws = 1000
+        for bits in self.getBitSizes():
+            self.reseed()
+            bound = PRIMES[bits] - 2
+            sources = [('urandom', Random.EntropyPool()), ('seeded', Random.EntropyPool(seed=self.__seed))]
+            for name, source in sources:
+                stats = measure(lambda: [source.randomInteger(2, bound) for _ in range(0, draws)],
+                                repeat=self.getRepeat())
+                stats['drawsPerSecond'] = draws / stats['median']
+                self.record('randomInteger', {'bits': bits, 'source': name}, stats)
+            source = Random.EntropyPool()
+            stats = measure(lambda: source.randomIntegers(2, bound, draws), repeat=self.getRepeat())
+            stats['drawsPerSecond'] = draws / stats['median']
+            self.record('randomInteger', {'bits': bits, 'source': 'urandom batch'}, stats)
+            baselines = [('secrets.randbelow', lambda: [2 + secrets.randbelow(bound - 1) for _ in range(0, draws)]),
+                         ('random.randint', lambda: [random.randint(2, bound) for _ in range(0, draws)])]
+            for name, function in baselines:
+                stats = measure(function, repeat=self.getRepeat())
+                stats['drawsPerSecond'] = draws / stats['median']
+                self.record('randomInteger', {'bits': bits, 'source': name}, stats)
+
+    def benchmarkOrder(self):
+        from Utils import Order
+        for bits in (ORDER_BITS[0:2] if self.__quick else ORDER_BITS):
+            self.reseed()
+            p = Order.generatePrime(bits)  # p - 1 = 2 * q1 * ... * qk: its (cached) factorization is known.
+            params = {'bits': bits, 'primeFactors': len(Order.groupOrderFactors(p)[0])}
+            # Key generation ends on a generator, which goes through every check (the worst case): a random a is
+            # mostly rejected by the first one, so the rejects are measured apart.
+            generator = 2
+            while not Order.isGenerator(generator, p):
+                generator += 1
+            candidates = [random.randint(2, p - 2) for _ in range(0, 100)]
+            rejects = [a for a in candidates if not Order.isGenerator(a, p)]
+            self.record('order.isGenerator', dict(params, a='generator'),
+                        measure(lambda: Order.isGenerator(generator, p), repeat=self.getRepeat()))
+            if rejects:
+                stats = measure(lambda: [Order.isGenerator(a, p) for a in rejects], repeat=self.getRepeat())
+                stats['perReject'] = stats['median'] / len(rejects)
+                stats['rejectRate'] = len(rejects) / len(candidates)
+                self.record('order.isGenerator', dict(params, a='reject'), stats)
+            self.record('order.multiplicativeOrder', dict(params, a='generator'),
+                        measure(lambda: Order.multiplicativeOrder(generator, p), repeat=self.getRepeat()))
+
+    def benchmarkImportTime(self):
+        for entryPoint in sorted(ENTRY_POINTS.keys()):
+            samples = [measureImportTime(ENTRY_POINTS[entryPoint]) / 1e6 for _ in range(0, self.getRepeat())]
+            self.record('importTime', {'entryPoint': entryPoint, 'modules': ENTRY_POINTS[entryPoint]},
+                        {'min': min(samples), 'median': statistics.median(samples),
+                         'mean': statistics.mean(samples), 'repeat': len(samples), 'number': 1})
+
+    def benchmarkRedis(self, host='127.0.0.1', port=6379):
+        import Redis
+        channel = Redis.RedisChannel(host=host, port=port, outChannel='BenchmarkChannel')
+        try:
+            channel.connect()
+        except Exception as exception:  # No server: the benchmark is recorded as skipped.
+            self.__results.append({'name': 'redis', 'params': {'host': host, 'port': port},
+                                   'skipped': str(exception)})
+            return
+        rc = channel.getRedisDirectly()
+        messages = 1000 if self.__quick else 10000
+        self.reseed()
+        payload = bytes(random.getrandbits(8) for _ in range(0, 256))
+
+        def publish():
+            for _ in range(0, messages):
+                channel.redisPublish(payload)
+
+        def pushAndConsume():
+            for _ in range(0, messages):
+                channel.addToRedisQueue('BenchmarkQueue', payload)
+            while channel.takeFromRedisQueue('BenchmarkQueue') is not None:
+                pass
+
+        stats = measure(publish, repeat=self.getRepeat())
+        stats['messagesPerSecond'] = messages / stats['median']
+        self.record('redis.publish', {'messages': messages, 'size': len(payload)}, stats)
+        stats = measure(pushAndConsume, repeat=self.getRepeat())
+        stats['messagesPerSecond'] = messages / stats['median']
+        self.record('redis.queue', {'messages': messages, 'size': len(payload)}, stats)
+        rc.delete('BenchmarkQueue')
+
+    def run(self, names=None):
+        '''
+        Runs the benchmarks.
+        :param names: list of strings [optional]; the benchmarks to run (default: all of them).
+        :return: dict; the JSON report.
+        '''
+        benchmarks = {
+            'keygen': self.benchmarkKeyGeneration,
+            'encryption': self.benchmarkEncryption,
+            'parallelEncryption': self.benchmarkParallelEncryption,
+            'homomorphic': self.benchmarkHomomorphic,
+            'modularArithmetics': self.benchmarkModularArithmetics,
+            'random': self.benchmarkRandom,
+            'order': self.benchmarkOrder,
+            'indexCalculus': self.benchmarkIndexCalculus,
+            'redis': self.benchmarkRedis,
+            'importTime': self.benchmarkImportTime,
+        }
+        for name in (names or list(benchmarks.keys())):
+            assert name in benchmarks, 'Unknown benchmark: ' + name
+            benchmarks[name]()
+        return {
+            'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'seed': self.__seed,
+                     'quick': self.__quick, 'timestamp': time.time()},
+            'results': self.__results,
+        }
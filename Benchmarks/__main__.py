@@ -0,0 +1,30 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import argparse
+import json
+from Benchmarks import BenchmarkSuite
+
+parser = argparse.ArgumentParser(prog='python -m Benchmarks', description='Runs the ElGamalRedis benchmarks.')
+parser.add_argument('names', nargs='*',
+                    help='the benchmarks to run: keygen, encryption, parallelEncryption, homomorphic, '
+                         'modularArithmetics, random, order, indexCalculus, redis, importTime (default: all)')
+parser.add_argument('--seed', type=int, default=0, help='seed of the random module and of the Utils.Random pool')
+parser.add_argument('--quick', action='store_true', help='fewer sizes and samples')
+parser.add_argument('--output', default='bench_output.json', help='the JSON results file')
+args = parser.parse_args()
+
+report = BenchmarkSuite(seed=args.seed, quick=args.quick).run(args.names)
+with open(args.output, 'w') as file:
+    json.dump(report, file, indent=2)
@@ -14,7 +14,9 @@ See the License for the specific language governing permissions and limitations
 # Dependencies
 import ElGamal as eg
 import Redis
-import ast
+import Utils
+
+Utils.configureLogging()
 
 RCh = Redis.RedisChannel()
 print("Bob creates his ElGamal Keys: ")
@@ -28,9 +30,7 @@ channelName = 'CommunicationChannel'
 pubsub.subscribe(channelName)
 for item in pubsub.listen():
     if item['type'] == 'message':
-        msg = ast.literal_eval(item['data'].decode('utf-8'))
+        msg = eg.Ciphertext.fromBytes(item['data'])
         print('Message arrived: ' + str(msg))
-        r = int(msg[0])
-        tVector = msg[1]
-        decodedText = BobElGamal.decrypt(r=r, tVector=tVector)
+        decodedText = BobElGamal.decrypt(msg)
         print('Decoded Text: ' + decodedText)
@@ -0,0 +1,160 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+from ElGamal import Ciphertext, ElGamalEncryption, PrivateKey, PublicKey
+from collections import deque
+import struct
+
+'''
+Streaming encryption of files with bounded memory: the input is read in fixed-size chunks, each chunk is encrypted
+with its own ephemeral k and written as a record as soon as it is ready.
+
+Stream format:
+    MAGIC, then one record per chunk: I: plain length (big endian), then Ciphertext.toBytes().
+'''
+
+MAGIC = b'EGR2'  # EGR1 streams held the raw 3 bytes values as blocks, before ElGamal.BLOCK_SPAN encoding.
+RECORD_HEADER = struct.Struct('>I')
+DEFAULT_CHUNK_SIZE = 3 * 21845  # A multiple of the 3 bytes block: only the last chunk is padded.
+
+workerState = {}  # Per-process ElGamalEncryption() instances, by key.
+
+
+def readChunks(inFile, chunkSize=DEFAULT_CHUNK_SIZE):
+    '''
+    :param inFile: binary file-like object.
+    :param chunkSize: integer.
+    :return: generator of bytes.
+    '''
+    assert isinstance(chunkSize, int)
+    assert chunkSize > 0
+    while True:
+        chunk = inFile.read(chunkSize)
+        if not chunk:
+            return
+        yield chunk
+
+
+def readRecords(inFile):
+    '''
+    :param inFile: binary file-like object, positioned after MAGIC.
+    :return: generator of (plain length, Ciphertext()).
+    '''
+    while True:
+        header = inFile.read(RECORD_HEADER.size + Ciphertext.HEADER.size)
+        if not header:
+            return
+        assert len(header) == RECORD_HEADER.size + Ciphertext.HEADER.size, 'Truncated stream.'
+        (length,) = RECORD_HEADER.unpack_from(header, 0)
+        width, blocks = Ciphertext.HEADER.unpack_from(header, RECORD_HEADER.size)
+        body = inFile.read(width * (blocks + 1))
+        assert len(body) == width * (blocks + 1), 'Truncated stream.'
+        yield length, Ciphertext.fromBytes(header[RECORD_HEADER.size:] + body)
+
+
+def getEncryption(publicKey, privateKey=None):
+    '''
+    :param publicKey: PublicKey().
+    :param privateKey: PrivateKey() [optional].
+    :return: ElGamalEncryption(); one per process and key, so the fixed-base tables are reused.
+    '''
+    key = (publicKey, privateKey.getE() if privateKey is not None else None)
+    encryption = workerState.get(key)
+    if encryption is None:
+        encryption = workerState[key] = ElGamalEncryption(keys=(publicKey, privateKey))
+    return encryption
+
+
+def encryptChunk(args):
+    '''
+    :param args: tuple (PublicKey(), bytes).
+    :return: bytes; the record.
+    '''
+    publicKey, chunk = args
+    ciphertext = getEncryption(publicKey).encryptBytes(chunk, publicKey)
+    return RECORD_HEADER.pack(len(chunk)) + ciphertext.toBytes()
+
+
+def decryptChunk(args):
+    '''
+    :param args: tuple (PublicKey(), PrivateKey(), plain length, Ciphertext()).
+    :return: bytes; the plain chunk.
+    '''
+    publicKey, privateKey, length, ciphertext = args
+    return getEncryption(publicKey, privateKey).decryptBytes(ciphertext, length)
+
+
+def pipeline(function, tasks, workers):
+    '''
+    Maps function over tasks, in order, keeping at most 2 * workers tasks in flight.
+    :param function: callable; a module level function (it is sent to the worker processes).
+    :param tasks: iterable.
+    :param workers: integer; 1 runs everything in this process.
+    :return: generator of results.
+    '''
+    if workers <= 1:
+        for task in tasks:
+            yield function(task)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(function, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def encryptStream(inFile, outFile, publicKey, chunkSize=DEFAULT_CHUNK_SIZE, workers=1):
+    '''
+    Encrypts inFile into outFile.
+    :param inFile: binary file-like object.
+    :param outFile: binary file-like object.
+    :param publicKey: PublicKey() or list of 3 integers: [p, a, b]; the public key of the receiver.
+    :param chunkSize: integer; the plain bytes in each record (rounded down to a multiple of 3).
+    :param workers: integer; the number of processes encrypting chunks.
+    :return: integer; the number of plain bytes.
+    '''
+    publicKey = PublicKey.fromList(publicKey)
+    chunkSize = max(3, chunkSize - chunkSize % 3)
+    total = 0
+    outFile.write(MAGIC)
+    tasks = ((publicKey, chunk) for chunk in readChunks(inFile, chunkSize))
+    for record in pipeline(encryptChunk, tasks, workers):
+        total += RECORD_HEADER.unpack_from(record, 0)[0]
+        outFile.write(record)
+    return total
+
+
+def decryptStream(inFile, outFile, publicKey, privateKey, workers=1):
+    '''
+    Decrypts a stream written by encryptStream.
+    :param inFile: binary file-like object.
+    :param outFile: binary file-like object.
+    :param publicKey: PublicKey() or list of 3 integers: [p, a, b].
+    :param privateKey: PrivateKey().
+    :param workers: integer; the number of processes decrypting chunks.
+    :return: integer; the number of plain bytes.
+    '''
+    assert isinstance(privateKey, PrivateKey)
+    publicKey = PublicKey.fromList(publicKey)
+    assert inFile.read(len(MAGIC)) == MAGIC, 'Not an ElGamal stream.'
+    total = 0
+    tasks = ((publicKey, privateKey, length, ciphertext) for length, ciphertext in readRecords(inFile))
+    for chunk in pipeline(decryptChunk, tasks, workers):
+        total += len(chunk)
+        outFile.write(chunk)
+    return total
@@ -13,6 +13,338 @@ See the License for the specific language governing permissions and limitations
 
 # Dependencies
 from Utils import ModularArithmetics
+import logging
+import struct
+from Metrics import REGISTRY as metrics
+
+logger = logging.getLogger(__name__)
+
+# Encoded block = (3 bytes value + 1) + BLOCK_SPAN * s, with a random s for each block: never 0 (0 * y = 0 (mod p)
+# would show in the ciphertext), equal groups give different blocks, and a known group (e.g. zero bytes) does not give
+# y away (up to one guess per possible s). Decoding is (block mod BLOCK_SPAN) - 1.
+BLOCK_SPAN = 2 ** 24 + 1
+
+
+def limbsNumpy(p):
+    '''
+    :param p: integer; the modulus.
+    :return: the numpy module if it is installed and products of two values (mod p) fit in 64 bits, None otherwise.
+    '''
+    if p.bit_length() > 31:
+        return None
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def unpackLimbs(numpy, data, width):
+    '''
+    :return: numpy.ndarray of int64; the values of the width bytes big endian limbs in data.
+    '''
+    limbs = numpy.zeros((len(data) // width, 8), dtype=numpy.uint8)
+    limbs[:, 8 - width:] = numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, width)
+    return limbs.view('>u8').ravel().astype(numpy.int64)
+
+
+def packLimbs(numpy, values, width):
+    '''
+    :return: bytes; values as width bytes big endian limbs.
+    '''
+    return values.astype('>u8').view(numpy.uint8).reshape(-1, 8)[:, 8 - width:].tobytes()
+
+
+def multiplyShard(args):
+    '''
+    Multiplies a shard of blocks by factor (mod p): the work unit of the parallel encryption and decryption.
+    With p below 2^31 the products fit in 64 bits, so NumPy (if installed) does the whole shard at once.
+    :param args: tuple (factor, p, width, blocks); blocks is a list of integers or bytes of width bytes limbs.
+    :return: bytes of width bytes limbs if blocks is a list, list of integers if blocks is bytes.
+    '''
+    factor, p, width, blocks = args
+    packed = isinstance(blocks, bytes)
+    numpy = limbsNumpy(p)
+    if numpy is not None:
+        if packed:
+            return (unpackLimbs(numpy, blocks, width) * factor % p).tolist()
+        return packLimbs(numpy, numpy.array(blocks, dtype=numpy.int64) * factor % p, width)
+    if packed:
+        return [int.from_bytes(blocks[i:i + width], 'big') * factor % p for i in range(0, len(blocks), width)]
+    return b''.join((block * factor % p).to_bytes(width, 'big') for block in blocks)
+
+
+def rescaleLimbs(factor, p, width, data):
+    '''
+    Multiplies packed limbs by factor (mod p), keeping them packed.
+    :param factor: integer.
+    :param p: integer; the modulus.
+    :param width: integer; the limb width in bytes.
+    :param data: bytes of width bytes limbs.
+    :return: bytes of width bytes limbs.
+    '''
+    numpy = limbsNumpy(p)
+    if numpy is not None:
+        return packLimbs(numpy, unpackLimbs(numpy, data, width) * factor % p, width)
+    return b''.join((int.from_bytes(data[i:i + width], 'big') * factor % p).to_bytes(width, 'big')
+                    for i in range(0, len(data), width))
+
+
+def multiplyLimbs(p, width, left, right):
+    '''
+    Multiplies two vectors of packed limbs componentwise (mod p).
+    :param p: integer; the modulus.
+    :param width: integer; the limb width in bytes.
+    :param left: bytes of width bytes limbs.
+    :param right: bytes of width bytes limbs, as long as left.
+    :return: bytes of width bytes limbs.
+    '''
+    assert len(left) == len(right)
+    numpy = limbsNumpy(p)
+    if numpy is not None:
+        return packLimbs(numpy, unpackLimbs(numpy, left, width) * unpackLimbs(numpy, right, width) % p, width)
+    return b''.join((int.from_bytes(left[i:i + width], 'big') * int.from_bytes(right[i:i + width], 'big') % p)
+                    .to_bytes(width, 'big') for i in range(0, len(left), width))
+
+
+class PublicKey:
+    '''
+    Immutable ElGamal public key [p, a, b], b = a^(e) (mod p).
+    It behaves like the list [p, a, b] (indexing, unpacking, str()), and caches per-key data: the block width and,
+    once the key has been used a few times, fixed-base tables that turn a^(k) and b^(k) into multiplications only.
+    '''
+    __slots__ = ('__p', '__a', '__b', '__byteLength', '__tables', '__uses')
+    TABLE_THRESHOLD = 4  # Exponentiations after which the fixed-base tables are built.
+    WINDOW = 4
+
+    def __init__(self, p, a, b):
+        assert isinstance(p, int)
+        assert isinstance(a, int)
+        assert isinstance(b, int)
+        object.__setattr__(self, '_PublicKey__p', p)
+        object.__setattr__(self, '_PublicKey__a', a)
+        object.__setattr__(self, '_PublicKey__b', b)
+        object.__setattr__(self, '_PublicKey__byteLength', (p.bit_length() + 7) // 8)
+        object.__setattr__(self, '_PublicKey__tables', None)
+        object.__setattr__(self, '_PublicKey__uses', 0)
+
+    @staticmethod
+    def fromList(key):
+        '''
+        :param key: PublicKey() or list of 3 integers [p, a, b].
+        :return: PublicKey().
+        '''
+        if isinstance(key, PublicKey):
+            return key
+        assert isinstance(key, list)
+        assert len(key) == 3
+        return PublicKey(key[0], key[1], key[2])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PublicKey is immutable.')
+
+    def __reduce__(self):  # Pickled without the caches (e.g. when sent to worker processes).
+        return (PublicKey, (self.__p, self.__a, self.__b))
+
+    def getP(self):
+        return self.__p
+
+    def getA(self):
+        return self.__a
+
+    def getB(self):
+        return self.__b
+
+    def getBitLength(self):
+        return self.__p.bit_length()
+
+    def getByteLength(self):
+        '''
+        :return: integer; the width in bytes of a value (mod p).
+        '''
+        return self.__byteLength
+
+    def precompute(self, ma):
+        '''
+        Builds the fixed-base tables of a and b.
+        :param ma: ModularArithmetics().
+        :return:
+        '''
+        if self.__tables is None:
+            bits = self.__p.bit_length()
+            tables = (ma.fixedBaseTable(self.__a, self.__p, bits, self.WINDOW),
+                      ma.fixedBaseTable(self.__b, self.__p, bits, self.WINDOW))
+            object.__setattr__(self, '_PublicKey__tables', tables)
+
+    def powers(self, k, ma):
+        '''
+        :param k: integer, 0 <= k < p.
+        :param ma: ModularArithmetics().
+        :return: (a^(k), b^(k)) (mod p).
+        '''
+        if self.__tables is None:
+            object.__setattr__(self, '_PublicKey__uses', self.__uses + 1)
+            if self.__uses < self.TABLE_THRESHOLD:
+                return ma.modularPower(a=self.__a, e=k, m=self.__p), ma.modularPower(a=self.__b, e=k, m=self.__p)
+            self.precompute(ma)
+        tableA, tableB = self.__tables
+        return ma.fixedBasePower(tableA, k, self.__p, self.WINDOW), ma.fixedBasePower(tableB, k, self.__p, self.WINDOW)
+
+    def toList(self):
+        return [self.__p, self.__a, self.__b]
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        return self.toList()[i]
+
+    def __iter__(self):
+        return iter(self.toList())
+
+    def __eq__(self, other):
+        if isinstance(other, PublicKey):
+            return self.toList() == other.toList()
+        return self.toList() == other
+
+    def __hash__(self):
+        return hash((self.__p, self.__a, self.__b))
+
+    def __repr__(self):
+        return str(self.toList())
+
+
+class PrivateKey:
+    '''
+    Immutable ElGamal private key e, for the modulus p.
+    It caches p - 1 - e, so that h^(-1) = r^(p - 1 - e) (mod p) costs a single exponentiation.
+    '''
+    __slots__ = ('__e', '__p', '__inverseExponent')
+
+    def __init__(self, e, p):
+        assert isinstance(e, int)
+        assert isinstance(p, int)
+        object.__setattr__(self, '_PrivateKey__e', e)
+        object.__setattr__(self, '_PrivateKey__p', p)
+        object.__setattr__(self, '_PrivateKey__inverseExponent', (p - 1 - e) % (p - 1))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PrivateKey is immutable.')
+
+    def __reduce__(self):
+        return (PrivateKey, (self.__e, self.__p))
+
+    def getE(self):
+        return self.__e
+
+    def getP(self):
+        return self.__p
+
+    def getInverseExponent(self):
+        '''
+        :return: integer; p - 1 - e.
+        '''
+        return self.__inverseExponent
+
+    def __repr__(self):
+        return 'PrivateKey(p=' + str(self.__p) + ')'  # e is never shown.
+
+
+class Ciphertext:
+    '''
+    Immutable ElGamal ciphertext [r, tVector], with tVector stored as a contiguous buffer of fixed-width big endian
+    limbs (the width of p in bytes).
+    It behaves like the list [r, tVector] (indexing, unpacking, len(), str()); blockCount() is the length of tVector.
+    Binary format (toBytes): H: limb width, I: number of blocks, r, then the limbs.
+    '''
+    __slots__ = ('__r', '__width', '__data')
+    HEADER = struct.Struct('>HI')
+
+    def __init__(self, r, tVector, width):
+        '''
+        :param r: integer; r = a^(k).
+        :param tVector: list of integers (or bytes, already packed in limbs of width bytes).
+        :param width: integer; the limb width in bytes.
+        '''
+        assert isinstance(r, int)
+        assert isinstance(width, int)
+        if isinstance(tVector, bytes):
+            assert len(tVector) % width == 0
+            data = tVector
+        else:
+            data = b''.join(t.to_bytes(width, 'big') for t in tVector)
+        object.__setattr__(self, '_Ciphertext__r', r)
+        object.__setattr__(self, '_Ciphertext__width', width)
+        object.__setattr__(self, '_Ciphertext__data', data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Ciphertext is immutable.')
+
+    def __reduce__(self):
+        return (Ciphertext, (self.__r, self.__data, self.__width))
+
+    def getR(self):
+        return self.__r
+
+    def getLimbWidth(self):
+        return self.__width
+
+    def getData(self):
+        '''
+        :return: bytes; the limbs.
+        '''
+        return self.__data
+
+    def getTVector(self):
+        '''
+        :return: list of integers.
+        '''
+        width = self.__width
+        data = self.__data
+        return [int.from_bytes(data[i:i + width], 'big') for i in range(0, len(data), width)]
+
+    def blockCount(self):
+        '''
+        :return: integer; the number of blocks (the length of tVector).
+        '''
+        return len(self.__data) // self.__width
+
+    def toBytes(self):
+        return self.HEADER.pack(self.__width, self.blockCount()) + self.__r.to_bytes(self.__width, 'big') + self.__data
+
+    @staticmethod
+    def fromBytes(data):
+        '''
+        :param data: bytes produced by toBytes().
+        :return: Ciphertext().
+        '''
+        assert isinstance(data, bytes)
+        width, blocks = Ciphertext.HEADER.unpack_from(data, 0)
+        offset = Ciphertext.HEADER.size
+        r = int.from_bytes(data[offset:offset + width], 'big')
+        offset += width
+        assert len(data) - offset == blocks * width
+        return Ciphertext(r, data[offset:], width)
+
+    def __len__(self):
+        return 2  # [r, tVector], as iterated (see blockCount for the number of blocks).
+
+    def __getitem__(self, i):
+        return [self.__r, self.getTVector()][i]
+
+    def __iter__(self):
+        return iter([self.__r, self.getTVector()])
+
+    def __eq__(self, other):
+        return isinstance(other, Ciphertext) and self.__r == other.__r and self.__width == other.__width and \
+            self.__data == other.__data
+
+    def __hash__(self):
+        return hash((self.__r, self.__width, self.__data))
+
+    def __repr__(self):
+        return str([self.__r, self.getTVector()])
+
 
 class ElGamalKeyPair:
     '''
@@ -22,10 +354,10 @@ class ElGamalKeyPair:
         p is a prime.
     '''
     __MA = None # ModualrAritmetics()
-    __publicKey = None # list of 3 integers: [b, a, p].
-    __privateKey = None # integer: e
+    __publicKey = None # PublicKey(): [p, a, b].
+    __privateKey = None # PrivateKey(): e
 
-    def __init__(self, pBounds=False, primesFilePath='primes50.txt'):
+    def __init__(self, pBounds=False, primesFilePath='primes50.txt', keys=None):
         '''
         b = a^(e) (mod p)
             public key = (p, a, b).
@@ -34,9 +366,19 @@ class ElGamalKeyPair:
         :param pBounds: list of 2 integers [optional]; inferior and superior limits of p.
             p has to be bigger than any block made of 3 letter ASCII representation bits, that is 16777216 = 2^(24).
         :param primesFilePath: string [oprional]; the path to a file containing prime numbers.
+        :param keys: tuple (PublicKey(), PrivateKey()) [optional]; existing keys to use instead of generating them.
+            The private key may be None for an instance that only encrypts.
         '''
         self.__MA = ModularArithmetics()
         ma = self.getModArithmetics()
+        if keys is not None:
+            publicKey, privateKey = keys
+            assert isinstance(publicKey, PublicKey)
+            assert privateKey is None or isinstance(privateKey, PrivateKey)
+            assert privateKey is None or publicKey.getP() == privateKey.getP()
+            self.__publicKey = publicKey
+            self.__privateKey = privateKey
+            return
         if not pBounds:
             assert isinstance(primesFilePath, str)
             p = ma.randomPrimeFromFile(filePath=primesFilePath)
@@ -51,13 +393,13 @@ class ElGamalKeyPair:
 
     def getPrivateKey(self):
         '''
-        :return: integer: e.
+        :return: PrivateKey(): e.
         '''
         return self.__privateKey
 
     def getPublicKey(self):
         '''
-        :return: list of 3 integers: [b, a, p].
+        :return: PublicKey(): [p, a, b].
         '''
         return self.__publicKey
 
@@ -67,6 +409,7 @@ class ElGamalKeyPair:
         '''
         return self.__MA
 
+    @metrics.timed('elgamal_keygen_seconds')
     def generate(self, p):
         '''
         Instantiates the keys.
@@ -75,16 +418,16 @@ class ElGamalKeyPair:
         '''
         assert isinstance(p, int)
         ma = self.getModArithmetics()
-        # To generate a, we don't use a function that finds primitive roots (it would be time consuming).
-        a = ma.randomInteger(2, p - 1)
+        # a is drawn until it generates the group (the factors of p - 1 are cached, so each try costs one
+        # exponentiation per prime factor): an a in a small subgroup would make x easy to find.
+        a = ma.randomInteger(2, p - 2)
+        while not ma.isGenerator(a, p):
+            a = ma.randomInteger(2, p - 2)
         e = ma.randomInteger(2, p - 2)
         b = ma.modularPower(a=a, e=e, m=p)
-        print('a = ' + str(a)) # Test
-        print('e = ' + str(e)) # Test
-        print('b = ' + str(b)) # Test
-        self.__publicKey = [p, a, b]
-        self.__privateKey = e
-        self.print() # Test
+        self.__publicKey = PublicKey(p, a, b)
+        self.__privateKey = PrivateKey(e, p)
+        logger.debug('Generated public key [p, a, b] = %s', self.__publicKey)  # The private key is never logged.
 
     def print(self):
         '''
@@ -94,21 +437,69 @@ class ElGamalKeyPair:
         print('b = a^(e) (mod p)')
         print('public key = [p, a, b] = ' + str(self.getPublicKey()))
         print('p is a prime.')
-        print('private key = e = ' + str(self.getPrivateKey()) + '\n')
+        print('private key = e = ' + str(self.getPrivateKey().getE()) + '\n')
 
 
 class ElGamalEncryption:
     __keys = None # ElGamalKeyPair().
     __MA = None # ModularArithmetics().
+    __workers = 1 # Processes used for long messages.
+    __parallelThreshold = 100000 # Blocks below which the serial path is used (the pool overhead dominates).
+    __pool = None # concurrent.futures.ProcessPoolExecutor(), created on first use.
 
-    def __init__(self, keyBounds=False, keyFile='primes50.txt'):
+    def __init__(self, keyBounds=False, keyFile='primes50.txt', keys=None, workers=1, parallelThreshold=100000):
         '''
         Initializes __keys and __MA.
         :param keyBounds: list of 2 integers [optional]; the bounds of the keys modulus.
         :param keyFile: string [optional]; the path of the file containing the primes.
+        :param keys: tuple (PublicKey(), PrivateKey()) [optional]; existing keys to use instead of generating them.
+        :param workers: integer [optional]; processes sharing the blocks of long messages (1 = always serial).
+        :param parallelThreshold: integer [optional]; the minimum number of blocks for the parallel path.
         '''
-        self.__keys = ElGamalKeyPair(pBounds=keyBounds, primesFilePath=keyFile)
+        assert isinstance(workers, int)
+        assert workers > 0
+        assert isinstance(parallelThreshold, int)
+        self.__keys = ElGamalKeyPair(pBounds=keyBounds, primesFilePath=keyFile, keys=keys)
         self.__MA = self.__keys.getModArithmetics()
+        self.__workers = workers
+        self.__parallelThreshold = parallelThreshold
+
+    def close(self):
+        '''
+        Shuts the worker processes down, if any.
+        :return:
+        '''
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    def multiplyBlocks(self, factor, p, width, blocks):
+        '''
+        Multiplies blocks by factor (mod p), splitting long messages in shards across the worker processes.
+        Only factor, p and the shards are sent to the workers; the results are reassembled in order.
+        :param factor: integer; y for encryption, h^(-1) for decryption.
+        :param p: integer; the modulus.
+        :param width: integer; the limb width in bytes.
+        :param blocks: list of integers (result: bytes of limbs) or bytes of limbs (result: list of integers).
+        :return: bytes or list of integers.
+        '''
+        packed = isinstance(blocks, bytes)
+        count = len(blocks) // width if packed else len(blocks)
+        if self.__workers <= 1 or count < self.__parallelThreshold:
+            return multiplyShard((factor, p, width, blocks))
+        if self.__pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.__pool = ProcessPoolExecutor(max_workers=self.__workers)
+        shardSize = -(-count // self.__workers)
+        step = shardSize * width if packed else shardSize
+        shards = [(factor, p, width, blocks[i:i + step]) for i in range(0, len(blocks), step)]
+        results = self.__pool.map(multiplyShard, shards)
+        if packed:
+            mVector = []
+            for result in results:
+                mVector.extend(result)
+            return mVector
+        return b''.join(results)
 
     def getKeys(self):
         '''
@@ -116,13 +507,105 @@ class ElGamalEncryption:
         '''
         return self.__keys
 
+    @metrics.timed('elgamal_homomorphic_seconds', operation='rerandomize')
+    def rerandomizeBatch(self, ciphertexts, receiverPubKey):
+        '''
+        Re-randomizes ciphertexts without decrypting them: [r, tVector] -> [r * a^(k'), tVector * b^(k')], with a
+        fresh k' for each ciphertext. The results decrypt to the same blocks, but can not be linked to the inputs.
+        :param ciphertexts: list of Ciphertext(); encrypted for receiverPubKey.
+        :param receiverPubKey: PublicKey() or list of 3 integers: [p, a, b].
+        :return: list of Ciphertext().
+        '''
+        assert isinstance(ciphertexts, list)
+        receiverPubKey = PublicKey.fromList(receiverPubKey)
+        ma = self.getModArithmetics()
+        p = receiverPubKey.getP()
+        if len(ciphertexts) > 1:
+            receiverPubKey.precompute(ma)  # The fixed-base tables pay off within the batch.
+        ks = ma.randomIntegers(2, p - 2, len(ciphertexts))
+        res = []
+        for ciphertext, k in zip(ciphertexts, ks):
+            assert isinstance(ciphertext, Ciphertext)
+            width = ciphertext.getLimbWidth()
+            rFactor, tFactor = receiverPubKey.powers(k, ma)
+            res.append(Ciphertext(ciphertext.getR() * rFactor % p,
+                                  rescaleLimbs(tFactor, p, width, ciphertext.getData()), width))
+        metrics.inc('elgamal_homomorphic_ciphertexts_total', len(res), operation='rerandomize')
+        return res
+
+    def rerandomize(self, ciphertext, receiverPubKey):
+        '''
+        :param ciphertext: Ciphertext().
+        :param receiverPubKey: PublicKey() or list of 3 integers: [p, a, b].
+        :return: Ciphertext(); see rerandomizeBatch.
+        '''
+        return self.rerandomizeBatch([ciphertext], receiverPubKey)[0]
+
+    @metrics.timed('elgamal_homomorphic_seconds', operation='multiply')
+    def multiplyCiphertextsBatch(self, pairs, receiverPubKey):
+        '''
+        Multiplies ciphertexts componentwise: [r1, t1] * [r2, t2] = [r1 * r2, t1 * t2], which decrypts (with
+        decryptBlocks) to the blockwise product (mod p) of the two plaintext blocks. No exponentiation is needed.
+        Only meaningful for ciphertexts of raw group elements made by encryptBlocks: encrypt and encryptBytes add
+        random padding to every block (see encodeBlocks), so their products do not decode to anything.
+        :param pairs: list of (Ciphertext(), Ciphertext()); the two have the same number of blocks.
+        :param receiverPubKey: PublicKey() or list of 3 integers: [p, a, b]; the key both were encrypted for.
+        :return: list of Ciphertext().
+        '''
+        assert isinstance(pairs, list)
+        p = PublicKey.fromList(receiverPubKey).getP()
+        res = []
+        for left, right in pairs:
+            assert isinstance(left, Ciphertext) and isinstance(right, Ciphertext)
+            width = left.getLimbWidth()
+            assert right.getLimbWidth() == width
+            res.append(Ciphertext(left.getR() * right.getR() % p,
+                                  multiplyLimbs(p, width, left.getData(), right.getData()), width))
+        metrics.inc('elgamal_homomorphic_ciphertexts_total', len(res), operation='multiply')
+        return res
+
+    def multiplyCiphertexts(self, left, right, receiverPubKey):
+        '''
+        :param left: Ciphertext().
+        :param right: Ciphertext().
+        :param receiverPubKey: PublicKey() or list of 3 integers: [p, a, b].
+        :return: Ciphertext(); see multiplyCiphertextsBatch.
+        '''
+        return self.multiplyCiphertextsBatch([(left, right)], receiverPubKey)[0]
+
     def getModArithmetics(self):
         '''
         :return: ModularArithmetics().
         '''
         return self.__MA
 
-    def textFormatter(self, plainText):
+    def encodeBlocks(self, values, p=None):
+        '''
+        Encodes 3 bytes values as blocks in [1, p - 1] (see BLOCK_SPAN).
+        :param values: list of integers in [0, 2^(24)).
+        :param p: integer [optional]; the receiver modulus (without it, s = 0).
+        :return: list of integers.
+        '''
+        spans = 0 if p is None else (p - 1 - (BLOCK_SPAN - 1)) // BLOCK_SPAN  # The largest s.
+        if spans <= 0:
+            return [value + 1 for value in values]
+        return [value + 1 + BLOCK_SPAN * s
+                for value, s in zip(values, self.getModArithmetics().randomIntegers(0, spans, len(values)))]
+
+    def decodeBlocks(self, blocks):
+        '''
+        :param blocks: list of integers; blocks made by encodeBlocks.
+        :return: list of integers in [0, 2^(24)).
+        '''
+        return [block % BLOCK_SPAN - 1 for block in blocks]
+
+    def textFormatter(self, plainText, p=None):
+        '''
+        Splits plainText into encoded blocks of 3 characters (the last one is padded with spaces).
+        :param plainText: string.
+        :param p: integer [optional]; the receiver modulus (see encodeBlocks).
+        :return: list of integers.
+        '''
         assert isinstance(plainText, str)
         chrV = []
         for i in range(0, len(plainText)):
@@ -144,12 +627,16 @@ class ElGamalEncryption:
         for elem in binV:
             fText.append(int(elem, 2))
         # print(fText) # Test
-        return fText
+        return self.encodeBlocks(fText, p)
 
     def textDeFormatter(self, fVector):
+        '''
+        :param fVector: list of integers; blocks made by textFormatter.
+        :return: list of characters.
+        '''
         assert isinstance(fVector, list)
         binV = []
-        for elem in fVector:
+        for elem in self.decodeBlocks(fVector):
             binCombo = '{:0>24}'.format(format(elem, "b"))
             binV.append(binCombo)
         # print(binV) # Test
@@ -164,87 +651,154 @@ class ElGamalEncryption:
             # print(chrV) # Test
         return chrV
 
+    def bytesFormatter(self, data, p=None):
+        '''
+        Splits data into encoded 3 bytes blocks (the last one is padded with zeros).
+        :param data: bytes.
+        :param p: integer [optional]; the receiver modulus (see encodeBlocks).
+        :return: list of integers.
+        '''
+        assert isinstance(data, bytes)
+        return self.encodeBlocks([int.from_bytes(data[i:i + 3], 'big') << (8 * (3 - len(data[i:i + 3])))
+                                  for i in range(0, len(data), 3)], p)
+
+    def bytesDeFormatter(self, fVector, length):
+        '''
+        :param fVector: list of integers; blocks made by bytesFormatter.
+        :param length: integer; the length of the original data (without padding).
+        :return: bytes.
+        '''
+        assert isinstance(fVector, list)
+        return b''.join(elem.to_bytes(3, 'big') for elem in self.decodeBlocks(fVector))[0:length]
+
+    @metrics.timed('elgamal_encrypt_seconds')
+    def encryptBlocks(self, blocks, receiverPubKey):
+        '''
+        Encrypts blocks, each one in [1, p - 1] (p is the receiver modulus).
+        :param blocks: list of integers.
+        :param receiverPubKey: PublicKey() or list of 3 integers: [p, a, b] ; the public key of the receiver.
+            Passing the same PublicKey() object again lets it cache its fixed-base tables.
+        :return: Ciphertext(): [r, tVector] = [a^(k), blocks * b^(k) = blocks * a^(k*e) (mod p)].
+        '''
+        assert isinstance(blocks, list)
+        receiverPubKey = PublicKey.fromList(receiverPubKey)
+        ma = self.getModArithmetics()
+        receiverP = receiverPubKey.getP()
+        # A block >= p would be reduced mod p and decrypt to a different plaintext (e.g. for p <= 2^(24)); a block 0
+        # would be encrypted as 0.
+        assert max(blocks, default=1) < receiverP, 'Every block has to be smaller than the receiver modulus.'
+        assert min(blocks, default=1) > 0, 'Blocks have to be positive.'
+        k = ma.randomInteger(infBound=2, supBound=receiverP - 2)  # Secret for the sender
+        with metrics.timer('elgamal_phase_seconds', phase='exponentiation'):
+            r, y = receiverPubKey.powers(k, ma)
+        logger.debug('r = a^(k) = %s', r)
+        width = receiverPubKey.getByteLength()
+        data = self.multiplyBlocks(y, receiverP, width, blocks)
+        metrics.inc('elgamal_encrypted_blocks_total', len(blocks))
+        logger.debug('Encryption Finished: %d blocks.', len(blocks))
+        return Ciphertext(r, data, width)
+
+    @metrics.timed('elgamal_decrypt_seconds')
+    def decryptBlocks(self, r, tVector=None):
+        '''
+        Decrypts tVector with the private key of this instance.
+        :param r: integer; r = a^(k). Or a Ciphertext(), with tVector omitted.
+        :param tVector: list of integers; the encrypted blocks.
+        :return: list of integers; the plain blocks.
+        '''
+        myPublicKey = self.getKeys().getPublicKey()
+        width = myPublicKey.getByteLength()
+        if isinstance(r, Ciphertext):
+            width = r.getLimbWidth()
+            r, tVector = r.getR(), r.getData()
+        assert isinstance(r, int)
+        assert isinstance(tVector, (list, bytes))
+        ma = self.getModArithmetics()
+        myP = myPublicKey.getP()
+        myPrivK = self.getKeys().getPrivateKey()
+        logger.debug('r = %s', r)
+        with metrics.timer('elgamal_phase_seconds', phase='exponentiation'):
+            hInverse = ma.modularPower(a=r, e=myPrivK.getInverseExponent(), m=myP)  # h^(-1) = r^(p - 1 - e)
+        if isinstance(tVector, list):
+            mVector = [t * hInverse % myP for t in tVector]
+        else:
+            mVector = self.multiplyBlocks(hInverse, myP, width, tVector)
+        metrics.inc('elgamal_decrypted_blocks_total', len(mVector))
+        logger.debug('Decryption Finished: %d blocks.', len(mVector))
+        return mVector
+
     def encrypt(self, data, receiverPubKey):
         '''
         Encrypts data.
         :param data: string; the data to encrypt.
-        :param receiverPubKey: list of 3 integers: [p, a, b] ; the public key of the receiver.
-        :return: a list of 2 integers: [r, tVector] = [a^(k), data * b^(k) = data * a^(k*e)].
-        '''
-        print('Encrypting...')
-        assert isinstance(receiverPubKey, list)
-        assert len(receiverPubKey) == 3
-        for rpk in receiverPubKey:
-            assert isinstance(rpk, int)
+        :param receiverPubKey: PublicKey() or list of 3 integers: [p, a, b] ; the public key of the receiver.
+            Passing the same PublicKey() object again lets it cache its fixed-base tables.
+        :return: Ciphertext(): [r, tVector] = [a^(k), data * b^(k) = data * a^(k*e) (mod p)].
+        '''
+        logger.debug('Encrypting...')
         if not isinstance(data, str):
             data = str(data)
-        ma = self.getModArithmetics()
-        receiverP = receiverPubKey[0]
-        receiverA = receiverPubKey[1]
-        receiverB = receiverPubKey[2]
-        k = ma.randomInteger(infBound=2, supBound=receiverP - 2)  # Secret for the sender
-        y = ma.modularPower(a=receiverB, e=k, m=receiverP)
-        r = ma.modularPower(a=receiverA, e=k, m=receiverP)
-        print('r = a^(k) = ' + str(r))  # Test
-        print('y = a^(e*k) = ' + str(y))  # Test
-        tVector = self.textFormatter(data)
-        print('Formatted Text: ' + str(tVector)) # Test
-        for i in range(0, len(tVector)):
-            print(tVector[i])
-            tVector[i] = y * tVector[i]
-            print(' -> ' + str(tVector[i]))
-        print('Encryption Finished.')
-        return [r, tVector]
+        receiverPubKey = PublicKey.fromList(receiverPubKey)
+        with metrics.timer('elgamal_phase_seconds', phase='encoding'):
+            blocks = self.textFormatter(data, receiverPubKey.getP())
+        return self.encryptBlocks(blocks, receiverPubKey)
 
-    def decrypt(self, r, tVector):
+    def decrypt(self, r, tVector=None):
         '''
         Decrypts tVector, a list containing encrypted characters.
-        :param r: integer; r = a^(k).
+        :param r: integer; r = a^(k). Or a Ciphertext(), with tVector omitted.
         :param tVector: list of integers; it contains encrypted characters
         :return: string; the decrypted message.
         '''
-        print('Decrypting...')
-        assert isinstance(r, int)
-        assert isinstance(tVector, list)
-        ma = self.getModArithmetics()
-        myP = self.getKeys().getPublicKey()[0]
-        print('p = ' + str(myP)) # Test
-        myPrivK = self.getKeys().getPrivateKey()
-        print('privKey = ' + str(myPrivK)) # Test
-        mVector = []
-        print('r = ' + str(r))
-        h = ma.modularPower(a=r, e=myPrivK, m=myP)
-        print('h = ' + str(h)) # Test
-        for i in range(0, len(tVector)):
-            mVector.append(int(tVector[i] / h))
-        print(mVector)
-        print('Decryption Finished.')
-        print('Formatted Text: ' + str(mVector))
-        dfVector = self.textDeFormatter(mVector)
-        print('Plain Text: ' + str(dfVector))
+        logger.debug('Decrypting...')
+        mVector = self.decryptBlocks(r, tVector)
+        with metrics.timer('elgamal_phase_seconds', phase='decoding'):
+            dfVector = self.textDeFormatter(mVector)
         return ''.join(dfVector)
 
+    def encryptBytes(self, data, receiverPubKey):
+        '''
+        Encrypts binary data.
+        :param data: bytes.
+        :param receiverPubKey: PublicKey() or list of 3 integers: [p, a, b] ; the public key of the receiver.
+        :return: Ciphertext(); the length of data is needed to decrypt it (the last block is padded).
+        '''
+        receiverPubKey = PublicKey.fromList(receiverPubKey)
+        with metrics.timer('elgamal_phase_seconds', phase='encoding'):
+            blocks = self.bytesFormatter(data, receiverPubKey.getP())
+        return self.encryptBlocks(blocks, receiverPubKey)
+
+    def decryptBytes(self, ciphertext, length):
+        '''
+        Decrypts binary data encrypted by encryptBytes.
+        :param ciphertext: Ciphertext().
+        :param length: integer; the length of the plain data.
+        :return: bytes.
+        '''
+        assert isinstance(ciphertext, Ciphertext)
+        mVector = self.decryptBlocks(ciphertext)
+        with metrics.timer('elgamal_phase_seconds', phase='decoding'):
+            return self.bytesDeFormatter(mVector, length)
+
     def decryptWithPrivK(self, r, tVector, p, privKey):
         '''
         Decrypts tVector, a list containing encrypted characters, using privKey as private key and p as modulus.
         :param r: integer; r = a^(k).
         :param tVector: list of integers; it contains encrypted characters
         :param p: prime integer; the modulus.
-        :param privKey: integer; the private key.
+        :param privKey: integer or PrivateKey(); the private key.
         :return: string; the decrypted message.
         '''
-        print('Decrypting...')
+        logger.debug('Decrypting...')
         assert isinstance(r, int)
         assert isinstance(tVector, list)
+        if isinstance(privKey, PrivateKey):
+            privKey = privKey.getE()
         ma = self.getModArithmetics()
         mVector = []
-        h = ma.modularPower(a=r, e=privKey, m=p)
-        print('h = ' + str(h)) # Test
+        hInverse = ma.modularPower(a=r, e=(p - 1 - privKey) % (p - 1), m=p)  # h^(-1) = r^(p - 1 - e)
         for i in range(0, len(tVector)):
-            mVector.append(chr(int(tVector[i] / h)))
-        print(mVector)
-        print('Decryption Finished.')
-        print('Formatted Text: ' + str(mVector))
+            mVector.append(tVector[i] * hInverse % p)
+        logger.debug('Decryption Finished: %d blocks.', len(mVector))
         dfVector = self.textDeFormatter(mVector)
-        print('Plain Text: ' + str(dfVector))
         return ''.join(dfVector)
@@ -0,0 +1,127 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+from ElGamal import ElGamalKeyPair, PrivateKey, PublicKey
+from ElGamal import Stream
+import argparse
+import ast
+import os
+import sys
+import time
+
+DEFAULT_BOUNDS = [2 ** 63 + 1, 2 ** 64 - 1]  # p is drawn here when keygen gets neither --primes nor --bounds.
+
+
+def readKeyFile(path):
+    '''
+    :param path: string; a public key file [p, a, b] or a private key file [p, a, b, e].
+    :return: (PublicKey(), PrivateKey() or None).
+    '''
+    with open(path, 'r') as file:
+        key = ast.literal_eval(file.read().strip())
+    assert isinstance(key, list) and len(key) in (3, 4), path + ' is not a key file.'
+    publicKey = PublicKey(key[0], key[1], key[2])
+    privateKey = PrivateKey(key[3], key[0]) if len(key) == 4 else None
+    return publicKey, privateKey
+
+
+def openInput(path):
+    return sys.stdin.buffer if path == '-' else open(path, 'rb')
+
+
+def openOutput(path):
+    return sys.stdout.buffer if path == '-' else open(path, 'wb')
+
+
+def report(action, total, seconds):
+    megabytes = total / 1e6
+    print(action + ' ' + str(total) + ' bytes in ' + '{:.3f}'.format(seconds) + ' s (' +
+          '{:.3f}'.format(megabytes / seconds if seconds > 0 else 0.0) + ' MB/s).', file=sys.stderr)
+
+
+def openPrivate(path):
+    '''
+    :param path: string.
+    :return: a text file open for writing, readable by its owner only (even if it already existed).
+    '''
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    if hasattr(os, 'fchmod'):
+        os.fchmod(fd, 0o600)
+    return os.fdopen(fd, 'w')
+
+
+def keygen(args):
+    if args.primes and not args.bounds:
+        keys = ElGamalKeyPair(primesFilePath=args.primes)
+    else:
+        keys = ElGamalKeyPair(pBounds=args.bounds or DEFAULT_BOUNDS)
+    publicKey = keys.getPublicKey()
+    with open(args.public, 'w') as file:
+        file.write(str(publicKey) + '\n')
+    with openPrivate(args.private) as file:
+        file.write(str(publicKey.toList() + [keys.getPrivateKey().getE()]) + '\n')
+
+
+def encrypt(args):
+    publicKey, _ = readKeyFile(args.key)
+    inFile = openInput(args.input)
+    outFile = openOutput(args.output)
+    start = time.perf_counter()
+    total = Stream.encryptStream(inFile, outFile, publicKey, chunkSize=args.chunk_size, workers=args.workers)
+    outFile.flush()
+    report('Encrypted', total, time.perf_counter() - start)
+
+
+def decrypt(args):
+    publicKey, privateKey = readKeyFile(args.key)
+    assert privateKey is not None, args.key + ' does not contain a private key.'
+    inFile = openInput(args.input)
+    outFile = openOutput(args.output)
+    start = time.perf_counter()
+    total = Stream.decryptStream(inFile, outFile, publicKey, privateKey, workers=args.workers)
+    outFile.flush()
+    report('Decrypted', total, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m ElGamal', description='ElGamal file encryption.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parserKeygen = commands.add_parser('keygen', help='generate a key pair')
+    parserKeygen.add_argument('--primes', help='file of primes to draw p from')
+    parserKeygen.add_argument('--bounds', type=int, nargs=2,
+                              help='draw p in [INF, SUP] instead (INF > 2^24; default: a 64 bits p)')
+    parserKeygen.add_argument('--public', default='elgamal.pub', help='public key file [p, a, b]')
+    parserKeygen.add_argument('--private', default='elgamal.key', help='private key file [p, a, b, e]')
+    parserKeygen.set_defaults(function=keygen)
+
+    for name, function, help in (('encrypt', encrypt, 'encrypt a file (or stdin)'),
+                                 ('decrypt', decrypt, 'decrypt a file (or stdin)')):
+        subparser = commands.add_parser(name, help=help)
+        subparser.add_argument('--key', required=True,
+                               help='public key file' if name == 'encrypt' else 'private key file')
+        subparser.add_argument('--input', default='-', help='input file (default: stdin)')
+        subparser.add_argument('--output', default='-', help='output file (default: stdout)')
+        subparser.add_argument('--workers', type=int, default=1, help='processes working on chunks')
+        if name == 'encrypt':
+            subparser.add_argument('--chunk-size', type=int, default=Stream.DEFAULT_CHUNK_SIZE,
+                                   help='plain bytes per record')
+        subparser.set_defaults(function=function)
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,10 +12,13 @@ See the License for the specific language governing permissions and limitations
 '''
 
 # Dependencies
+import ElGamal as eg
 import Redis
 import ast
 import IndexCalculusDiscreteLogSolver as IC
+import Utils
 
+Utils.configureLogging()
 
 print('TEST: x = 2 ########################################################')
 
@@ -65,10 +68,8 @@ channelName = 'CommunicationChannel'
 pubsub.subscribe(channelName)
 for item in pubsub.listen():
     if item['type'] == 'message':
-        msg = ast.literal_eval(item['data'].decode('utf-8'))
+        msg = eg.Ciphertext.fromBytes(item['data'])
         print('Message sniffed: ' + str(msg))
-        r = int(msg[0])
-        tVector = msg[1]
         ICProblem = IC.IndexCalculus(a=BobPubKey[1], b=BobPubKey[2], p=BobPubKey[0])
         print("Eve tries to calculate Bob's private key via Index Calculus...")
         BobPrivKey = ICProblem.solveDiscreteLog(r=100, maxRounds=1000)
@@ -0,0 +1,26 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import Redis
+from IndexCalculusDiscreteLogSolver.Distributed import IndexCalculusWorker
+import Utils
+
+Utils.configureLogging()
+
+RCh = Redis.RedisChannel(outChannel='IndexCalculus')
+print('Eve worker connects and waits for Index Calculus work units...')
+RCh.connect()
+worker = IndexCalculusWorker(RCh, jobName='IndexCalculus', batchSize=4)
+processed = worker.run()
+print('Done: ' + str(processed) + ' work units processed.')
@@ -0,0 +1,358 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+from IndexCalculusDiscreteLogSolver import IndexCalculus, RelationStore
+import ast
+import logging
+import struct
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+'''
+Distributed relation collection for IndexCalculus over Redis.
+The coordinator keeps a bounded queue of exponent ranges [start, end) topped up; workers on any host claim ranges,
+test a^(i) (mod p) for smoothness and push back the relations they find in the binary format below; the coordinator
+assembles the congruences matrix incrementally and broadcasts "done" once its rows determine every logarithm.
+Each run of a job has its own id: the problem variable carries it and "done" is set to it (and the problem removed), so
+a "done" left by an earlier run with the same job name does not stop the workers of the next one.
+
+Binary relation format (big endian):
+    H: byte length of i, I: number of nonzero exponents, i as unsigned integer,
+    then, for each nonzero exponent, I: column index in the base, H: exponent.
+'''
+
+RELATION_HEADER = struct.Struct('>HI')
+RELATION_ENTRY = struct.Struct('>IH')
+MAX_STALLS = 3  # Requeues in a row without a new relation before the coordinator gives up.
+
+
+def packRelation(row):
+    '''
+    Packs a congruence row [e0, e1, ..., er, i] into bytes.
+    :param row: list of integers.
+    :return: bytes.
+    '''
+    assert isinstance(row, list)
+    i = row[-1]
+    iBytes = i.to_bytes((i.bit_length() + 7) // 8 or 1, 'big')
+    entries = [(col, exp) for col, exp in enumerate(row[0:-1]) if exp != 0]
+    data = [RELATION_HEADER.pack(len(iBytes), len(entries)), iBytes]
+    for col, exp in entries:
+        data.append(RELATION_ENTRY.pack(col, exp))
+    return b''.join(data)
+
+
+def unpackRelation(data, baseLength):
+    '''
+    Unpacks bytes produced by packRelation.
+    :param data: bytes.
+    :param baseLength: integer; the number of primes in the base.
+    :return: list of integers [e0, e1, ..., er, i].
+    '''
+    assert isinstance(data, bytes)
+    assert isinstance(baseLength, int)
+    iLength, entriesNumber = RELATION_HEADER.unpack_from(data, 0)
+    offset = RELATION_HEADER.size
+    i = int.from_bytes(data[offset:offset + iLength], 'big')
+    offset += iLength
+    row = [0] * baseLength
+    for _ in range(0, entriesNumber):
+        col, exp = RELATION_ENTRY.unpack_from(data, offset)
+        row[col] = exp
+        offset += RELATION_ENTRY.size
+    row.append(i)
+    return row
+
+
+class DistributedJob:
+    '''
+    Redis names shared by the coordinator and the workers of a job.
+    '''
+    __name = None
+
+    def __init__(self, name='IndexCalculus'):
+        assert isinstance(name, str)
+        self.__name = name
+
+    def getName(self):
+        return self.__name
+
+    def getProblemVariable(self):
+        return self.__name + ':problem'
+
+    def getDoneVariable(self):
+        return self.__name + ':done'
+
+    def getUnitsQueue(self):
+        return self.__name + ':units'
+
+    def getProcessingQueue(self):
+        return self.__name + ':processing'
+
+    def getRelationsQueue(self):
+        return self.__name + ':relations'
+
+    def getCollectingQueue(self):
+        return self.__name + ':collecting'
+
+
+class IndexCalculusCoordinator:
+    '''
+    a^(x) = b (mod p); find x, collecting the congruences on a fleet of IndexCalculusWorker processes.
+    '''
+    __ic = None  # IndexCalculus()
+    __channel = None  # Redis.RedisChannel(), already connected.
+    __job = None  # DistributedJob()
+    __runId = None  # string; the id of the run published last.
+
+    def __init__(self, a, b, p, channel, jobName='IndexCalculus'):
+        '''
+        :param a: integer.
+        :param b: integer.
+        :param p: integer (a prime number).
+        :param channel: Redis.RedisChannel(), already connected; "done" is broadcast on its output channel.
+        :param jobName: string; the prefix of the Redis keys used by the job.
+        '''
+        self.__ic = IndexCalculus(a, b, p)
+        self.__channel = channel
+        self.__job = DistributedJob(jobName)
+
+    def getIndexCalculus(self):
+        return self.__ic
+
+    def getJob(self):
+        return self.__job
+
+    def getRunId(self):
+        return self.__runId
+
+    def publishProblem(self, r, path=False):
+        '''
+        Registers the problem for the workers under a new run id, resetting the state of a previous run of the job.
+        :param r: integer, range of primes in the base.
+        :param path: string (optional); a file containing the primes (it has to exist on every worker host).
+        :return: string; the run id.
+        '''
+        rc = self.__channel.getRedisDirectly()
+        job = self.__job
+        rc.delete(job.getDoneVariable(), job.getUnitsQueue(), job.getProcessingQueue(), job.getRelationsQueue(),
+                  job.getCollectingQueue())
+        ic = self.__ic
+        self.__runId = uuid.uuid4().hex
+        self.__channel.setRedisVariable(varName=job.getProblemVariable(),
+                                        varValue=str([ic.getA(), ic.getP(), r, path, self.__runId]))
+        return self.__runId
+
+    def recoverWorkUnits(self):
+        '''
+        Requeues the units claimed by workers that crashed. Units still in progress on live workers are requeued too:
+        they are just tested twice (the duplicated relations are linearly dependent, so they are discarded).
+        :return: integer; the number of requeued units.
+        '''
+        job = self.__job
+        return self.__channel.requeueRedisQueue(job.getProcessingQueue(), job.getUnitsQueue())
+
+    def collectRelations(self, r, path=False, unitSize=1000, maxQueuedUnits=64, pollInterval=0.05,
+                         stallTimeout=60.0):
+        '''
+        Generates congruences: a^(i) = (-1)^(e0) * 2^(e1) * 3^(e2) * 5^(e3) ... p^(er), using the workers.
+        If no relation arrives and no queue changes for stallTimeout seconds while units are claimed, their workers are
+        assumed dead and the units are requeued (recoverWorkUnits). If no unit is claimed for stallTimeout seconds, or
+        after MAX_STALLS requeues in a row without a new relation, no worker is assumed alive: TimeoutError is raised.
+        :param r: integer, range of primes in the base.
+        :param path: string (optional); a file containing the primes.
+        :param unitSize: integer; the number of exponents in each work unit.
+        :param maxQueuedUnits: integer; the maximum number of units waiting in the queue.
+        :param pollInterval: float; seconds to wait when there is nothing to collect.
+        :param stallTimeout: float; seconds without progress after which the claimed units are requeued (it has to be
+            longer than the time a worker takes to process a unit).
+        :return: numpy.ndarray (congruences matrix); list of integers (base).
+        '''
+        assert isinstance(unitSize, int)
+        assert unitSize > 0
+        assert stallTimeout > 0
+        ic = self.__ic
+        channel = self.__channel
+        job = self.__job
+        base = ic.generateBase(r, path)
+        self.publishProblem(r, path)
+        maxExponent = ic.getOrder()  # a^(i) is periodic, with period the order of a.
+        nextStart = 1
+        matrix = RelationStore(len(base) + 1, ic.getP(), capacity=len(base))
+        system = ic.newCongruenceSystem(len(base))
+        lastState = None  # Lengths of the units, processing and relations queues at the last idle poll.
+        lastProgress = time.time()
+        stalls = 0  # Requeues since the last relation.
+        while not system.isComplete():
+            while nextStart <= maxExponent:
+                end = min(nextStart + unitSize, maxExponent + 1)
+                if not channel.addToBoundedRedisQueue(job.getUnitsQueue(), str(nextStart) + ' ' + str(end),
+                                                      maxQueuedUnits):
+                    break
+                nextStart = end
+            items = channel.claimFromRedisQueue(job.getRelationsQueue(), job.getCollectingQueue(), count=100)
+            for item in items:
+                row = unpackRelation(item, len(base))
+                if not system.isComplete() and system.addRow(row):
+                    matrix.append(row)
+            if items:
+                channel.acknowledgeRedisQueueItems(job.getCollectingQueue(), items)
+                lastProgress = time.time()
+                stalls = 0
+                continue
+            state = (channel.getRedisQueueLength(job.getUnitsQueue()),
+                     channel.getRedisQueueLength(job.getProcessingQueue()),
+                     channel.getRedisQueueLength(job.getRelationsQueue()))
+            if nextStart > maxExponent and state == (0, 0, 0):
+                break  # Every exponent has been tested.
+            if state != lastState:
+                lastState = state
+                lastProgress = time.time()
+            elif time.time() - lastProgress > stallTimeout:
+                if state[1] == 0:
+                    raise TimeoutError('No work unit of ' + job.getName() + ' was claimed for ' + str(stallTimeout) +
+                                       ' s: no worker is running.')
+                stalls += 1
+                if stalls > MAX_STALLS:
+                    raise TimeoutError('No relation for ' + job.getName() + ' after ' + str(MAX_STALLS) +
+                                       ' requeues: the workers keep failing.')
+                logger.warning('No progress for %.1f s: requeued %d claimed units.', stallTimeout,
+                               self.recoverWorkUnits())
+                lastProgress = time.time()
+            time.sleep(pollInterval)
+        self.broadcastDone()
+        return matrix.getMatrix(), base
+
+    def broadcastDone(self):
+        '''
+        Tells the workers of the current run to stop, and removes the problem, so that workers started later wait for
+        the next run instead of seeing this "done".
+        :return:
+        '''
+        job = self.__job
+        self.__channel.publishRedisVariable(job.getDoneVariable(), self.__runId)
+        self.__channel.getRedisDirectly().delete(job.getProblemVariable())
+
+    def solveDiscreteLog(self, r, path=False, maxRounds=100, unitSize=1000, stallTimeout=60.0):
+        '''
+        Find the solution of the Discrete Logarithm problem, collecting the congruences on the workers.
+        The relations arrive in any order (units are claimed last in, first out); they are sorted by exponent before the
+        linear algebra, and the result is checked (a^(x) = b) like in findIndividualLog.
+        :param r: integer, the range of the base.
+        :param path: string (optional).
+        :param maxRounds: integer.
+        :param unitSize: integer; the number of exponents in each work unit.
+        :param stallTimeout: float; see collectRelations.
+        :return: integer (the result) or None if it was not found in maxRounds.
+        '''
+        assert isinstance(r, int)
+        assert r > 4
+        ic = self.__ic
+        m, base = self.collectRelations(r, path, unitSize=unitSize, stallTimeout=stallTimeout)
+        m = m[m[:, -1].argsort(kind='stable')]  # In exponent order, like generateCongruencesMatrix.
+        primesLogarithms = ic.computeLogarithms(m=m, base=base)
+        return ic.findIndividualLog(base=base, primesLogarithms=primesLogarithms, maxRounds=maxRounds)
+
+
+class IndexCalculusWorker:
+    '''
+    Claims work units of a DistributedJob and pushes back the relations it finds.
+    '''
+    __channel = None  # Redis.RedisChannel(), already connected.
+    __job = None  # DistributedJob()
+    __batchSize = None
+
+    def __init__(self, channel, jobName='IndexCalculus', batchSize=1):
+        '''
+        :param channel: Redis.RedisChannel(), already connected.
+        :param jobName: string; the prefix of the Redis keys used by the job.
+        :param batchSize: integer; the number of units claimed with each round trip.
+        '''
+        assert isinstance(batchSize, int)
+        assert batchSize > 0
+        self.__channel = channel
+        self.__job = DistributedJob(jobName)
+        self.__batchSize = batchSize
+
+    def isDone(self, runId):
+        '''
+        :param runId: string; the run the worker is working on (None before it has seen a problem).
+        :return: boolean; True if the coordinator of that run broadcast "done" (a "done" of an earlier run is ignored).
+        '''
+        if runId is None:
+            return False
+        done = self.__channel.getRedisVariable(self.__job.getDoneVariable())
+        return done is not None and done.decode('utf-8') == runId
+
+    def processUnit(self, ic, base, start, end):
+        '''
+        Tests a^(i) (mod p) for smoothness, for i in [start, end).
+        :param ic: IndexCalculus().
+        :param base: list of integers.
+        :param start: integer.
+        :param end: integer.
+        :return: list of bytes (packed relations).
+        '''
+        a = ic.getA()
+        p = ic.getP()
+        columns = {elem: col for col, elem in enumerate(base)}
+        relations = []
+        number = pow(a, start, p)
+        for i in range(start, end):
+            factors = ic.factorVector(number, base, columns)
+            if factors is not False:
+                relations.append(packRelation(factors.tolist() + [i]))
+            number = number * a % p
+        return relations
+
+    def run(self, pollInterval=0.5):
+        '''
+        Processes work units until the coordinator of the run being worked on broadcasts "done".
+        :param pollInterval: float; seconds to wait when there is no work.
+        :return: integer; the number of processed units.
+        '''
+        channel = self.__channel
+        job = self.__job
+        processed = 0
+        problem = None
+        runId = None
+        ic = None
+        base = None
+        while not self.isDone(runId):
+            value = channel.getRedisVariable(job.getProblemVariable())
+            if value is None:
+                time.sleep(pollInterval)
+                continue
+            if value != problem:
+                problem = value
+                a, p, r, path, runId = ast.literal_eval(value.decode('utf-8'))
+                ic = IndexCalculus(a, 1, p)
+                base = ic.generateBase(r, path)
+            units = channel.claimFromRedisQueue(job.getUnitsQueue(), job.getProcessingQueue(), count=self.__batchSize)
+            if not units:
+                time.sleep(pollInterval)
+                continue
+            for unit in units:
+                start, end = [int(x) for x in unit.split()]
+                relations = self.processUnit(ic, base, start, end)
+                if channel.getRedisVariable(job.getProblemVariable()) != problem:
+                    break  # A new run was published meanwhile: these relations may belong to another problem.
+                for relation in relations:
+                    channel.addToRedisQueue(job.getRelationsQueue(), relation)
+            else:
+                channel.acknowledgeRedisQueueItems(job.getProcessingQueue(), units)
+                processed += len(units)
+        return processed
@@ -13,9 +13,346 @@ See the License for the specific language governing permissions and limitations
 
 # Dependencies
 from Utils import ModularArithmetics
-import numpy
-import sympy
+from Utils import Order
 from collections import OrderedDict
+import json
+import math
+import os
+import time
+import zlib
+import logging
+from Metrics import REGISTRY as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FileCheckpoint:
+    '''
+    Stores IndexCalculus snapshots in a file (replaced atomically, so a crash never leaves a truncated snapshot).
+    The new snapshot is flushed to disk before the rename, and the rename before save returns, so they survive a power
+    loss too.
+    '''
+    __path = None
+
+    def __init__(self, path):
+        assert isinstance(path, str)
+        self.__path = path
+
+    def getPath(self):
+        return self.__path
+
+    def save(self, data):
+        assert isinstance(data, bytes)
+        tmpPath = self.__path + '.tmp'
+        with open(tmpPath, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmpPath, self.__path)
+        if hasattr(os, 'O_DIRECTORY'):  # The rename is durable once the directory entry is on disk (not on Windows).
+            directory = os.open(os.path.dirname(os.path.abspath(self.__path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+    def load(self):
+        with open(self.__path, 'rb') as file:
+            return file.read()
+
+
+class RedisCheckpoint:
+    '''
+    Stores IndexCalculus snapshots in a Redis variable.
+    '''
+    __channel = None  # Redis.RedisChannel(), already connected.
+    __varName = None
+
+    def __init__(self, channel, varName='IndexCalculus:checkpoint'):
+        assert isinstance(varName, str)
+        self.__channel = channel
+        self.__varName = varName
+
+    def save(self, data):
+        assert isinstance(data, bytes)
+        self.__channel.setRedisVariable(varName=self.__varName, varValue=data)
+
+    def load(self):
+        return self.__channel.getRedisVariable(self.__varName)
+
+
+class LinearSieve:
+    '''
+    Linear sieve relation generator.
+    With H = ceil(sqrt(p)) and J = H^(2) - p:
+        (H + c1) * (H + c2) = J + (c1 + c2) * H + c1 * c2 (mod p),
+    whose right side is about sqrt(p) and not reduced mod p, so it is much more likely to be smooth than a^(i) (mod p).
+    For a fixed c1 the right side is linear in c2, so each base prime divides it on an arithmetic progression of c2:
+    the whole interval is sieved at once adding log(q) to an array of approximate logarithms, and only the
+    positions reaching log(J + (c1 + c2) * H + c1 * c2) are factored.
+    '''
+    __p = None
+    __base = None  # list of primes (-1 excluded).
+    __width = None  # c1, c2 in [0, width).
+    __H = None
+    __J = None
+    __slack = None  # Tolerance of the logarithms comparison.
+
+    def __init__(self, p, base, width, slack=None):
+        '''
+        :param p: integer (a prime number).
+        :param base: list of (primes) integers.
+        :param width: integer; the size of the sieved interval.
+        :param slack: float (optional); tolerance of the logarithms comparison (default: log of the largest prime).
+        '''
+        assert isinstance(p, int)
+        assert isinstance(base, list)
+        assert isinstance(width, int)
+        assert width > 0
+        self.__p = p
+        self.__base = [q for q in base if q > 1]
+        self.__width = width
+        H = math.isqrt(p)
+        if H * H < p:
+            H += 1
+        self.__H = H
+        self.__J = H * H - p
+        if slack is None:
+            slack = math.log(max(self.__base))
+        self.__slack = slack
+
+    def getH(self):
+        return self.__H
+
+    def getJ(self):
+        return self.__J
+
+    def getWidth(self):
+        return self.__width
+
+    def trialDivide(self, n):
+        '''
+        Factors n over the base.
+        :param n: positive integer.
+        :return: dict {prime: exponent} or False if n is not smooth.
+        '''
+        factors = {}
+        for q in self.__base:
+            if n % q == 0:
+                e = 0
+                while n % q == 0:
+                    n //= q
+                    e += 1
+                factors[q] = e
+                if n == 1:
+                    break
+        if n != 1:
+            return False
+        return factors
+
+    @metrics.timed('indexcalculus_phase_seconds', phase='sieve')
+    def sieveRow(self, c1):
+        '''
+        Sieves J + (c1 + c2) * H + c1 * c2 for c2 in [c1, width).
+        :param c1: integer.
+        :return: list of (c2, dict {prime: exponent}) for the smooth values.
+        '''
+        import numpy
+        assert isinstance(c1, int)
+        H = self.__H
+        start = self.__J + c1 * H  # value for c2 = 0
+        step = H + c1
+        length = self.__width - c1
+        if length <= 0:
+            return []
+        first = start + c1 * step  # value for c2 = c1
+        logs = numpy.zeros(length, dtype=numpy.float32)
+        last = first + (length - 1) * step
+        for q in self.__base:
+            logQ = math.log(q)
+            qk = q
+            while qk <= last:
+                if step % qk == 0:
+                    if first % qk == 0:
+                        logs += logQ
+                    else:
+                        break
+                else:
+                    # first + j * step = 0 (mod qk)  =>  j = -first * step^(-1) (mod qk)
+                    j = (-first * pow(step, -1, qk)) % qk
+                    logs[j::qk] += logQ
+                qk *= q
+        targets = numpy.log(first + numpy.arange(length, dtype=numpy.float64) * step) - self.__slack
+        found = []
+        candidates = numpy.nonzero(logs >= targets)[0]
+        for j in candidates:
+            j = int(j)
+            factors = self.trialDivide(first + j * step)
+            if factors:
+                found.append((c1 + j, factors))
+        metrics.inc('indexcalculus_candidates_total', len(candidates), phase='sieve')
+        metrics.inc('indexcalculus_relations_total', len(found), phase='sieve')
+        return found
+
+    def relations(self, base):
+        '''
+        Generates the relations of the whole interval as congruence rows over [H + 0, ..., H + width - 1] + base:
+            - log(H + c1) - log(H + c2) + e0 * log(q0) + ... + er * log(qr) = 0 (mod p - 1).
+        The H + c columns come first, so an elimination choosing the first invertible entry as pivot gets rid of them
+        before the base columns (most of them appear in a single relation, and their logarithms stay undetermined).
+        :param base: list of (primes) integers; the columns of the rows (it may contain -1).
+        :return: generator of lists of integers [f0, ..., f(width - 1), e0, ..., er, 0].
+        '''
+        assert isinstance(base, list)
+        columns = {q: self.__width + col for col, q in enumerate(base)}
+        for c1 in range(0, self.__width):
+            for c2, factors in self.sieveRow(c1):
+                row = [0] * (self.__width + len(base) + 1)
+                for q in factors.keys():
+                    row[columns[q]] = factors[q]
+                row[c1] -= 1
+                row[c2] -= 1
+                yield row
+
+
+class RelationStore:
+    '''
+    Congruence rows [e0, e1, ..., er, k] in a preallocated 2-D NumPy array, grown by doubling (amortized O(1)
+    append), so the relations reach the linear algebra without per-row lists or copies.
+    '''
+    __rows = None  # numpy.ndarray; only the first __count rows are in use.
+    __count = 0
+
+    def __init__(self, columns, p, capacity=16):
+        '''
+        :param columns: integer; the row length (base length + 1).
+        :param p: integer; the modulus (k < p decides whether int64 is wide enough).
+        :param capacity: integer; the initial number of rows.
+        '''
+        import numpy
+        assert isinstance(columns, int)
+        assert isinstance(capacity, int)
+        dtype = numpy.int64 if p.bit_length() < 63 else object
+        self.__rows = numpy.zeros((max(capacity, 1), columns), dtype=dtype)
+        self.__count = 0
+
+    def __len__(self):
+        return self.__count
+
+    def append(self, row):
+        '''
+        :param row: list or numpy.ndarray of integers.
+        :return:
+        '''
+        import numpy
+        if self.__count == len(self.__rows):
+            grown = numpy.zeros((2 * len(self.__rows), self.__rows.shape[1]), dtype=self.__rows.dtype)
+            grown[0:self.__count] = self.__rows
+            self.__rows = grown
+        self.__rows[self.__count] = row
+        self.__count += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def getMatrix(self):
+        '''
+        :return: numpy.ndarray; a view of the rows in use.
+        '''
+        return self.__rows[0:self.__count]
+
+
+class CongruenceSystem:
+    '''
+    Linear congruences e0 * L0 + ... + er * Lr = k (mod n) in the unknown logarithms L, solved exactly: rows are reduced
+    as they are added, modulo each of the coprime factors of n (prime powers, and the unfactored part of n, whose prime
+    factors are all big), choosing as pivots only entries invertible modulo that factor; the solutions are recombined
+    with the CRT. Unlike an elimination over the rationals, every logarithm comes out as an integer modulo n.
+    '''
+    __columns = None
+    __moduli = None  # list of coprime integers whose product is n.
+    __pivots = None  # list (one per modulus) of dict: column -> (numpy.ndarray row, k), with 1 in its column.
+
+    def __init__(self, columns, moduli):
+        '''
+        :param columns: integer; the number of unknowns.
+        :param moduli: list of coprime integers; the factors of n.
+        '''
+        assert isinstance(columns, int)
+        assert isinstance(moduli, list)
+        assert len(moduli) > 0
+        self.__columns = columns
+        self.__moduli = moduli
+        self.__pivots = [{} for _ in moduli]
+
+    def getModulus(self):
+        return math.prod(self.__moduli)
+
+    def isComplete(self):
+        '''
+        :return: boolean; True if every unknown is determined.
+        '''
+        return all(len(pivots) == self.__columns for pivots in self.__pivots)
+
+    def addRow(self, row):
+        '''
+        :param row: list or numpy.ndarray of integers [e0, e1, ..., er, k].
+        :return: boolean; True if row determines something new (modulo at least one factor of n).
+        '''
+        import numpy
+        assert len(row) == self.__columns + 1
+        useful = False
+        for modulus, pivots in zip(self.__moduli, self.__pivots):
+            dtype = numpy.int64 if modulus < 2 ** 31 else object  # Products of two residues must fit.
+            vector = numpy.array([int(e) % modulus for e in row[0:-1]], dtype=dtype)
+            k = int(row[-1]) % modulus
+            for col, (pivotRow, pivotK) in pivots.items():  # Insertion order: each row is 0 on the earlier pivots.
+                c = int(vector[col])
+                if c:
+                    vector = (vector - c * pivotRow) % modulus
+                    k = (k - c * pivotK) % modulus
+            for col in numpy.nonzero(vector)[0]:
+                c = int(vector[col])
+                if math.gcd(c, modulus) == 1:
+                    inverse = pow(c, -1, modulus)
+                    pivots[int(col)] = (vector * inverse % modulus, k * inverse % modulus)
+                    useful = True
+                    break
+        return useful
+
+    def solve(self):
+        '''
+        :return: list of integers modulo n, with None for the unknowns that the rows do not determine.
+        '''
+        import numpy
+        residues = []
+        for modulus, pivots in zip(self.__moduli, self.__pivots):
+            values = {}
+            for col, (pivotRow, k) in reversed(list(pivots.items())):  # A pivot row only involves later pivots.
+                value = k
+                for other in numpy.nonzero(pivotRow)[0]:
+                    other = int(other)
+                    if other == col:
+                        continue
+                    if values.get(other) is None:
+                        value = None
+                        break
+                    value -= int(pivotRow[other]) * values[other]
+                values[col] = None if value is None else value % modulus
+            residues.append(values)
+        n = self.getModulus()
+        solution = []
+        for col in range(0, self.__columns):
+            x = 0
+            for modulus, values in zip(self.__moduli, residues):
+                if values.get(col) is None:
+                    x = None
+                    break
+                cofactor = n // modulus
+                x += values[col] * cofactor * pow(cofactor, -1, modulus)
+            solution.append(None if x is None else x % n)
+        return solution
 
 
 class IndexCalculus:
@@ -26,6 +363,12 @@ class IndexCalculus:
     __b = None
     __p = None
     __x = None
+    __order = None  # The multiplicative order of a, computed on first use.
+    __checkpoint = None  # FileCheckpoint() or RedisCheckpoint().
+    __checkpointInterval = 60  # Minimum number of seconds between two snapshots.
+    __lastCheckpoint = 0.0
+    __state = None  # dict: the progress loaded from a snapshot.
+    __logarithms = None  # dict: (r, path) -> (base, logarithms of the base primes), shared by solveMany calls.
 
     def __init__(self, a, b, p):
         '''
@@ -36,7 +379,7 @@ class IndexCalculus:
         assert isinstance(a, int)
         assert isinstance(b, int)
         assert isinstance(p, int)
-        assert sympy.isprime(p)
+        assert Order.isProbablePrime(p)
         while a >= p:
             a -= p
         while a < 0:
@@ -64,18 +407,126 @@ class IndexCalculus:
     def getPhi(self):  # Euler Totient Function
         return self.__p - 1
 
+    def getOrder(self):
+        '''
+        :return: integer; the multiplicative order of a (it divides p - 1): exponents of a are defined modulo it.
+            If p - 1 cannot be fully factored, p - 1 itself (a multiple of the order, so still a valid modulus).
+        '''
+        if self.__order is None:
+            try:
+                self.__order = Order.multiplicativeOrder(self.__a, self.__p)
+            except Exception as error:
+                logger.warning('Order of %s not computed (%s): exponents are reduced modulo p - 1.', self.__a, error)
+                self.__order = self.getPhi()
+        return self.__order
+
+    def getOrderModuli(self):
+        '''
+        :return: list of coprime integers whose product is the order of a: its prime powers, and the part of p - 1
+            that could not be factored (if it divides the order).
+        '''
+        n = self.getOrder()
+        factors, _ = Order.groupOrderFactors(self.__p)
+        moduli = []
+        for q in factors.keys():
+            power = 1
+            while n % q == 0:
+                n //= q
+                power *= q
+            if power > 1:
+                moduli.append(power)
+        if n > 1 or not moduli:
+            moduli.append(n)
+        return moduli
+
+    def newCongruenceSystem(self, columns):
+        '''
+        :param columns: integer; the number of unknown logarithms.
+        :return: CongruenceSystem() modulo the order of a.
+        '''
+        return CongruenceSystem(columns, self.getOrderModuli())
+
+    def reduceLogarithm(self, value):
+        '''
+        Maps a logarithm computed over the rationals to an exponent of a: n / d becomes n * d^(-1) modulo the order.
+        :param value: integer or sympy.Rational.
+        :return: integer, or None if d is not invertible modulo the order.
+        '''
+        import sympy
+        order = self.getOrder()
+        value = sympy.Rational(value)
+        try:
+            return int(value.p) * pow(int(value.q), -1, order) % order
+        except ValueError:
+            return None
+
     def __setX(self, newX):
         '''
-        Updates x, modulo p - 1 (because x is an exponent modulo p).
+        Updates x, modulo the order of a (because x is an exponent of a).
         :param newX: integer.
         :return:
         '''
-        phi = self.getPhi()
-        while newX >= phi:
-            newX = newX - phi
-        if newX < 0:
-            newX = newX + phi
-        self.__x = newX
+        self.__x = newX % self.getOrder()
+
+    def setCheckpoint(self, checkpoint, interval=60):
+        '''
+        Enables periodic snapshots of the solver state.
+        :param checkpoint: FileCheckpoint() or RedisCheckpoint().
+        :param interval: number; the minimum number of seconds between two snapshots, to bound their cost.
+        :return:
+        '''
+        assert interval >= 0
+        self.__checkpoint = checkpoint
+        self.__checkpointInterval = interval
+        self.__lastCheckpoint = time.monotonic()
+
+    def isCheckpointDue(self):
+        '''
+        :return: boolean; True if a snapshot has to be taken now.
+        '''
+        return self.__checkpoint is not None and \
+            time.monotonic() - self.__lastCheckpoint >= self.__checkpointInterval
+
+    def saveCheckpoint(self, state):
+        '''
+        Saves a compressed snapshot of the solver state.
+        :param state: dict; the progress of the current phase.
+        :return:
+        '''
+        if self.__checkpoint is None:
+            return
+        state = dict(state, a=self.getA(), b=self.getB(), p=self.getP())
+        if 'logs' in state:  # Integers modulo the order, or None (snapshots of older versions hold rationals).
+            state['logs'] = [log if log is None or isinstance(log, int) else str(log) for log in state['logs']]
+        self.__checkpoint.save(zlib.compress(json.dumps(state, separators=(',', ':')).encode('utf-8')))
+        self.__lastCheckpoint = time.monotonic()
+
+    @classmethod
+    def loadCheckpoint(cls, checkpoint):
+        '''
+        :param checkpoint: FileCheckpoint() or RedisCheckpoint().
+        :return: dict; the solver state.
+        '''
+        import sympy
+        state = json.loads(zlib.decompress(checkpoint.load()).decode('utf-8'))
+        if 'logs' in state:
+            state['logs'] = [sympy.Rational(log) if isinstance(log, str) else log for log in state['logs']]
+        return state
+
+    @classmethod
+    def resume(cls, checkpoint, maxRounds=100, interval=60):
+        '''
+        Continues a computation from its last snapshot, taking new snapshots on the same checkpoint.
+        :param checkpoint: FileCheckpoint() or RedisCheckpoint().
+        :param maxRounds: integer; the rounds allowed to the individual logarithm search.
+        :param interval: number; the minimum number of seconds between two snapshots.
+        :return: integer (the result) or None if it was not found in maxRounds.
+        '''
+        state = cls.loadCheckpoint(checkpoint)
+        ic = cls(state['a'], state['b'], state['p'])
+        ic.setCheckpoint(checkpoint, interval)
+        ic.__state = state
+        return ic.solveDiscreteLog(r=state['r'], path=state['path'], maxRounds=maxRounds)
 
     def printProblem(self):
         '''
@@ -93,6 +544,7 @@ class IndexCalculus:
         :param end: integer.
         :return: list.
         '''
+        import sympy
         assert isinstance(start, int)
         assert isinstance(end, int)
         primes = list(sympy.primerange(start, end))
@@ -115,6 +567,27 @@ class IndexCalculus:
         ma = ModularArithmetics()
         return ma.listOfPrimesFromFile(path)[start:end]
 
+    def factorVector(self, n, base, columns):
+        '''
+        Like findFactors, but returns the exponents as a NumPy row, without building a dict over the whole base.
+        :param n: integer.
+        :param base: list of (primes) integers.
+        :param columns: dict {prime: column index in base}.
+        :return: numpy.ndarray or False if it is impossible a factorization for the given base.
+        '''
+        import numpy
+        import sympy
+        factors = sympy.ntheory.factorint(n)
+        if not factors:  # n = 1: all exponents would be 0.
+            return False
+        row = numpy.zeros(len(base), dtype=numpy.int64)
+        for key in factors.keys():
+            col = columns.get(key)
+            if col is None:  # If base primes are not sufficient to have a factorization.
+                return False
+            row[col] = factors[key]
+        return row
+
     def findFactors(self, n, base):
         '''
         Finds all the exponents of the factors (that are in the base) of integer n.
@@ -122,14 +595,16 @@ class IndexCalculus:
         :param base: list of (primes) integers.
         :return: OrderedDict or False if it is impossible a factorization for the given base.
         '''
+        import sympy
         assert isinstance(n, int)
         assert isinstance(base, list)
         orderedFactors = OrderedDict()
         factors = sympy.ntheory.factorint(n)
         # print('n: ' + str(n)) # Test
         # print('Factors: ' + str(factors)) # Test
+        baseSet = set(base)
         for key in factors.keys():
-            if key not in base:  # If base primes are not sufficient to have a factorization.
+            if key not in baseSet:  # If base primes are not sufficient to have a factorization.
                 # print('KEY NOT IN BASE') # Test
                 return False
         for elem in base:
@@ -152,48 +627,38 @@ class IndexCalculus:
 
     def deleteZeroColumns(self, m, base):
         '''
-        Deletes columns that are made of all zeros from matrix m, updating the base of the matrix.
-        :param m: bidimensional list (matrix).
+        Deletes columns that are made of all zeros from matrix m, updating the base of the matrix (in place).
+        The last column (the exponents of a) is always kept.
+        :param m: bidimensional list or numpy.ndarray (matrix).
         :param base: list.
-        :return: matrix; list (the updated base).
-        '''
-        assert isinstance(m, list)
-        assert isinstance(m[0], list)
-        res = m.copy()
-        newBase = base
-        i = 0
-        toDel = []
-        while i < len(m[0]):
-            column = numpy.array(res)[:, i]
-            if numpy.sum(column) == 0:
-                toDel.append(i)
-            i += 1
-        # print('To Delete: ' + str(toDel)) # Test
-        deleted = 0
-        for elem in toDel:
-            res = numpy.delete(res, elem - deleted, axis=1)
-            del newBase[elem - deleted]
-            deleted += 1
-        return res, newBase
+        :return: numpy.ndarray (matrix); list (the updated base).
+        '''
+        import numpy
+        assert isinstance(m, (list, numpy.ndarray))
+        assert isinstance(base, list)
+        m = numpy.asarray(m)
+        keep = numpy.append(m[:, 0:-1].any(axis=0), True)
+        # print('To Delete: ' + str(numpy.nonzero(~keep)[0])) # Test
+        base[:] = [elem for elem, kept in zip(base, keep) if kept]
+        return m[:, keep], base
 
     def isNewRowLI(self, row, m):
         '''
         Check is a candidate row is Linear Independent with matrix m rows.
-        :param row: list.
-        :param m: bidimensional list.
+        :param row: list or numpy.ndarray.
+        :param m: bidimensional list or numpy.ndarray.
         :return:
         '''
-        assert isinstance(row, list)
-        assert isinstance(m, list)
+        import numpy
+        import sympy
+        assert isinstance(row, (list, numpy.ndarray))
+        assert isinstance(m, (list, numpy.ndarray))
         # print('row: ' + str(row)) # Test
-        if m == []:
+        if len(m) == 0:
             return True
         else:
-            assert isinstance(m[0], list)
-            testM = m.copy()
-            testM.append(row)
+            testM = numpy.vstack([numpy.asarray(m), numpy.asarray(row).reshape(1, -1)])
             # print('testM: ' + str(testM)) # Test
-            testM = numpy.array(testM)
             _, LIRowsNumber = sympy.Matrix(testM).T.rref()
             if len(LIRowsNumber) == len(testM):
                 # print('True') # Test
@@ -201,50 +666,121 @@ class IndexCalculus:
             else:
                 return False
 
+    def generateBase(self, r, path=False):
+        '''
+        Generates the base of primes for the congruences.
+        :param r: integer, range of primes in the base.
+        :param path: string (optional); a file containing the primes.
+        :return: list of integers.
+        '''
+        assert isinstance(r, int)
+        assert r > 0
+        if not path:
+            return self.generatePrimeVector(start=0, end=r)
+        return self.generateBaseFromFile(start=0, end=r, path=path)
+
+    @metrics.timed('indexcalculus_phase_seconds', phase='relations')
     def generateCongruencesMatrix(self, r, path=False):
         '''
         Generate congruences: b^(k) = (-1)^(e0) * 2^(e1) * 3^(e2) * 5^(e3) ... p^(er)
+        Rows are kept while they determine something new (see CongruenceSystem), until every logarithm is determined.
         :param r: integer, range of primes in the base.
-        :return: bidimensional list (congruences matrix); list of integers (base).
+        :return: numpy.ndarray (congruences matrix); list of integers (base).
         '''
+        import numpy
         assert isinstance(r, int)
         assert r > 0
         ma = ModularArithmetics()
         a = self.getA()
         p = self.getP()
-        if not path:
-            base = self.generatePrimeVector(start=0, end=r)
-        else:
-            base = self.generateBaseFromFile(start=0, end=r, path=path)
+        base = self.generateBase(r, path)
+        columns = {elem: col for col, elem in enumerate(base)}
         # print('Base of primes: ' + str(base)) # Test
-        matrix = []
-        numberList = []  # Powers mod n are circular (after the period, the relations are Linear Dependent)
+        matrix = RelationStore(len(base) + 1, p, capacity=len(base))
+        system = self.newCongruenceSystem(len(base))
         i = 1
+        state = self.__state
+        if state is not None and state['phase'] == 'relations' and state['r'] == r and state['path'] == path:
+            for row in state['matrix']:
+                system.addRow(row)
+                matrix.append(row)
+            i = state['i']
+            self.__state = None
+        firstI = i
         number = ma.modularPower(a=a, e=i, m=p)
-        while number not in numberList and len(matrix) < len(base):
-            numberList.append(number)
-            factors = self.findFactors(number, base=base)
+        # Powers mod p are circular: the sequence comes back to a (after the period, the relations are Linear Dependent).
+        while not (i > 1 and number == a) and not system.isComplete():
+            if self.isCheckpointDue():
+                self.saveCheckpoint({'phase': 'relations', 'r': r, 'path': path, 'i': i,
+                                     'matrix': matrix.getMatrix().tolist()})
+            factors = self.factorVector(number, base, columns)
             # print('Factors: ' + str(factors)) # Test
-            if factors:
+            if factors is not False:
                 # print('Congruece '+ str(i) + ': ' + str(factors)) # Test
-                row = list(factors.values())  # row = [e0, e1, ..., er, k]
-                row.append(i)
-                if self.isNewRowLI(row, matrix):
+                row = numpy.append(factors.astype(matrix.getMatrix().dtype), i)  # row = [e0, e1, ..., er, k]
+                if system.addRow(row):
                     # print('Valid Row')  # Test
                     matrix.append(row)
             i += 1
             number = ma.modularPower(a=a, e=i, m=p)
             # print('Number: ' + str(number))  # Test
-            # print('Number List: ' + str(numberList))  # Test
             # print('i = ' + str(i))  # Test
-        return matrix, base
+        metrics.inc('indexcalculus_candidates_total', i - firstI, phase='relations')
+        return matrix.getMatrix(), base
 
+    @metrics.timed('indexcalculus_phase_seconds', phase='relations')
+    def generateSieveCongruencesMatrix(self, r, width, path=False):
+        '''
+        Generates congruences with the linear sieve, over the base preceded by H + c for c in [0, width).
+        The sieve rows (last column 0) come first and relate the logarithms to each other; then a^(i) rows (with zero
+        coefficients for the H + c columns) tie them to a, until the logarithms of the base primes are determined.
+        :param r: integer, range of primes in the base.
+        :param width: integer; the size of the sieved interval.
+        :param path: string (optional); a file containing the primes.
+        :return: numpy.ndarray (congruences matrix); list of integers (extended base).
+        '''
+        import numpy
+        assert isinstance(r, int)
+        assert r > 0
+        assert isinstance(width, int)
+        assert width > 0
+        ma = ModularArithmetics()
+        a = self.getA()
+        p = self.getP()
+        base = self.generateBase(r, path)
+        columns = {elem: col for col, elem in enumerate(base)}
+        sieve = LinearSieve(p, base, width)
+        matrix = RelationStore(len(base) + width + 1, p, capacity=len(base) + width)
+        system = self.newCongruenceSystem(len(base) + width)
+        for row in sieve.relations(base):
+            if system.addRow(row):
+                matrix.append(row)
+        logger.debug('%d useful sieve relations', len(matrix))
+        determined = False
+        i = 1
+        number = a
+        while not (i > 1 and number == a) and not determined:
+            factors = self.factorVector(number, base, columns)
+            if factors is not False:
+                row = numpy.concatenate((numpy.zeros(width, dtype=matrix.getMatrix().dtype),
+                                         factors.astype(matrix.getMatrix().dtype), [i]))
+                if system.addRow(row):
+                    matrix.append(row)
+                    determined = None not in system.solve()[width:]
+            i += 1
+            number = ma.modularPower(a=a, e=i, m=p)
+        metrics.inc('indexcalculus_candidates_total', i - 1, phase='relations')
+        return matrix.getMatrix(), [sieve.getH() + c for c in range(0, width)] + base
+
+    @metrics.timed('indexcalculus_phase_seconds', phase='rref')
     def matrix2ReducedEchelonForm(self, m):
         '''
         Returns Row Echelon Form of matrix m.
         :param m: matrix.
         :return: matrix, list of pivots.
         '''
+        import numpy
+        import sympy
         if not isinstance(m, list):
             assert isinstance(m, numpy.matrix)
             m.tolist()
@@ -259,93 +795,217 @@ class IndexCalculus:
         :param systemMatrix: bidimentional list.
         :return: list.
         '''
+        import numpy
         a = numpy.array(systemMatrix)[:, 0:-1]
         b = numpy.array(systemMatrix)[:, -1]
-        print('a: ' + str(a))  # Test
-        print('b: ' + str(b))  # Test
+        logger.debug('a: %s', a)
+        logger.debug('b: %s', b)
         return numpy.linalg.solve(a, b)
 
+    @metrics.timed('indexcalculus_phase_seconds', phase='linear_algebra')
     def computeLogarithms(self, m, base):
         '''
-        Computes the discrete logarithms of base primes, given the congruence matrix.
-        :param m: bidimensional list (the congruence matrix).
+        Computes the discrete logarithms of base primes, given the congruence matrix, modulo the order of a.
+        :param m: bidimensional list or numpy.ndarray (the congruence matrix).
         :param base: list (of primes).
-        :return: list.
+        :return: list of integers, with None for the primes whose logarithm the congruences do not determine.
         '''
-        assert isinstance(m, list)
-        assert isinstance(m[0], list)
+        import numpy
+        assert isinstance(m, (list, numpy.ndarray))
+        assert len(m) > 0
         assert isinstance(base, list)
-        m, base = self.deleteZeroColumns(m, base)
-        m = numpy.asmatrix(m)
-        while len(m[0]) > len(m):
-            m = m[0:-1]
-        print('Base of primes: ' + str(base))  # Test
-        print('Congruence Matrix: M')
-        print(m)  # Test
-        rm, pivots = self.matrix2ReducedEchelonForm(m)
-        print('M in Reduced Row Echelon Form: RM')
-        print(rm)
-        print('Pivots: ' + str(pivots))
-        primesLogarithms = list(numpy.array(rm)[:, -1])  # The last column is composed of base primes logarithms.
-        while numpy.sum(primesLogarithms[0:-1]) == 0:
-            print('Congruence Matrix: M')
-            print(m)  # Test
-            rm, pivots = self.matrix2ReducedEchelonForm(m)
-            print('M in Reduced Row Echelon Form: RM')
-            print(rm)
-            print('Pivots: ' + str(pivots))
-            primesLogarithms = list(numpy.array(rm)[:, -1])  # The last column is composed of base primes logarithms.
-            print('Logs: ' + str(primesLogarithms))
-            m = m[0:-1]
+        system = self.newCongruenceSystem(len(base))
+        for row in m:
+            system.addRow(row)
+        primesLogarithms = system.solve()
+        logger.debug('Base of primes: %s', base)
+        logger.debug('Logarithms modulo %d: %s', system.getModulus(), primesLogarithms)
         return primesLogarithms
 
-    def solveDiscreteLog(self, r, path=False, maxRounds=100):
+    def solveDiscreteLog(self, r, path=False, maxRounds=100, sieveWidth=None):
         '''
         Find the solution of a Discrete Logarithm problem.
         :param r: integer, the range of the base.
         :param path: string (optional).
         :param maxRounds: integer.
+        :param sieveWidth: integer (optional); if given, the relations come from the linear sieve over
+            [H, H + sieveWidth) (see generateSieveCongruencesMatrix) instead of the a^(i) search.
         :return: integer (the result).
         '''
         assert isinstance(r, int)
         assert r > 4
         assert isinstance(maxRounds, int)
+        assert sieveWidth is None or isinstance(sieveWidth, int)
+        logger.info('Solving %s^(x) = %s (mod %s).', self.getA(), self.getB(), self.getP())
+        state = self.__state
+        if state is not None and state['phase'] == 'descent':
+            self.__state = None
+            return self.findIndividualLog(base=state['base'], primesLogarithms=state['logs'], maxRounds=maxRounds,
+                                          r=r, path=path, startL=state['l'])
+        if sieveWidth is None:
+            m, base = self.generateCongruencesMatrix(r, path)
+            logger.debug('%d congruences over base %s', len(m), base)
+            primesLogarithms = self.computeLogarithms(m=m, base=base)
+        else:
+            m, extendedBase = self.generateSieveCongruencesMatrix(r, sieveWidth, path)
+            logger.debug('%d congruences over extended base %s', len(m), extendedBase)
+            base = extendedBase[sieveWidth:]
+            primesLogarithms = self.computeLogarithms(m=m, base=extendedBase)[sieveWidth:]
+        logger.debug('Logarithms of Base elements: %s', primesLogarithms)
+        self.saveCheckpoint({'phase': 'descent', 'r': r, 'path': path, 'base': base, 'logs': primesLogarithms,
+                             'l': 0})
+        return self.findIndividualLog(base=base, primesLogarithms=primesLogarithms, maxRounds=maxRounds, r=r,
+                                      path=path)
+
+    @metrics.timed('indexcalculus_phase_seconds', phase='descent')
+    def findIndividualLog(self, base, primesLogarithms, maxRounds=100, r=None, path=False, startL=0):
+        '''
+        Finds x looking for a smooth b * a^(l) (mod p), given the logarithms of the base primes.
+        Candidates are checked (a^(x) = b), so a wrong guess does not stop the search.
+        :param base: list (of primes).
+        :param primesLogarithms: list; the logarithms of the base primes.
+        :param maxRounds: integer.
+        :param r: integer (optional); the range of the base, recorded in the snapshots.
+        :param path: string (optional); recorded in the snapshots.
+        :param startL: integer; the last l already tested (when resuming).
+        :return: integer (the result) or None if it was not found in maxRounds.
+        '''
+        assert isinstance(base, list)
+        assert isinstance(maxRounds, int)
+        assert isinstance(startL, int)
         a = self.getA()
         b = self.getB()
         p = self.getP()
         ma = ModularArithmetics()
-        self.printProblem()
-        m, base = self.generateCongruencesMatrix(r, path)
-        print('m: ' + str(numpy.asmatrix(m)))
-        print('base: ' + str(base))
-        primesLogarithms = self.computeLogarithms(m=m, base=base)
-        print('Logarithms of Base elements: ' + str(primesLogarithms))  # Test
-        res = None
-        self.printProblem()
         k = 1
-        l = 0
+        l = startL
         found = False
+        debug = logger.isEnabledFor(logging.DEBUG)  # Checked once: the loop runs for every candidate.
         while k in range(1, maxRounds) and not found:
+            if self.isCheckpointDue():
+                self.saveCheckpoint({'phase': 'descent', 'r': r, 'path': path, 'base': base,
+                                     'logs': primesLogarithms, 'l': l})
             l += 1
             powerA = ma.modularPower(a=a, e=l, m=p)
-            print('powerA = a^(' + str(l) + ') = ' + str(powerA))
             mult = ma.modularMultiplication(x=b, y=powerA, m=p)
-            print('b * powerA (mod p) = ' + str(mult))
             candidate = self.findFactors(n=mult, base=base)
-            print('Candidate: ' + str(candidate))  # Test
+            if debug:
+                logger.debug('l = %d: b * a^(l) (mod p) = %s; candidate: %s', l, mult, candidate)
             if candidate:
-                print('Found: ' + str(candidate) + '; l = ' + str(l))
                 exponents = list(candidate.values())  # exponents = [e0, e1, ..., er]
-                print('Exponents: ' + str(exponents))
                 while len(primesLogarithms) < len(exponents):
-                    primesLogarithms.append(0)
-                products = [a * b for a, b in zip(exponents, primesLogarithms)]
-                print('Products: ' + str(products))
-                res = numpy.sum(products)
-                if not res == 0:
-                    found = True
+                    primesLogarithms.append(None)
+                if all(log is not None for e, log in zip(exponents, primesLogarithms) if e != 0):
+                    products = [e * log for e, log in zip(exponents, primesLogarithms) if e != 0]
+                    if debug:
+                        logger.debug('Products: %s', products)
+                    res = sum(products)
+                    x = self.reduceLogarithm(res - l)
+                    found = x is not None and pow(a, x, p) == b
+                    if not found:
+                        logger.debug('Rejected candidate %s for l = %d.', res, l)
             k += 1
-        self.__setX(res - l)
+        metrics.inc('indexcalculus_candidates_total', l - startL, phase='descent')
+        if not found:
+            # Nothing found: the snapshot lets resume() go on from here.
+            self.saveCheckpoint({'phase': 'descent', 'r': r, 'path': path, 'base': base, 'logs': primesLogarithms,
+                                 'l': l})
+            logger.warning('No smooth b * a^(l) giving a^(x) = b found in %d rounds.', maxRounds)
+            return None
+        self.__setX(x)
         finalRes = self.getX()
-        print('Final Result = x = ' + str(finalRes))
+        logger.info('Final Result = x = %s', finalRes)
         return finalRes
+
+    def precompute(self, r, path=False):
+        '''
+        Computes the logarithms of the base primes once for (a, p): they do not depend on b.
+        :param r: integer, the range of the base.
+        :param path: string (optional).
+        :return: list of integers (base); list (the logarithms of the base primes).
+        '''
+        assert isinstance(r, int)
+        assert r > 4
+        if self.__logarithms is None:
+            self.__logarithms = {}
+        key = (r, path)
+        if key not in self.__logarithms:
+            m, base = self.generateCongruencesMatrix(r, path)
+            primesLogarithms = self.computeLogarithms(m=m, base=base)
+            while len(primesLogarithms) < len(base):
+                primesLogarithms.append(None)
+            self.__logarithms[key] = (base, primesLogarithms[0:len(base)])
+        return self.__logarithms[key]
+
+    def smoothExponents(self, values, base):
+        '''
+        Trial divides a batch of values by the base primes at once.
+        :param values: numpy.ndarray of integers in [1, p).
+        :param base: list (of primes).
+        :return: numpy.ndarray (one row of exponents per value); numpy.ndarray of booleans (True where smooth).
+        '''
+        import numpy
+        rest = values.copy()
+        exponents = numpy.zeros((len(values), len(base)), dtype=numpy.int64)
+        for col, q in enumerate(base):
+            if q < 2:  # -1: values are positive.
+                continue
+            divisible = rest % q == 0
+            while divisible.any():
+                exponents[divisible, col] += 1
+                rest[divisible] //= q
+                divisible = rest % q == 0
+        return exponents, rest == 1
+
+    @metrics.timed('indexcalculus_phase_seconds', phase='solve_many')
+    def solveMany(self, bs, r, path=False, maxRounds=100):
+        '''
+        Solves a^(x) = b (mod p) for every b in bs, sharing the relations, the linear algebra and the powers a^(l)
+        among the targets; the descent tests all the unsolved targets of a round with one vectorized trial division.
+        Candidates are checked (a^(x) = b), so a wrong guess does not stop the search for its target.
+        :param bs: iterable of integers.
+        :param r: integer, the range of the base.
+        :param path: string (optional).
+        :param maxRounds: integer; the maximum l tried for each target.
+        :return: dict {b: x}; x is None for the targets not solved in maxRounds.
+        '''
+        import numpy
+        assert isinstance(maxRounds, int)
+        a = self.getA()
+        p = self.getP()
+        targets = list(OrderedDict.fromkeys(b % p for b in bs))  # Duplicates are solved once.
+        assert 0 not in targets, 'b must be coprime with p.'
+        start = time.perf_counter()
+        base, primesLogarithms = self.precompute(r, path)
+        precomputed = time.perf_counter()
+        dtype = numpy.int64 if p.bit_length() <= 31 else object  # b * a^(l) must fit before the reduction.
+        known = numpy.array([log is not None for log in primesLogarithms], dtype=bool)
+        logs = numpy.array([0 if log is None else log for log in primesLogarithms], dtype=object)
+        results = {b: None for b in targets}
+        pending = numpy.array(targets, dtype=dtype)
+        powerA = 1
+        l = 0
+        candidates = 0
+        while len(pending) > 0 and l < maxRounds:
+            l += 1
+            candidates += len(pending)  # Only the targets still unsolved are tested in this round.
+            powerA = powerA * a % p
+            exponents, smooth = self.smoothExponents(pending * powerA % p, base)
+            smooth &= ~exponents[:, ~known].any(axis=1)  # Only the primes with a known logarithm can be used.
+            solved = numpy.zeros(len(pending), dtype=bool)
+            for row in numpy.nonzero(smooth)[0]:
+                res = exponents[row].astype(object).dot(logs)
+                if res == 0:
+                    continue
+                x = self.reduceLogarithm(res - l)
+                b = int(pending[row])
+                if x is not None and pow(a, x, p) == b:
+                    results[b] = x
+                    solved[row] = True
+            pending = pending[~solved]
+        metrics.inc('indexcalculus_candidates_total', candidates, phase='descent')
+        elapsed = time.perf_counter() - start
+        logger.info('Solved %d of %d targets in %.3f s (precomputation %.3f s): %.3f s per key.',
+                    len(targets) - len(pending), len(targets), elapsed, precomputed - start,
+                    elapsed / max(len(targets), 1))
+        return results
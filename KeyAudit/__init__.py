@@ -0,0 +1,381 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+from collections import OrderedDict
+from multiprocessing import connection as mpConnection
+import ast
+import json
+import logging
+import multiprocessing
+import time
+from Metrics import REGISTRY as metrics
+
+logger = logging.getLogger(__name__)
+
+'''
+Weak-key audit: finds the ElGamal public keys [p, a, b] stored in Redis that Index Calculus can break.
+
+Keys are read with SCAN and pipelined GETs, one batch at a time, and every key is written to the report (one JSON
+object per line) as soon as it is classified or solved, so memory does not grow with the keyspace:
+    breakable: p is small enough for IndexCalculus (at most maxBits bits); the solver processes try to find x (the
+        keys that share p and a are solved together) and are killed when the budget is over.
+    smooth: p - 1 has no prime factor above smoothnessBound (weak to Pohlig-Hellman).
+    ok: none of the above.
+'''
+
+BREAKABLE = 'breakable'
+SMOOTH = 'smooth'
+OK = 'ok'
+CACHE_SIZE = 1024  # Moduli whose p - 1 factorization is kept (keys often share p).
+
+workerState = OrderedDict()  # Per-process IndexCalculus() instances, by (p, a): their base logarithms are reused.
+SOLVER_DIED = 'the solver process died'
+
+
+def parsePublicKey(value):
+    '''
+    :param value: bytes or string; a Redis value.
+    :return: list of 3 integers [p, a, b], or None if value is not a public key.
+    '''
+    if value is None:
+        return None
+    try:
+        key = ast.literal_eval(value.decode('utf-8') if isinstance(value, bytes) else value)
+    except (ValueError, SyntaxError, UnicodeDecodeError, MemoryError, RecursionError):
+        return None
+    if not isinstance(key, list) or len(key) != 3 or not all(isinstance(elem, int) for elem in key):
+        return None
+    if key[0] < 3:
+        return None
+    return key
+
+
+def largestFactorBelow(n, bound):
+    '''
+    Trial divides n up to bound.
+    :param n: integer.
+    :param bound: integer.
+    :return: integer; the largest prime factor of n if it is at most bound, None otherwise.
+    '''
+    largest = 1
+    for d in (2, 3):
+        while n % d == 0:
+            n //= d
+            largest = d
+    d = 5
+    while d <= bound and d * d <= n:
+        for q in (d, d + 2):  # 6k - 1, 6k + 1
+            while n % q == 0:
+                n //= q
+                largest = q
+        d += 6
+    if n > 1:
+        if n > bound:
+            return None
+        largest = max(largest, n)
+    return largest
+
+
+def solveKeys(args):
+    '''
+    Runs in a solver process.
+    :param args: tuple (p, a, list of integers bs, r, maxRounds).
+    :return: dict {b % p: x}; x is None for the keys not solved.
+    '''
+    from IndexCalculusDiscreteLogSolver import IndexCalculus
+    p, a, bs, r, maxRounds = args
+    ic = workerState.get((p, a))
+    if ic is None:
+        ic = workerState[(p, a)] = IndexCalculus(a, bs[0], p)
+        if len(workerState) > CACHE_SIZE:
+            workerState.popitem(last=False)
+    else:
+        workerState.move_to_end((p, a))
+    return ic.solveMany(bs, r=r, maxRounds=maxRounds)
+
+
+def solverLoop(conn):
+    '''
+    Body of a solver process: answers every task received on conn with (results, None) or (None, error message), until
+    it receives None.
+    :param conn: multiprocessing.connection.Connection().
+    '''
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        try:
+            conn.send((solveKeys(task), None))
+        except Exception as error:
+            conn.send((None, repr(error)))
+
+
+class SolverPool:
+    '''
+    Solver processes that can be killed: a running IndexCalculus cannot be interrupted, so at the deadline the busy
+    processes are terminated.
+    '''
+    __workers = None
+    __idle = None  # list of (multiprocessing.Process(), Connection()).
+    __busy = None  # dict: Connection() -> (multiprocessing.Process(), the job given to submit).
+
+    def __init__(self, workers):
+        '''
+        :param workers: integer; the solver processes.
+        '''
+        assert isinstance(workers, int)
+        assert workers > 0
+        self.__workers = workers
+        self.__idle = []
+        self.__busy = {}
+        for _ in range(0, workers):
+            self.__idle.append(self.__start())
+
+    def __start(self):
+        parentConn, childConn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=solverLoop, args=(childConn,), daemon=True)
+        process.start()
+        childConn.close()
+        return process, parentConn
+
+    def hasIdle(self):
+        return len(self.__idle) > 0
+
+    def getBusyCount(self):
+        return len(self.__busy)
+
+    def submit(self, job, task):
+        '''
+        :param job: anything; given back by wait with the results of task.
+        :param task: tuple; the argument of solveKeys.
+        '''
+        assert self.hasIdle()
+        process, conn = self.__idle.pop()
+        conn.send(task)
+        self.__busy[conn] = (process, job)
+
+    def wait(self, timeout):
+        '''
+        :param timeout: float; seconds.
+        :return: list of (job, results, error message); empty if no task ended within timeout.
+        '''
+        done = []
+        for conn in mpConnection.wait(list(self.__busy), max(timeout, 0)):
+            process, job = self.__busy.pop(conn)
+            try:
+                results, error = conn.recv()
+            except (EOFError, OSError):
+                results, error = None, SOLVER_DIED
+                conn.close()
+                process.join()
+                process, conn = self.__start()
+            self.__idle.append((process, conn))
+            done.append((job, results, error))
+        return done
+
+    def terminate(self):
+        '''
+        Kills the busy processes.
+        :return: list of the jobs they were running.
+        '''
+        jobs = []
+        for conn, (process, job) in self.__busy.items():
+            process.terminate()
+            process.join()
+            conn.close()
+            jobs.append(job)
+        self.__busy = {}
+        return jobs
+
+    def close(self):
+        self.terminate()
+        for process, conn in self.__idle:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process, conn in self.__idle:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            conn.close()
+        self.__idle = []
+
+
+class KeyAuditor:
+    '''
+    Scans the public keys published on Redis and reports the weak ones.
+    '''
+    __channel = None  # Redis.RedisChannel(), already connected.
+    __maxBits = None
+    __smoothnessBound = None
+    __r = None
+    __maxRounds = None
+    __workers = None
+    __budget = None  # Seconds available to the solvers.
+    __factorCache = None  # OrderedDict: p -> largest prime factor of p - 1 (or None), least recently used first.
+
+    def __init__(self, channel, maxBits=32, smoothnessBound=2 ** 16, r=30, maxRounds=2000, workers=1, budget=60.0):
+        '''
+        :param channel: Redis.RedisChannel(), already connected.
+        :param maxBits: integer; keys with p of at most maxBits bits are given to the solvers.
+        :param smoothnessBound: integer; p - 1 is smooth if all its prime factors are at most smoothnessBound.
+        :param r: integer; the range of the Index Calculus base.
+        :param maxRounds: integer; the descent rounds for each key.
+        :param workers: integer; the solver processes.
+        :param budget: float; seconds after which the solvers are killed (the keys left are reported as 'budget').
+        '''
+        assert isinstance(maxBits, int)
+        assert isinstance(smoothnessBound, int)
+        assert isinstance(workers, int)
+        assert workers > 0
+        self.__channel = channel
+        self.__maxBits = maxBits
+        self.__smoothnessBound = smoothnessBound
+        self.__r = r
+        self.__maxRounds = maxRounds
+        self.__workers = workers
+        self.__budget = budget
+        self.__factorCache = OrderedDict()
+
+    def largestFactor(self, p):
+        '''
+        :param p: integer.
+        :return: integer; the largest prime factor of p - 1 if it is at most the smoothness bound, None otherwise.
+        '''
+        cache = self.__factorCache
+        if p in cache:
+            cache.move_to_end(p)
+            return cache[p]
+        largest = cache[p] = largestFactorBelow(p - 1, self.__smoothnessBound)
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        return largest
+
+    def classify(self, key):
+        '''
+        :param key: list of 3 integers [p, a, b].
+        :return: dict; the report entry (without the key name).
+        '''
+        p = key[0]
+        largest = self.largestFactor(p)
+        if p.bit_length() <= self.__maxBits:
+            kind = BREAKABLE
+        elif largest is not None:
+            kind = SMOOTH
+        else:
+            kind = OK
+        return {'bits': p.bit_length(), 'class': kind, 'largestFactor': largest}
+
+    def scanPublicKeys(self, pattern='*', count=1000):
+        '''
+        :param pattern: string; the SCAN MATCH pattern.
+        :param count: integer; the keys per round trip.
+        :return: generator of (string, list [p, a, b]); the values that are not public keys are skipped.
+        '''
+        for names in self.__channel.scanRedisKeys(pattern, count):
+            for name, value in zip(names, self.__channel.getRedisVariables(names)):
+                key = parsePublicKey(value)
+                metrics.inc('keyaudit_keys_total', kind='scanned')
+                if key is not None:
+                    yield name, key
+
+    def audit(self, outFile, pattern='*', count=1000):
+        '''
+        Writes one JSON line per public key to outFile. Up to count breakable keys are buffered, so that the keys that
+        share p and a are given to the solvers together.
+        :param outFile: text file-like object.
+        :param pattern: string; the SCAN MATCH pattern.
+        :param count: integer; the keys per round trip.
+        :return: dict; the number of keys by class and, for the breakable ones, by outcome.
+        '''
+        summary = {BREAKABLE: 0, SMOOTH: 0, OK: 0, 'solved': 0, 'unsolved': 0, 'budget': 0, 'error': 0}
+        deadline = time.monotonic() + self.__budget
+        groups = OrderedDict()  # (p, a) -> list of (entry, b mod p): the breakable keys not given to the solvers yet.
+        buffered = 0
+
+        def write(entry):
+            outFile.write(json.dumps(entry) + '\n')
+
+        def finish(group, status, results=None):
+            for entry, b in group:
+                entry['status'] = status
+                if results is not None:
+                    x = results.get(b)
+                    entry['status'] = 'unsolved' if x is None else 'solved'
+                    entry['x'] = x
+                summary[entry['status']] += 1
+                metrics.inc('keyaudit_keys_total', kind=entry['status'])
+                write(entry)
+
+        def collect(timeout):
+            for group, results, error in pool.wait(timeout):
+                if error is not None:  # A malformed key must not stop the audit.
+                    logger.warning('Solving %s failed: %s', [entry['key'] for entry, _ in group], error)
+                    finish(group, 'error')
+                else:
+                    finish(group, None, results)
+
+        def expire():
+            if time.monotonic() < deadline:
+                return False
+            for group in pool.terminate():
+                finish(group, 'budget')
+            return True
+
+        def dispatch():
+            for (p, a), group in groups.items():
+                while not pool.hasIdle() and not expire():
+                    collect(deadline - time.monotonic())
+                if expire():
+                    finish(group, 'budget')
+                    continue
+                bs = [b for _, b in group]
+                pool.submit(group, (p, a, bs, self.__r, self.__maxRounds))
+            groups.clear()
+
+        pool = SolverPool(self.__workers)
+        try:
+            for name, key in self.scanPublicKeys(pattern, count):
+                entry = {'key': name}
+                entry.update(self.classify(key))
+                summary[entry['class']] += 1
+                if entry['class'] != BREAKABLE:
+                    write(entry)
+                    continue
+                p, a, b = key
+                b %= p
+                if b == 0:
+                    logger.warning('Solving %s failed: b must be coprime with p.', name)
+                    finish([(entry, b)], 'error')
+                    continue
+                if time.monotonic() >= deadline:
+                    finish([(entry, b)], 'budget')
+                    continue
+                groups.setdefault((p, a), []).append((entry, b))
+                buffered += 1
+                if buffered >= count:
+                    dispatch()
+                    buffered = 0
+            dispatch()
+            while pool.getBusyCount() > 0 and not expire():
+                collect(deadline - time.monotonic())
+        finally:
+            pool.close()
+        logger.info('Audit summary: %s', summary)
+        return summary
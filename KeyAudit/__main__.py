@@ -0,0 +1,43 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import argparse
+import json
+import sys
+from KeyAudit import KeyAuditor
+import Redis
+import Utils
+
+parser = argparse.ArgumentParser(prog='python -m KeyAudit', description='Finds weak ElGamal public keys in Redis.')
+parser.add_argument('--host', default='127.0.0.1', help='Redis host')
+parser.add_argument('--port', type=int, default=6379, help='Redis port')
+parser.add_argument('--db', type=int, default=0, help='Redis database')
+parser.add_argument('--pattern', default='*', help='SCAN MATCH pattern of the key names')
+parser.add_argument('--count', type=int, default=1000, help='keys per round trip')
+parser.add_argument('--max-bits', type=int, default=32, help='moduli up to this size are attacked')
+parser.add_argument('--bound', type=int, default=2 ** 16, help='smoothness bound of p - 1')
+parser.add_argument('--workers', type=int, default=1, help='solver processes')
+parser.add_argument('--budget', type=float, default=60.0, help='seconds available to the solvers')
+parser.add_argument('--output', default='-', help='the JSON lines report (default: stdout)')
+args = parser.parse_args()
+
+Utils.configureLogging()
+RCh = Redis.RedisChannel(host=args.host, port=args.port, db=args.db)
+RCh.connect()
+auditor = KeyAuditor(RCh, maxBits=args.max_bits, smoothnessBound=args.bound, workers=args.workers,
+                     budget=args.budget)
+outFile = sys.stdout if args.output == '-' else open(args.output, 'w')
+summary = auditor.audit(outFile, pattern=args.pattern, count=args.count)
+outFile.flush()
+print(json.dumps(summary), file=sys.stderr)
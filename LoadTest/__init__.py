@@ -0,0 +1,265 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import ast
+import logging
+import math
+import multiprocessing
+import queue
+import random
+import struct
+import time
+import ElGamal as eg
+import Redis
+from Utils import Random
+
+logger = logging.getLogger(__name__)
+
+'''
+End-to-end load test: N sender and M receiver processes, built on RedisChannel and ElGamalEncryption, exchange
+encrypted messages at a fixed rate; the latency of each message is measured from the time it was scheduled to be sent
+to the time it was decrypted (so a sender falling behind its schedule shows up in the latency too).
+'''
+
+HEADER = struct.Struct('>dI')  # Scheduled send time (time.time()), plain length; followed by Ciphertext.toBytes().
+STOP = b'STOP'
+KEY_PREFIX = 'LoadTest:key:'  # + receiver index: the public key of the receiver.
+CHANNEL_PREFIX = 'LoadTest:'  # + receiver index: the channel the receiver listens to.
+
+
+def parseSizes(spec):
+    '''
+    :param spec: string; comma separated size:weight pairs, e.g. '64:0.7,1024:0.25,16384:0.05' (weight 1 if omitted).
+    :return: list of integers (the sizes, in bytes); list of floats (their weights).
+    '''
+    assert isinstance(spec, str)
+    sizes = []
+    weights = []
+    for item in spec.split(','):
+        size, _, weight = item.strip().partition(':')
+        sizes.append(int(size))
+        weights.append(float(weight) if weight else 1.0)
+    assert len(sizes) > 0
+    assert all(size > 0 for size in sizes)
+    assert all(weight >= 0 for weight in weights) and sum(weights) > 0
+    return sizes, weights
+
+
+def percentile(values, q):
+    '''
+    :param values: sorted list of numbers (not empty).
+    :param q: float in [0, 100].
+    :return: the nearest-rank q-th percentile.
+    '''
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def receiver(host, port, index, bits, readyQueue, resultQueue):
+    '''
+    Process body: generates a key pair, publishes the public key, then decrypts every message of its channel until STOP.
+    Sends (index, latencies, last receive time, errors) on resultQueue.
+    '''
+    channel = Redis.RedisChannel(host=host, port=port, inChannel=CHANNEL_PREFIX + str(index))
+    channel.connect()
+    encryption = eg.ElGamalEncryption(keyBounds=[2 ** (bits - 1) + 1, 2 ** bits - 1])
+    pubsub = channel.getRedisDirectly().pubsub()
+    pubsub.subscribe(channel.getInputChannel())
+    channel.setRedisVariable(KEY_PREFIX + str(index), str(encryption.getKeys().getPublicKey().toList()))
+    readyQueue.put(index)
+    latencies = []
+    errors = 0
+    lastReceived = None
+    for item in pubsub.listen():
+        if item['type'] != 'message':
+            continue
+        data = item['data']
+        if data == STOP:
+            break
+        scheduled, length = HEADER.unpack_from(data)
+        try:
+            plain = encryption.decryptBytes(eg.Ciphertext.fromBytes(data[HEADER.size:]), length)
+            assert len(plain) == length
+        except Exception:
+            logger.exception('Receiver %d could not decrypt a message.', index)
+            errors += 1
+            continue
+        lastReceived = time.time()
+        latencies.append(lastReceived - scheduled)
+    pubsub.close()
+    resultQueue.put(('receiver', index, latencies, lastReceived, errors))
+
+
+def sender(host, port, index, receivers, rate, duration, sizes, weights, startTime, resultQueue):
+    '''
+    Process body: from startTime, sends rate messages per second for duration seconds, round robin over the receivers
+    (open loop: the schedule does not wait for late messages).
+    Sends (index, messages, bytes, maximum lag behind the schedule) on resultQueue.
+    '''
+    channel = Redis.RedisChannel(host=host, port=port)
+    channel.connect()
+    keys = [eg.PublicKey.fromList(ast.literal_eval(channel.getRedisVariable(KEY_PREFIX + str(j)).decode('utf-8')))
+            for j in range(0, receivers)]
+    encryption = eg.ElGamalEncryption(keys=(keys[0], None))  # Encrypts only: no key pair of its own.
+    pool = Random.EntropyPool()
+    chooser = random.Random(index)  # Reproducible size sequence per sender.
+    messages = int(rate * duration)
+    sent = 0
+    sentBytes = 0
+    maxLag = 0.0
+    for n in range(0, messages):
+        scheduled = startTime + n / rate
+        wait = scheduled - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        else:
+            maxLag = max(maxLag, -wait)
+        length = chooser.choices(sizes, weights)[0]
+        j = (index + n) % receivers
+        ciphertext = encryption.encryptBytes(pool.randomBytes(length), keys[j])
+        channel.setOutputChannel(CHANNEL_PREFIX + str(j))
+        channel.redisPublish(HEADER.pack(scheduled, length) + ciphertext.toBytes())
+        sent += 1
+        sentBytes += length
+    resultQueue.put(('sender', index, sent, sentBytes, maxLag))
+
+
+class LoadGenerator:
+    '''
+    Runs senders and receivers against a Redis server, or against an in-process LocalRedisServer if none is given.
+    '''
+    __host = None  # None starts a Redis.LocalServer.LocalRedisServer().
+    __port = None
+    __senders = None
+    __receivers = None
+    __rate = None  # Messages per second, all the senders together.
+    __duration = None  # Seconds.
+    __sizes = None  # list of integers (bytes).
+    __weights = None  # list of floats.
+    __bits = None  # Size of the receivers moduli.
+
+    def __init__(self, host=None, port=6379, senders=1, receivers=1, rate=100.0, duration=10.0, sizes='256',
+                 bits=32):
+        '''
+        :param host: string [optional]; the Redis host (default: an in-process stand-in).
+        :param port: integer; the Redis port (ignored without host).
+        :param senders: integer; the sender processes.
+        :param receivers: integer; the receiver processes.
+        :param rate: float; the messages per second sent by all the senders together.
+        :param duration: float; the sending time, in seconds.
+        :param sizes: string; the size distribution of the messages (see parseSizes).
+        :param bits: integer; the size of the receivers moduli (more than 24).
+        '''
+        assert host is None or isinstance(host, str)
+        assert isinstance(port, int)
+        assert isinstance(senders, int) and senders > 0
+        assert isinstance(receivers, int) and receivers > 0
+        assert rate > 0
+        assert duration > 0
+        assert isinstance(bits, int) and bits > 24
+        self.__host = host
+        self.__port = port
+        self.__senders = senders
+        self.__receivers = receivers
+        self.__rate = float(rate)
+        self.__duration = float(duration)
+        self.__sizes, self.__weights = parseSizes(sizes)
+        self.__bits = bits
+
+    def run(self, timeout=60.0):
+        '''
+        :param timeout: float; seconds the receivers are given, after the last message was sent, to drain their channel.
+        :return: dict; the report (latencies in seconds).
+        '''
+        if self.__host is not None:
+            return self.__run(self.__host, self.__port, timeout)
+        from Redis.LocalServer import LocalRedisServer
+        with LocalRedisServer() as server:
+            return self.__run(server.getHost(), server.getPort(), timeout)
+
+    def __run(self, host, port, timeout):
+        readyQueue = multiprocessing.Queue()
+        resultQueue = multiprocessing.Queue()
+        receivers = [multiprocessing.Process(target=receiver,
+                                             args=(host, port, j, self.__bits, readyQueue, resultQueue))
+                     for j in range(0, self.__receivers)]
+        for process in receivers:
+            process.start()
+        for _ in receivers:
+            readyQueue.get(timeout=timeout)
+        logger.info('%d receivers ready.', len(receivers))
+        startTime = time.time() + 0.5  # Leaves the senders the time to start.
+        rate = self.__rate / self.__senders
+        senders = [multiprocessing.Process(target=sender, args=(host, port, i, self.__receivers, rate, self.__duration,
+                                                                self.__sizes, self.__weights, startTime, resultQueue))
+                   for i in range(0, self.__senders)]
+        for process in senders:
+            process.start()
+        results = []
+        for _ in senders:
+            results.append(resultQueue.get())
+        for process in senders:
+            process.join()
+        sentTime = time.time()
+        # Every message has been published already: on each channel, STOP is the last one.
+        channel = Redis.RedisChannel(host=host, port=port)
+        channel.connect()
+        for j in range(0, self.__receivers):
+            channel.setOutputChannel(CHANNEL_PREFIX + str(j))
+            channel.redisPublish(STOP)
+        for _ in receivers:
+            try:
+                results.append(resultQueue.get(timeout=timeout))
+            except queue.Empty:
+                logger.error('Some receivers did not drain their channel in %s seconds.', timeout)
+                break
+        for process in receivers:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        for j in range(0, self.__receivers):
+            channel.getRedisDirectly().delete(KEY_PREFIX + str(j))
+        return self.report(results, startTime, sentTime)
+
+    def report(self, results, startTime, sentTime):
+        '''
+        :param results: list of the tuples sent by the senders and the receivers.
+        :param startTime: float; when the first message was scheduled.
+        :param sentTime: float; when the last sender finished.
+        :return: dict.
+        '''
+        sent = sum(result[2] for result in results if result[0] == 'sender')
+        sentBytes = sum(result[3] for result in results if result[0] == 'sender')
+        maxLag = max([result[4] for result in results if result[0] == 'sender'], default=0.0)
+        latencies = sorted(latency for result in results if result[0] == 'receiver' for latency in result[2])
+        lastReceived = max([result[3] for result in results if result[0] == 'receiver' and result[3] is not None],
+                           default=sentTime)
+        errors = sum(result[4] for result in results if result[0] == 'receiver')
+        elapsed = max(lastReceived, sentTime) - startTime
+        report = {
+            'params': {'senders': self.__senders, 'receivers': self.__receivers, 'rate': self.__rate,
+                       'duration': self.__duration, 'sizes': dict(zip(self.__sizes, self.__weights)),
+                       'bits': self.__bits, 'server': self.__host or 'local'},
+            'sent': sent,
+            'received': len(latencies),
+            'lost': sent - len(latencies) - errors,
+            'errors': errors,
+            'sentBytes': sentBytes,
+            'messagesPerSecond': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'maxSenderLag': maxLag,
+        }
+        if latencies:
+            report['latency'] = {'p50': percentile(latencies, 50), 'p99': percentile(latencies, 99),
+                                 'max': latencies[-1], 'mean': sum(latencies) / len(latencies)}
+        logger.info('Load test: %d/%d messages, %.1f messages/s.', len(latencies), sent, report['messagesPerSecond'])
+        return report
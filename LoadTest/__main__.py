@@ -0,0 +1,42 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import argparse
+import json
+import sys
+from LoadTest import LoadGenerator
+import Utils
+
+parser = argparse.ArgumentParser(prog='python -m LoadTest',
+                                 description='Measures the encrypt-publish-decrypt latency and throughput under load.')
+parser.add_argument('--host', default=None, help='Redis host (default: an in-process stand-in server)')
+parser.add_argument('--port', type=int, default=6379, help='Redis port')
+parser.add_argument('--senders', type=int, default=1, help='sender processes')
+parser.add_argument('--receivers', type=int, default=1, help='receiver processes')
+parser.add_argument('--rate', type=float, default=100.0, help='messages per second, all the senders together')
+parser.add_argument('--duration', type=float, default=10.0, help='sending time, in seconds')
+parser.add_argument('--sizes', default='256', help="message sizes in bytes with weights, e.g. '64:0.7,1024:0.3'")
+parser.add_argument('--bits', type=int, default=32, help='size of the receivers moduli')
+parser.add_argument('--timeout', type=float, default=60.0, help='seconds the receivers have to drain their channel')
+parser.add_argument('--output', default='-', help='the JSON report (default: stdout)')
+args = parser.parse_args()
+
+Utils.configureLogging()
+generator = LoadGenerator(host=args.host, port=args.port, senders=args.senders, receivers=args.receivers,
+                          rate=args.rate, duration=args.duration, sizes=args.sizes, bits=args.bits)
+report = generator.run(timeout=args.timeout)
+outFile = sys.stdout if args.output == '-' else open(args.output, 'w')
+json.dump(report, outFile, indent=2)
+outFile.write('\n')
+outFile.flush()
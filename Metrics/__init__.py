@@ -0,0 +1,375 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import bisect
+import functools
+import io
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+ENABLE_VARIABLE = 'ELGAMALREDIS_METRICS'  # Environment variable: 1 enables REGISTRY at import time.
+
+
+def formatLabels(labels, extra=None):
+    '''
+    :param labels: tuple of (name, value) pairs.
+    :param extra: tuple (name, value) [optional]; an additional label.
+    :return: string; the Prometheus label set, e.g. {command="get"}.
+    '''
+    pairs = list(labels)
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(name + '="' + str(value) + '"' for name, value in pairs) + '}'
+
+
+class Counter:
+    '''
+    A monotonically increasing value.
+    '''
+    __value = None
+    __lock = None
+
+    def __init__(self):
+        self.__value = 0
+        self.__lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.__lock:
+            self.__value += amount
+
+    def getValue(self):
+        return self.__value
+
+    def export(self, name, labels):
+        return [name + formatLabels(labels) + ' ' + str(self.__value)]
+
+
+class Histogram:
+    '''
+    Counts observations in cumulative buckets, keeping their sum.
+    '''
+    __buckets = None  # tuple of upper bounds.
+    __counts = None  # list: one count per bucket, plus +Inf.
+    __sum = None
+    __lock = None
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.__buckets = tuple(sorted(buckets))
+        self.__counts = [0] * (len(self.__buckets) + 1)
+        self.__sum = 0.0
+        self.__lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.__buckets, value)
+        with self.__lock:
+            self.__counts[i] += 1
+            self.__sum += value
+
+    def getCount(self):
+        return sum(self.__counts)
+
+    def getSum(self):
+        return self.__sum
+
+    def export(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.__buckets + ('+Inf',), self.__counts):
+            cumulative += count
+            lines.append(name + '_bucket' + formatLabels(labels, ('le', bound)) + ' ' + str(cumulative))
+        lines.append(name + '_sum' + formatLabels(labels) + ' ' + repr(self.__sum))
+        lines.append(name + '_count' + formatLabels(labels) + ' ' + str(cumulative))
+        return lines
+
+
+class Timer:
+    '''
+    Context manager observing the elapsed seconds into a Histogram (nothing is measured if metrics are disabled).
+    '''
+    __histogram = None
+    __start = None
+
+    def __init__(self, histogram):
+        self.__histogram = histogram
+
+    def __enter__(self):
+        if self.__histogram is not None:
+            self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self.__histogram is not None:
+            self.__histogram.observe(time.perf_counter() - self.__start)
+        return False
+
+
+NULL_TIMER = Timer(None)  # Shared by every timer() call while metrics are disabled (it holds no state).
+
+
+class MetricsRegistry:
+    '''
+    Holds the metrics by name and labels and exports them in the Prometheus text format.
+    '''
+    __metrics = None  # dict: name -> [type, help, dict: labels -> metric]
+    __lock = None
+    __enabled = None
+
+    def __init__(self, enabled=None):
+        '''
+        :param enabled: boolean [optional]; default: True only if the ELGAMALREDIS_METRICS environment variable is 1.
+        '''
+        if enabled is None:
+            enabled = os.environ.get(ENABLE_VARIABLE, '0').lower() in ('1', 'true', 'yes')
+        assert isinstance(enabled, bool)
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+        self.__enabled = enabled
+
+    def isEnabled(self):
+        return self.__enabled
+
+    def setEnabled(self, enabled):
+        assert isinstance(enabled, bool)
+        self.__enabled = enabled
+
+    def __get(self, kind, factory, name, help, labels):
+        key = tuple(sorted(labels.items()))
+        family = self.__metrics.get(name)
+        if family is None or key not in family[2]:
+            with self.__lock:
+                family = self.__metrics.setdefault(name, [kind, help, {}])
+                assert family[0] == kind, name + ' is already registered as a ' + family[0]
+                family[2].setdefault(key, factory())
+        return family[2][key]
+
+    def counter(self, name, help='', **labels):
+        '''
+        :param name: string; the metric name.
+        :param help: string; the metric description.
+        :param labels: the metric labels.
+        :return: Counter().
+        '''
+        return self.__get('counter', Counter, name, help, labels)
+
+    def histogram(self, name, help='', buckets=DEFAULT_BUCKETS, **labels):
+        '''
+        :param name: string; the metric name.
+        :param help: string; the metric description.
+        :param buckets: tuple of floats; the bucket upper bounds.
+        :param labels: the metric labels.
+        :return: Histogram().
+        '''
+        return self.__get('histogram', lambda: Histogram(buckets), name, help, labels)
+
+    def inc(self, name, amount=1, **labels):
+        '''
+        Increments a counter, if metrics are enabled.
+        '''
+        if self.__enabled:
+            self.counter(name, **labels).inc(amount)
+
+    def timer(self, name, **labels):
+        '''
+        :param name: string; the name of the histogram of the durations, in seconds.
+        :param labels: the metric labels.
+        :return: Timer(); a context manager.
+        '''
+        if not self.__enabled:
+            return NULL_TIMER
+        return Timer(self.histogram(name, **labels))
+
+    def timed(self, name, **labels):
+        '''
+        Decorator timing every call of the decorated function.
+        The histogram is looked up on the first timed call only: the labels are fixed at decoration time.
+        :param name: string; the name of the histogram of the durations, in seconds.
+        :param labels: the metric labels.
+        :return: decorator.
+        '''
+        registry = self
+        histograms = []  # The histogram, once looked up.
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not registry.__enabled:
+                    return function(*args, **kwargs)
+                if not histograms:
+                    histograms.append(registry.histogram(name, **labels))
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    histograms[0].observe(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def exportPrometheus(self):
+        '''
+        :return: string; all the metrics in the Prometheus text exposition format.
+        '''
+        lines = []
+        with self.__lock:
+            families = [(name, family[0], family[1], list(family[2].items()))
+                        for name, family in sorted(self.__metrics.items())]
+        for name, kind, help, metrics in families:
+            if help:
+                lines.append('# HELP ' + name + ' ' + help)
+            lines.append('# TYPE ' + name + ' ' + kind)
+            for labels, metric in metrics:
+                lines.extend(metric.export(name, labels))
+        return '\n'.join(lines) + '\n'
+
+    def startHttpServer(self, port=9100, host='127.0.0.1'):
+        '''
+        Serves the metrics on http://host:port/metrics from a daemon thread, enabling them.
+        :param port: integer.
+        :param host: string.
+        :return: ThreadingHTTPServer; call shutdown() on it to stop serving.
+        '''
+        self.setEnabled(True)
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.exportPrometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def startPeriodicDump(self, path, interval=60.0):
+        '''
+        Writes the metrics to path every interval seconds, from a daemon thread, enabling them.
+        :param path: string.
+        :param interval: float; seconds.
+        :return: threading.Event; set it to stop dumping.
+        '''
+        assert isinstance(path, str)
+        self.setEnabled(True)
+        stop = threading.Event()
+
+        def dump():
+            while not stop.wait(interval):
+                with open(path, 'w') as file:
+                    file.write(self.exportPrometheus())
+
+        threading.Thread(target=dump, daemon=True).start()
+        return stop
+
+
+class Profiler:
+    '''
+    Sampling/deterministic profiler that can be switched on and off while the process runs.
+    pyinstrument (sampling) is used if it is installed, cProfile otherwise.
+    '''
+    __profiler = None
+    __backend = None
+    __lock = None
+
+    def __init__(self, backend=None):
+        '''
+        :param backend: string [optional]; 'pyinstrument' or 'cProfile' (default: pyinstrument if installed).
+        '''
+        if backend is None:
+            try:
+                import pyinstrument  # noqa: F401
+                backend = 'pyinstrument'
+            except ImportError:
+                backend = 'cProfile'
+        assert backend in ('pyinstrument', 'cProfile')
+        self.__backend = backend
+        self.__lock = threading.Lock()
+
+    def getBackend(self):
+        return self.__backend
+
+    def isRunning(self):
+        return self.__profiler is not None
+
+    def start(self):
+        with self.__lock:
+            if self.__profiler is not None:
+                return
+            if self.__backend == 'pyinstrument':
+                import pyinstrument
+                self.__profiler = pyinstrument.Profiler()
+                self.__profiler.start()
+            else:
+                import cProfile
+                self.__profiler = cProfile.Profile()
+                self.__profiler.enable()
+
+    def stop(self):
+        '''
+        Stops profiling.
+        :return: string; the profile report (empty if the profiler was not running).
+        '''
+        with self.__lock:
+            profiler = self.__profiler
+            self.__profiler = None
+        if profiler is None:
+            return ''
+        if self.__backend == 'pyinstrument':
+            profiler.stop()
+            return profiler.output_text()
+        import pstats
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(30)
+        return out.getvalue()
+
+    def toggle(self):
+        '''
+        Starts the profiler if it is stopped, stops it otherwise.
+        :return: string; the report if the profiler has been stopped, '' otherwise.
+        '''
+        if self.isRunning():
+            return self.stop()
+        self.start()
+        return ''
+
+    def installSignalToggle(self, signum, reportPath):
+        '''
+        Toggles the profiler when the process receives signum (e.g. signal.SIGUSR1), writing reports to reportPath.
+        :param signum: integer; the signal number.
+        :param reportPath: string.
+        :return:
+        '''
+        import signal
+
+        def handler(receivedSignum, frame):
+            report = self.toggle()
+            if report:
+                with open(reportPath, 'w') as file:
+                    file.write(report)
+
+        signal.signal(signum, handler)
+
+
+# The registry used by ElGamal, IndexCalculusDiscreteLogSolver and Redis; disabled unless ELGAMALREDIS_METRICS=1.
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,550 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+from Redis import RedisChannel
+from collections import deque
+import fnmatch
+import hashlib
+import bisect
+import logging
+import socket
+import socketserver
+import threading
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_OUTPUT_LIMIT = 32 * 1024 * 1024  # Bytes of messages queued on a subscriber before it is dropped.
+
+'''
+A minimal Redis stand-in speaking RESP over TCP, for tests and load runs on machines without redis-server.
+It implements the commands used by RedisChannel (strings, lists, pub/sub, SCAN, pipelines) in memory, with a single
+global lock like the single-threaded server, over RESP2 or RESP3 (HELLO 3, the default of recent redis-py clients).
+There is no Lua: the scripts of RedisChannel are recognized by their SHA1 digest and run as their Python equivalents;
+any other script fails with NOSCRIPT.
+Each connection has a writer thread: replies and published messages are only queued on it, so neither the global lock
+nor a PUBLISH caller ever waits on a slow client. Like the client-output-buffer-limit of Redis, a subscriber with more
+than SUBSCRIBER_OUTPUT_LIMIT bytes of messages waiting is disconnected.
+'''
+
+
+class ResponseError(Exception):
+    '''
+    Sent to the client as a RESP error.
+    '''
+    pass
+
+
+def sha1(source):
+    return hashlib.sha1(source.encode('utf-8') if isinstance(source, str) else source).hexdigest()
+
+
+class LocalRedisServer:
+    '''
+    In-memory RESP server, serving each connection from its own thread.
+    '''
+    __server = None  # socketserver.ThreadingTCPServer()
+    __thread = None
+    __lock = None
+    __data = None  # dict: bytes -> bytes (string) or list of bytes (list).
+    __subscribers = None  # dict: channel (bytes) -> set of connection handlers.
+    __scripts = None  # dict: SHA1 digest -> Python implementation.
+
+    def __init__(self, host='127.0.0.1', port=0):
+        '''
+        :param host: string.
+        :param port: integer; 0 picks a free port (see getPort).
+        '''
+        assert isinstance(host, str)
+        assert isinstance(port, int)
+        self.__lock = threading.RLock()
+        self.__data = {}
+        self.__subscribers = {}
+        self.__scripts = {
+            sha1(RedisChannel.CLAIM_SCRIPT): self.__claimScript,
+            sha1(RedisChannel.PUBLISH_IF_ABSENT_SCRIPT): self.__publishIfAbsentScript,
+            sha1(RedisChannel.BOUNDED_PUSH_SCRIPT): self.__boundedPushScript,
+            sha1(RedisChannel.REQUEUE_SCRIPT): self.__requeueScript,
+        }
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def setup(self):
+                super().setup()
+                self.ready = threading.Condition()
+                self.outbox = deque()  # bytes waiting to be written by the writer thread, in order.
+                self.queued = 0  # Length of the bytes in outbox.
+                self.closed = False
+                self.channels = set()
+                self.protocol = 2
+                self.writer = threading.Thread(target=self.write, daemon=True)
+                self.writer.start()
+
+            def write(self):
+                while True:
+                    with self.ready:
+                        while not self.outbox and not self.closed:
+                            self.ready.wait()
+                        if not self.outbox:
+                            return
+                        data = b''.join(self.outbox)
+                        self.outbox.clear()
+                        self.queued = 0
+                    try:
+                        self.wfile.write(data)
+                        self.wfile.flush()
+                    except (OSError, ValueError):  # The client went away: the reading thread cleans up.
+                        self.drop()
+                        return
+
+            def send(self, data, limit=None):
+                '''
+                Queues data for the writer thread; it never blocks on the socket.
+                :param data: bytes.
+                :param limit: integer (optional); drops the connection if more bytes than limit would be waiting.
+                :return:
+                '''
+                with self.ready:
+                    if self.closed or not data:
+                        return
+                    if limit is not None and self.queued + len(data) > limit:
+                        logger.warning('Dropping a subscriber with %d bytes of messages waiting.', self.queued)
+                        self.outbox.clear()
+                        self.drop()
+                        return
+                    self.outbox.append(data)
+                    self.queued += len(data)
+                    self.ready.notify()
+
+            def drop(self):
+                with self.ready:
+                    self.closed = True
+                    self.ready.notify()
+                try:
+                    self.request.shutdown(socket.SHUT_RDWR)  # Wakes the reading thread (and a blocked writer).
+                except OSError:
+                    pass
+
+            def finish(self):
+                with self.ready:  # The writer sends what is left (e.g. the reply to QUIT), then stops.
+                    self.closed = True
+                    self.ready.notify()
+                self.writer.join(timeout=1.0)
+                if self.writer.is_alive():  # Blocked on a client that does not read.
+                    self.drop()
+                    self.writer.join()
+                super().finish()
+
+            def handle(self):
+                try:
+                    while True:
+                        command = readCommand(self.rfile)
+                        if command is None:
+                            return
+                        self.send(server.execute(self, command))
+                except (ConnectionError, OSError):
+                    pass
+                finally:
+                    server.unsubscribeAll(self)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.__server = Server((host, port), Handler)
+
+    def getHost(self):
+        return self.__server.server_address[0]
+
+    def getPort(self):
+        return self.__server.server_address[1]
+
+    def start(self):
+        '''
+        Serves from a daemon thread.
+        :return: LocalRedisServer(); self.
+        '''
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        logger.info('Local Redis stand-in listening on %s:%d.', self.getHost(), self.getPort())
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+        return False
+
+    def execute(self, handler, command):
+        '''
+        :param handler: the connection handler.
+        :param command: list of bytes; the command name and its arguments.
+        :return: bytes; the RESP reply.
+        '''
+        name = command[0].upper().decode('utf-8', 'replace')
+        args = command[1:]
+        protocol = handler.protocol
+        if name == 'SUBSCRIBE':
+            self.__subscribe(handler, args)
+            return b''  # The replies are queued on handler, before any message published after the subscription.
+        if name == 'UNSUBSCRIBE':
+            self.__unsubscribe(handler, args)
+            return b''
+        if name == 'HELLO':
+            if args and args[0] not in (b'2', b'3'):
+                return encode(ResponseError('NOPROTO unsupported protocol version'), protocol)
+            if args:
+                handler.protocol = protocol = int(args[0])
+            info = [b'server', b'redis', b'version', b'7.0.0', b'proto', protocol, b'id', 1, b'mode',
+                    b'standalone', b'role', b'master', b'modules', []]
+            return encode(Map(info) if protocol == 3 else info, protocol)
+        function = getattr(self, '_command' + name.capitalize(), None)
+        if function is None:
+            return encode(ResponseError("ERR unknown command '" + name.lower() + "'"), protocol)
+        try:
+            with self.__lock:
+                return encode(function(*args), protocol)
+        except ResponseError as error:
+            return encode(error, protocol)
+        except (TypeError, ValueError, IndexError) as error:
+            return encode(ResponseError('ERR ' + str(error)), protocol)
+
+    # Subscriptions.
+
+    def __subscribe(self, handler, channels):
+        with self.__lock:
+            for channel in channels:
+                self.__subscribers.setdefault(channel, set()).add(handler)
+                handler.channels.add(channel)
+                handler.send(encode(Push([b'subscribe', channel, len(handler.channels)]), handler.protocol))
+
+    def __unsubscribe(self, handler, channels):
+        with self.__lock:
+            if not channels and not handler.channels:
+                handler.send(encode(Push([b'unsubscribe', None, 0]), handler.protocol))
+            for channel in (channels or list(handler.channels)):
+                self.__subscribers.get(channel, set()).discard(handler)
+                handler.channels.discard(channel)
+                handler.send(encode(Push([b'unsubscribe', channel, len(handler.channels)]), handler.protocol))
+
+    def unsubscribeAll(self, handler):
+        with self.__lock:
+            for channel in list(handler.channels):
+                self.__subscribers.get(channel, set()).discard(handler)
+            handler.channels.clear()
+
+    def publish(self, channel, message):
+        '''
+        Queues message on the subscribers of channel (their writer threads send it); called with the global lock held.
+        :return: integer; the number of subscribers message was queued on.
+        '''
+        data = {2: encode([b'message', channel, message], 2), 3: encode(Push([b'message', channel, message]), 3)}
+        handlers = self.__subscribers.get(channel, ())
+        for handler in handlers:
+            handler.send(data[handler.protocol], limit=SUBSCRIBER_OUTPUT_LIMIT)
+        return len(handlers)
+
+    # Helpers.
+
+    def __getList(self, key, create=False):
+        value = self.__data.get(key)
+        if value is None:
+            if not create:
+                return []
+            value = self.__data[key] = []
+        if not isinstance(value, list):
+            raise ResponseError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def __dropIfEmpty(self, key):
+        if self.__data.get(key) == []:
+            del self.__data[key]
+
+    def __rpoplpush(self, source, destination):
+        items = self.__getList(source)
+        if not items:
+            return None
+        item = items.pop()
+        self.__dropIfEmpty(source)
+        self.__getList(destination, create=True).insert(0, item)
+        return item
+
+    # Scripts (the Python equivalents of the Lua scripts of RedisChannel).
+
+    def __claimScript(self, keys, args):
+        items = []
+        for _ in range(0, int(args[0])):
+            item = self.__rpoplpush(keys[0], keys[1])
+            if item is None:
+                break
+            items.append(item)
+        return items
+
+    def __publishIfAbsentScript(self, keys, args):
+        if keys[0] in self.__data:
+            return 0
+        self.__data[keys[0]] = args[0]
+        self.publish(args[1], args[0])
+        return 1
+
+    def __boundedPushScript(self, keys, args):
+        items = self.__getList(keys[0], create=True)
+        if len(items) >= int(args[1]):
+            self.__dropIfEmpty(keys[0])
+            return 0
+        items.append(args[0])
+        return len(items)
+
+    def __requeueScript(self, keys, args):
+        moved = 0
+        while moved < int(args[0]) and self.__rpoplpush(keys[0], keys[1]) is not None:
+            moved += 1
+        return moved
+
+    # Commands: _command<Name>(*args), called with the global lock held.
+
+    def _commandPing(self, message=None):
+        return SimpleString('PONG') if message is None else message
+
+    def _commandEcho(self, message):
+        return message
+
+    def _commandQuit(self):
+        return SimpleString('OK')
+
+    def _commandSelect(self, db):
+        return SimpleString('OK')
+
+    def _commandClient(self, *args):
+        return SimpleString('OK')
+
+    def _commandInfo(self, *args):
+        return b'# Server\r\nredis_version:7.0.0\r\nredis_mode:standalone\r\n# Keyspace\r\n' + \
+            ('db0:keys=' + str(len(self.__data)) + ',expires=0\r\n').encode('utf-8')
+
+    def _commandFlushall(self, *args):
+        self.__data.clear()
+        return SimpleString('OK')
+
+    def _commandFlushdb(self, *args):
+        return self._commandFlushall()
+
+    def _commandDbsize(self):
+        return len(self.__data)
+
+    def _commandExists(self, *keys):
+        return sum(1 for key in keys if key in self.__data)
+
+    def _commandDel(self, *keys):
+        return sum(1 for key in keys if self.__data.pop(key, None) is not None)
+
+    def _commandSet(self, key, value, *options):
+        self.__data[key] = value
+        return SimpleString('OK')
+
+    def _commandSetnx(self, key, value):
+        if key in self.__data:
+            return 0
+        self.__data[key] = value
+        return 1
+
+    def _commandGet(self, key):
+        value = self.__data.get(key)
+        if isinstance(value, list):
+            raise ResponseError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def _commandMget(self, *keys):
+        return [value if isinstance(value, bytes) else None for value in (self.__data.get(key) for key in keys)]
+
+    def _commandPublish(self, channel, message):
+        return self.publish(channel, message)
+
+    def _commandRpush(self, key, *values):
+        items = self.__getList(key, create=True)
+        items.extend(values)
+        return len(items)
+
+    def _commandLpush(self, key, *values):
+        items = self.__getList(key, create=True)
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    def _commandRpop(self, key):
+        items = self.__getList(key)
+        if not items:
+            return None
+        item = items.pop()
+        self.__dropIfEmpty(key)
+        return item
+
+    def _commandLpop(self, key):
+        items = self.__getList(key)
+        if not items:
+            return None
+        item = items.pop(0)
+        self.__dropIfEmpty(key)
+        return item
+
+    def _commandRpoplpush(self, source, destination):
+        return self.__rpoplpush(source, destination)
+
+    def _commandLlen(self, key):
+        return len(self.__getList(key))
+
+    def _commandLrange(self, key, start, end):
+        items = self.__getList(key)
+        start = int(start)
+        end = int(end)
+        if start < 0:
+            start = max(len(items) + start, 0)
+        if end < 0:
+            end = len(items) + end
+        return items[start:end + 1]
+
+    def _commandLrem(self, key, count, value):
+        items = self.__getList(key)
+        count = int(count)
+        removed = 0
+        order = range(0, len(items)) if count >= 0 else range(len(items) - 1, -1, -1)
+        for i in list(order):
+            if count != 0 and removed == abs(count):
+                break
+            if items[i] == value:
+                items[i] = None
+                removed += 1
+        items[:] = [item for item in items if item is not None]
+        self.__dropIfEmpty(key)
+        return removed
+
+    def _commandScan(self, cursor, *options):
+        pattern = b'*'
+        count = 10
+        for i in range(0, len(options) - 1, 2):
+            option = options[i].upper()
+            if option == b'MATCH':
+                pattern = options[i + 1]
+            elif option == b'COUNT':
+                count = int(options[i + 1])
+        # The cursor encodes the last key returned (0x01 + key, as an integer), and the next page starts after it: keys
+        # added or deleted between two calls do not shift the pages, so no key present throughout is skipped.
+        names = sorted(self.__data.keys())
+        cursor = int(cursor)
+        start = 0
+        if cursor:
+            last = cursor.to_bytes((cursor.bit_length() + 7) // 8, 'big')[1:]
+            start = bisect.bisect_right(names, last)
+        page = names[start:start + count]
+        nextCursor = int.from_bytes(b'\x01' + page[-1], 'big') if start + count < len(names) else 0
+        pattern = pattern.decode('utf-8', 'replace')
+        return [str(nextCursor).encode('utf-8'),
+                [name for name in page if fnmatch.fnmatchcase(name.decode('utf-8', 'replace'), pattern)]]
+
+    def _commandScript(self, subcommand, *args):
+        subcommand = subcommand.upper()
+        if subcommand == b'LOAD':
+            digest = sha1(args[0])
+            if digest not in self.__scripts:
+                raise ResponseError('ERR only the scripts of RedisChannel are supported by the local stand-in')
+            return digest.encode('utf-8')
+        if subcommand == b'EXISTS':
+            return [1 if arg.decode('utf-8') in self.__scripts else 0 for arg in args]
+        if subcommand == b'FLUSH':
+            return SimpleString('OK')
+        raise ResponseError('ERR unknown SCRIPT subcommand')
+
+    def _commandEvalsha(self, digest, numKeys, *args):
+        script = self.__scripts.get(digest.decode('utf-8').lower())
+        if script is None:
+            raise ResponseError('NOSCRIPT No matching script. Please use EVAL.')
+        numKeys = int(numKeys)
+        return script(list(args[0:numKeys]), list(args[numKeys:]))
+
+    def _commandEval(self, source, numKeys, *args):
+        return self._commandEvalsha(sha1(source).encode('utf-8'), numKeys, *args)
+
+
+class SimpleString(str):
+    '''
+    A RESP simple string reply (e.g. +OK), as opposed to a bulk string.
+    '''
+    pass
+
+
+class Map(list):
+    '''
+    A RESP3 map reply, given as the list [key1, value1, key2, value2, ...] (a plain array in RESP2).
+    '''
+    pass
+
+
+class Push(list):
+    '''
+    A RESP3 out of band push (pub/sub messages; a plain array in RESP2).
+    '''
+    pass
+
+
+def encode(value, protocol=2):
+    '''
+    :param value: the reply: None, integer, bytes, string, list (or Map, Push) or ResponseError.
+    :param protocol: integer; 2 or 3.
+    :return: bytes; the RESP encoding.
+    '''
+    if value is None:
+        return b'_\r\n' if protocol == 3 else b'$-1\r\n'
+    if isinstance(value, ResponseError):
+        return b'-' + str(value).encode('utf-8') + b'\r\n'
+    if isinstance(value, SimpleString):
+        return b'+' + value.encode('utf-8') + b'\r\n'
+    if isinstance(value, bool) or isinstance(value, int):
+        return b':' + str(int(value)).encode('utf-8') + b'\r\n'
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(value, bytes):
+        return b'$' + str(len(value)).encode('utf-8') + b'\r\n' + value + b'\r\n'
+    assert isinstance(value, list)
+    prefix = b'*'
+    length = len(value)
+    if protocol == 3 and isinstance(value, Map):
+        prefix = b'%'
+        length //= 2
+    elif protocol == 3 and isinstance(value, Push):
+        prefix = b'>'
+    return prefix + str(length).encode('utf-8') + b'\r\n' + b''.join(encode(elem, protocol) for elem in value)
+
+
+def readCommand(rfile):
+    '''
+    :param rfile: binary file-like object.
+    :return: list of bytes, or None when the connection is closed.
+    '''
+    line = rfile.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):  # Inline command.
+        return line.split() or readCommand(rfile)
+    command = []
+    for _ in range(0, int(line[1:])):
+        header = rfile.readline()
+        if not header.startswith(b'$'):
+            raise ConnectionError('Protocol error.')
+        length = int(header[1:])
+        command.append(rfile.read(length + 2)[0:length])
+    return command
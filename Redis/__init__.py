@@ -12,9 +12,51 @@ See the License for the specific language governing permissions and limitations
 '''
 
 # Dependencies
-import redis
+import logging
+from Metrics import REGISTRY as metrics
+
+logger = logging.getLogger(__name__)
 
 class RedisChannel:
+    # Lua scripts run atomically on the server; they are loaded once with SCRIPT LOAD and invoked via EVALSHA.
+    # KEYS[1] = source queue, KEYS[2] = processing queue; ARGV[1] = maximum number of items to claim.
+    CLAIM_SCRIPT = '''
+local items = {}
+for i = 1, tonumber(ARGV[1]) do
+    local item = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+    if not item then
+        break
+    end
+    items[#items + 1] = item
+end
+return items
+'''
+    # KEYS[1] = variable name; ARGV[1] = value, ARGV[2] = channel to notify.
+    PUBLISH_IF_ABSENT_SCRIPT = '''
+if redis.call('SETNX', KEYS[1], ARGV[1]) == 1 then
+    redis.call('PUBLISH', ARGV[2], ARGV[1])
+    return 1
+end
+return 0
+'''
+    # KEYS[1] = queue; ARGV[1] = item, ARGV[2] = maximum queue length.
+    BOUNDED_PUSH_SCRIPT = '''
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+return redis.call('RPUSH', KEYS[1], ARGV[1])
+'''
+    # KEYS[1] = processing queue, KEYS[2] = source queue; ARGV[1] = maximum number of items to move back.
+    REQUEUE_SCRIPT = '''
+local moved = 0
+for i = 1, tonumber(ARGV[1]) do
+    if not redis.call('RPOPLPUSH', KEYS[1], KEYS[2]) then
+        break
+    end
+    moved = moved + 1
+end
+return moved
+'''
     __host = None  # The default value is localhost
     __password = None
     __db = None  # This is the database we are using
@@ -22,6 +64,7 @@ class RedisChannel:
     __inputChannel = None  # The channel we eventually want to listen to
     __outputChannel = None  # The channel we have to put outputs into
     __redis = None  # Redis object
+    __scripts = None  # dict: script name -> [source, SHA1 digest]
 
     def __init__(self, host='127.0.0.1', password='', db=0, port=6379, inChannel='CommunicationChannel', outChannel='CommunicationChannel'):
         assert isinstance(host, str)
@@ -36,6 +79,12 @@ class RedisChannel:
         self.__port = port
         self.__inputChannel = inChannel
         self.__outputChannel = outChannel
+        self.__scripts = {
+            'claim': [self.CLAIM_SCRIPT, None],
+            'publishIfAbsent': [self.PUBLISH_IF_ABSENT_SCRIPT, None],
+            'boundedPush': [self.BOUNDED_PUSH_SCRIPT, None],
+            'requeue': [self.REQUEUE_SCRIPT, None],
+        }
 
     def getHost(self):
         return self.__host
@@ -83,44 +132,197 @@ class RedisChannel:
         self.__outputChannel = newOutputChannel
 
     def connect(self):
+        import redis  # Imported here: processes that never connect do not pay for the client library.
         self.__redis = redis.Redis(host=self.__host, port=self.__port, db=self.__db, password=self.__password)
         if self.__redis.info():
-            print('Successfully Connected to Redis.')
+            logger.info('Successfully Connected to Redis.')
         else:
-            print('Redis Connection Failed!')
+            logger.error('Redis Connection Failed!')
+        self.loadScripts()
 
+    def loadScripts(self):
+        '''
+        Registers the Lua scripts on the server (SCRIPT LOAD), keeping their SHA1 digests for EVALSHA.
+        :return:
+        '''
+        for name in self.__scripts.keys():
+            self.__scripts[name][1] = self.__redis.script_load(self.__scripts[name][0])
+
+    def __runScript(self, name, keys, args):
+        '''
+        Runs a registered script via EVALSHA, reloading it if the server has lost it (e.g. after SCRIPT FLUSH or a
+        restart).
+        :param name: string; the script name.
+        :param keys: list of strings; the keys the script touches.
+        :param args: list; the script arguments.
+        :return: the script result.
+        '''
+        import redis
+        source, sha = self.__scripts[name]
+        if sha is None:
+            sha = self.__scripts[name][1] = self.__redis.script_load(source)
+        try:
+            return self.__redis.evalsha(sha, len(keys), *keys, *args)
+        except redis.exceptions.NoScriptError:
+            self.__scripts[name][1] = self.__redis.script_load(source)
+            return self.__redis.evalsha(self.__scripts[name][1], len(keys), *keys, *args)
+
+    @metrics.timed('redis_command_seconds', command='publish')
     def redisPublish(self, toPublish):
         str(toPublish)
         self.__redis.publish(channel=self.__outputChannel, message=toPublish)
 
+    @metrics.timed('redis_command_seconds', command='rpush')
     def addToRedisQueue(self, queueName, item):
         assert isinstance(queueName, str)
         str(item)
         self.__redis.rpush(queueName, item)
 
+    @metrics.timed('redis_command_seconds', command='rpop')
     def takeFromRedisQueue(self, queueName):
         assert isinstance(queueName, str)
         item = self.__redis.rpop(queueName)
         return item
 
+    @metrics.timed('redis_command_seconds', command='bounded_push')
+    def addToBoundedRedisQueue(self, queueName, item, maxLength):
+        '''
+        Pushes item into queueName only if the queue holds less than maxLength items (atomically).
+        :param queueName: string.
+        :param item: the item to push.
+        :param maxLength: integer; the maximum queue length.
+        :return: integer; the new queue length, or 0 if the queue is full.
+        '''
+        assert isinstance(queueName, str)
+        assert isinstance(maxLength, int)
+        assert maxLength > 0
+        return self.__runScript('boundedPush', keys=[queueName], args=[item, maxLength])
+
+    @metrics.timed('redis_command_seconds', command='claim')
+    def claimFromRedisQueue(self, queueName, processingQueueName, count=1):
+        '''
+        Atomically moves up to count items from queueName into processingQueueName, with a single round trip.
+        Items stay in processingQueueName until they are acknowledged, so they are not lost if the consumer crashes.
+        :param queueName: string; the queue to take items from.
+        :param processingQueueName: string; the queue holding the items in progress.
+        :param count: integer; the maximum number of items to claim.
+        :return: list; the claimed items (empty if queueName is empty).
+        '''
+        assert isinstance(queueName, str)
+        assert isinstance(processingQueueName, str)
+        assert isinstance(count, int)
+        assert count > 0
+        return self.__runScript('claim', keys=[queueName, processingQueueName], args=[count])
+
+    @metrics.timed('redis_command_seconds', command='acknowledge')
+    def acknowledgeRedisQueueItems(self, processingQueueName, items):
+        '''
+        Removes processed items from processingQueueName.
+        :param processingQueueName: string.
+        :param items: list; the items returned by claimFromRedisQueue.
+        :return:
+        '''
+        assert isinstance(processingQueueName, str)
+        assert isinstance(items, list)
+        pipe = self.__redis.pipeline(transaction=False)
+        for item in items:
+            pipe.lrem(processingQueueName, 1, item)
+        pipe.execute()
+
+    @metrics.timed('redis_command_seconds', command='requeue')
+    def requeueRedisQueue(self, processingQueueName, queueName, batchSize=1000):
+        '''
+        Moves the items left in processingQueueName (e.g. by a crashed consumer) back into queueName.
+        Each script call moves at most batchSize items, so a long queue never blocks the server for long.
+        :param processingQueueName: string.
+        :param queueName: string.
+        :param batchSize: integer; the maximum number of items moved per round trip.
+        :return: integer; the number of requeued items.
+        '''
+        assert isinstance(processingQueueName, str)
+        assert isinstance(queueName, str)
+        assert isinstance(batchSize, int)
+        assert batchSize > 0
+        moved = 0
+        while True:
+            batch = self.__runScript('requeue', keys=[processingQueueName, queueName], args=[batchSize])
+            moved += batch
+            if batch < batchSize:
+                return moved
+
+    @metrics.timed('redis_command_seconds', command='llen')
+    def getRedisQueueLength(self, queueName):
+        assert isinstance(queueName, str)
+        return self.__redis.llen(queueName)
+
+    @metrics.timed('redis_command_seconds', command='lrange')
     def readRedisQueue(self, queueName):
         assert isinstance(queueName, str)
-        list = self.__redis.lrange(name=queueName, start=0, end=[-1])
+        list = self.__redis.lrange(name=queueName, start=0, end=-1)
         return list
 
+    @metrics.timed('redis_command_seconds', command='lrange')
     def readRedisQueueLastElem(self, queueName):
         assert isinstance(queueName, str)
         item = self.__redis.lrange(name=queueName, start=-1, end=-1)[0]
         return item
 
+    @metrics.timed('redis_command_seconds', command='set')
     def setRedisVariable(self, varName, varValue):
         assert isinstance(varName, str)
         self.__redis.set(name=varName, value=varValue)
 
+    @metrics.timed('redis_command_seconds', command='publish_if_absent')
+    def publishRedisVariable(self, varName, varValue):
+        '''
+        Sets varName only if it does not exist yet and, in that case, publishes varValue on the output channel.
+        Both steps happen atomically on the server.
+        :param varName: string.
+        :param varValue: the value.
+        :return: boolean; True if the variable was set and published.
+        '''
+        assert isinstance(varName, str)
+        return self.__runScript('publishIfAbsent', keys=[varName], args=[varValue, self.__outputChannel]) == 1
+
+    @metrics.timed('redis_command_seconds', command='get')
     def getRedisVariable(self, varName):
         assert isinstance(varName, str)
         value = self.__redis.get(name=varName)
         return value
 
+    def scanRedisKeys(self, pattern='*', count=1000):
+        '''
+        Iterates the keyspace with SCAN, one batch per round trip, so it never blocks the server nor holds every key.
+        As SCAN guarantees, a key may be returned more than once.
+        :param pattern: string; the MATCH pattern.
+        :param count: integer; the COUNT hint (keys examined per round trip).
+        :return: generator of lists of strings (one list per SCAN call).
+        '''
+        assert isinstance(pattern, str)
+        assert isinstance(count, int)
+        assert count > 0
+        cursor = 0
+        while True:
+            with metrics.timer('redis_command_seconds', command='scan'):
+                cursor, names = self.__redis.scan(cursor=cursor, match=pattern, count=count)
+            if names:
+                yield [name.decode('utf-8') if isinstance(name, bytes) else name for name in names]
+            if int(cursor) == 0:
+                return
+
+    @metrics.timed('redis_command_seconds', command='get_pipeline')
+    def getRedisVariables(self, varNames):
+        '''
+        GETs many variables with a single round trip (pipelined).
+        :param varNames: list of strings.
+        :return: list; the values, None for missing keys and for keys that do not hold a string (e.g. queues).
+        '''
+        assert isinstance(varNames, list)
+        pipe = self.__redis.pipeline(transaction=False)
+        for varName in varNames:
+            pipe.get(name=varName)
+        values = pipe.execute(raise_on_error=False)
+        return [None if isinstance(value, Exception) else value for value in values]
+
     def cleanRedisMemory(self):
         self.__redis.flushall()
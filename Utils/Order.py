@@ -0,0 +1,243 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+from Utils import Random
+from collections import OrderedDict
+import math
+
+'''
+Orders in the multiplicative group mod p, without sympy: p - 1 is factored once per prime (trial division, then
+Pollard rho) and cached, so the order of any a costs one exponentiation per prime factor of p - 1.
+'''
+
+
+def primesBelow(n):
+    '''
+    :param n: integer.
+    :return: list of the primes smaller than n (sieve of Eratosthenes).
+    '''
+    sieve = bytearray([1]) * n
+    sieve[0:2] = b'\x00\x00'
+    for i in range(2, math.isqrt(n) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, n, i)))
+    return [i for i in range(0, n) if sieve[i]]
+
+
+SMALL_PRIMES = primesBelow(1000)
+MILLER_RABIN_BASES = SMALL_PRIMES[0:13]  # Deterministic for n < 3.3 * 10^24.
+MILLER_RABIN_LIMIT = 3317044064679887385961981
+CACHE_SIZE = 1024  # Primes whose p - 1 factorization is kept.
+RHO_ITERATIONS = 1 << 16  # Per composite: beyond this, its factors are considered too big to find.
+
+factorCache = OrderedDict()  # p -> (dict {q: exponent}, unfactored part of p - 1), least recently used first.
+
+
+def isProbablePrime(n, rounds=8):
+    '''
+    Miller-Rabin test: exact for n < 3.3 * 10^24, otherwise wrong with probability below 4^(-rounds) on top of the
+    fixed bases.
+    :param n: integer.
+    :param rounds: integer; the random bases tried for big n.
+    :return: boolean.
+    '''
+    assert isinstance(n, int)
+    if n < 2:
+        return False
+    for q in SMALL_PRIMES:
+        if n % q == 0:
+            return n == q
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    bases = list(MILLER_RABIN_BASES)
+    if n >= MILLER_RABIN_LIMIT:
+        bases.extend(Random.getDefault().randomIntegers(2, n - 2, rounds))
+    for base in bases:
+        x = pow(base, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(0, s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def pollardRho(n, maxIterations=RHO_ITERATIONS):
+    '''
+    Brent's variant of Pollard rho.
+    :param n: odd composite integer.
+    :param maxIterations: integer.
+    :return: integer; a nontrivial factor of n, or None if none was found in maxIterations.
+    '''
+    for c in range(1, 10):
+        y = 2
+        r = 1
+        q = 1
+        g = 1
+        x = ys = y
+        iterations = 0
+        while g == 1 and iterations < maxIterations:
+            x = y
+            for _ in range(0, r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(0, min(128, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += 128
+            iterations += 2 * r
+            r *= 2
+        if g == 1:
+            return None
+        if g == n:  # The batched product hit 0 (mod n): redo the last steps one by one.
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+    return None
+
+
+def factorize(n, maxIterations=RHO_ITERATIONS):
+    '''
+    :param n: positive integer.
+    :param maxIterations: integer; the Pollard rho budget for each composite.
+    :return: dict {prime: exponent}; integer, the part of n that could not be factored (1 if none).
+    '''
+    assert isinstance(n, int)
+    assert n > 0
+    factors = {}
+    for q in SMALL_PRIMES:
+        while n % q == 0:
+            factors[q] = factors.get(q, 0) + 1
+            n //= q
+    unfactored = 1
+    stack = [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if isProbablePrime(m):
+            factors[m] = factors.get(m, 0) + 1
+            continue
+        d = pollardRho(m, maxIterations)
+        if d is None:
+            unfactored *= m
+        else:
+            stack.extend([d, m // d])
+    return dict(sorted(factors.items())), unfactored
+
+
+def registerFactorization(p, factors):
+    '''
+    Records a known factorization of p - 1 (e.g. of a prime built as 2 * q1 * ... * qk + 1).
+    :param p: integer (a prime number).
+    :param factors: dict {prime: exponent} whose product is p - 1.
+    :return:
+    '''
+    assert math.prod(q ** e for q, e in factors.items()) == p - 1
+    factorCache[p] = (dict(sorted(factors.items())), 1)
+    if len(factorCache) > CACHE_SIZE:
+        factorCache.popitem(last=False)
+
+
+def groupOrderFactors(p):
+    '''
+    :param p: integer (a prime number).
+    :return: dict {prime: exponent}; integer, the part of p - 1 that could not be factored (1 if none). Cached per p.
+    '''
+    if p in factorCache:
+        factorCache.move_to_end(p)
+        return factorCache[p]
+    factors, unfactored = factorize(p - 1)
+    factorCache[p] = (factors, unfactored)
+    if len(factorCache) > CACHE_SIZE:
+        factorCache.popitem(last=False)
+    return factors, unfactored
+
+
+def multiplicativeOrder(a, p):
+    '''
+    :param a: integer, coprime with p.
+    :param p: integer (a prime number) whose p - 1 can be fully factored.
+    :return: integer; the smallest n > 0 such that a^(n) = 1 (mod p).
+    '''
+    assert isinstance(a, int)
+    assert a % p != 0
+    factors, unfactored = groupOrderFactors(p)
+    if unfactored != 1:
+        raise Exception('p - 1 could not be fully factored!')
+    order = p - 1
+    for q in factors.keys():
+        while order % q == 0 and pow(a, order // q, p) == 1:
+            order //= q
+    return order
+
+
+def isGenerator(a, p):
+    '''
+    Cheap check that a does not lie in a small subgroup.
+    If p - 1 is fully factored, True means that a is a primitive root. Otherwise, True means that the order of a
+    contains every known prime power of p - 1 and a factor of its unfactored part (whose prime factors are all big).
+    :param a: integer.
+    :param p: integer (a prime number).
+    :return: boolean.
+    '''
+    assert isinstance(a, int)
+    if a % p in (0, 1, p - 1):
+        return False
+    factors, unfactored = groupOrderFactors(p)
+    for q in factors.keys():
+        if pow(a, (p - 1) // q, p) == 1:
+            return False
+    return unfactored == 1 or pow(a, (p - 1) // unfactored, p) != 1
+
+
+def generatePrime(bits, factorBits=64, randomSource=None):
+    '''
+    Builds a prime p = 2 * q1 * ... * qk + 1 of the given size, so the factorization of p - 1 is known (and registered).
+    :param bits: integer; the size of p.
+    :param factorBits: integer; the size of the qi.
+    :param randomSource: Random.EntropyPool() [optional].
+    :return: integer.
+    '''
+    assert isinstance(bits, int)
+    assert bits > 2 * factorBits
+    source = randomSource if randomSource is not None else Random.getDefault()
+    while True:
+        factors = {2: 1}
+        m = 2
+        while (m << (2 * factorBits)).bit_length() <= bits:
+            q = source.randomInteger(1 << (factorBits - 1), (1 << factorBits) - 1) | 1
+            while not isProbablePrime(q):
+                q = source.randomInteger(1 << (factorBits - 1), (1 << factorBits) - 1) | 1
+            factors[q] = factors.get(q, 0) + 1
+            m *= q
+        # The last factor (of factorBits + 1 to 2 * factorBits bits) fills the missing bits.
+        lastBits = bits - m.bit_length()
+        for _ in range(0, 100 * lastBits):
+            q = source.randomInteger(1 << (lastBits - 1), (1 << lastBits) - 1) | 1
+            p = m * q + 1
+            if p.bit_length() == bits and isProbablePrime(q) and isProbablePrime(p):
+                factors[q] = factors.get(q, 0) + 1
+                registerFactorization(p, factors)
+                return p
@@ -0,0 +1,187 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import os
+import random
+import threading
+import weakref
+
+
+class EntropyPool:
+    '''
+    Uniform random integers served from a buffer of random bytes: one os.urandom() call feeds many draws.
+    Each thread has its own buffer, so no lock is taken and two threads never get the same bytes.
+    With a seed, the buffer is filled by a deterministic generator instead (for benchmarks and reproducible runs only:
+    it is not secure).
+    '''
+    __poolSize = None
+    __local = None  # threading.local(): buffer (bytes) and offset (the first unused byte of buffer).
+    __generator = None  # random.Random() in seeded mode; None reads os.urandom().
+
+    def __init__(self, seed=None, poolSize=4096):
+        '''
+        :param seed: integer [optional]; if given, the draws are deterministic.
+        :param poolSize: integer; the bytes read from the source at once.
+        '''
+        assert seed is None or isinstance(seed, int)
+        assert isinstance(poolSize, int)
+        assert poolSize > 0
+        self.__poolSize = poolSize
+        self.__local = threading.local()
+        self.__generator = random.Random(seed) if seed is not None else None
+        if self.__generator is None:
+            livePools.add(self)
+
+    def discard(self):
+        '''
+        Drops the buffered bytes (called in forked children, which must not reuse their parent's bytes).
+        :return:
+        '''
+        self.__local = threading.local()
+
+    def isSeeded(self):
+        return self.__generator is not None
+
+    def __read(self, n):
+        if self.__generator is not None:
+            return self.__generator.getrandbits(8 * n).to_bytes(n, 'big')
+        return os.urandom(n)
+
+    def randomBytes(self, n):
+        '''
+        :param n: integer.
+        :return: bytes; n random bytes.
+        '''
+        assert isinstance(n, int)
+        assert n >= 0
+        if n > self.__poolSize:
+            return self.__read(n)
+        local = self.__local
+        buffer = getattr(local, 'buffer', b'')
+        offset = getattr(local, 'offset', 0)
+        if offset + n > len(buffer):
+            buffer = local.buffer = self.__read(self.__poolSize)
+            offset = 0
+        local.offset = offset + n
+        return buffer[offset:offset + n]
+
+    def randomBits(self, k):
+        '''
+        :param k: integer.
+        :return: integer; uniform in [0, 2^(k)).
+        '''
+        assert isinstance(k, int)
+        assert k >= 0
+        n = (k + 7) // 8
+        return int.from_bytes(self.randomBytes(n), 'big') >> (8 * n - k)
+
+    def randomBelow(self, n):
+        '''
+        :param n: positive integer.
+        :return: integer; uniform in [0, n) (less than 2 draws on average).
+        '''
+        assert isinstance(n, int)
+        assert n > 0
+        k = n.bit_length()
+        size = (k + 7) // 8
+        if size > self.__poolSize:
+            x = self.randomBits(k)
+            while x >= n:
+                x = self.randomBits(k)
+            return x
+        shift = 8 * size - k
+        local = self.__local
+        buffer = getattr(local, 'buffer', b'')
+        offset = getattr(local, 'offset', 0)
+        while True:  # Inlined randomBytes: this is the hot path of every encryption.
+            if offset + size > len(buffer):
+                buffer = local.buffer = self.__read(self.__poolSize)
+                offset = 0
+            x = int.from_bytes(buffer[offset:offset + size], 'big') >> shift
+            offset += size
+            if x < n:
+                local.offset = offset
+                return x
+
+    def randomInteger(self, infBound, supBound):
+        '''
+        :param infBound: integer.
+        :param supBound: integer.
+        :return: integer; uniform in [infBound, supBound].
+        '''
+        assert isinstance(infBound, int)
+        assert isinstance(supBound, int)
+        assert infBound <= supBound
+        return infBound + self.randomBelow(supBound - infBound + 1)
+
+    def randomIntegers(self, infBound, supBound, count):
+        '''
+        Draws many integers at once, from a single read of the source when they fit in the pool.
+        :param infBound: integer.
+        :param supBound: integer.
+        :param count: integer.
+        :return: list of count integers, uniform in [infBound, supBound].
+        '''
+        assert isinstance(infBound, int)
+        assert isinstance(supBound, int)
+        assert infBound <= supBound
+        assert isinstance(count, int)
+        n = supBound - infBound + 1
+        k = n.bit_length()
+        size = (k + 7) // 8
+        shift = 8 * size - k
+        res = []
+        while len(res) < count:
+            missing = count - len(res)
+            data = self.randomBytes(min(2 * missing * size, max(self.__poolSize - self.__poolSize % size, size)))
+            for offset in range(0, len(data) - size + 1, size):
+                x = int.from_bytes(data[offset:offset + size], 'big') >> shift
+                if x < n:
+                    res.append(infBound + x)
+                    if len(res) == count:
+                        break
+        return res
+
+    def choice(self, sequence):
+        '''
+        :param sequence: non empty sequence.
+        :return: a uniformly chosen element.
+        '''
+        assert len(sequence) > 0
+        return sequence[self.randomBelow(len(sequence))]
+
+
+livePools = weakref.WeakSet()  # The os.urandom() pools, discarded in forked children.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: [pool.discard() for pool in list(livePools)])
+
+defaultPool = EntropyPool()
+
+
+def getDefault():
+    '''
+    :return: EntropyPool(); the source used by ModularArithmetics when it is not given one.
+    '''
+    return defaultPool
+
+
+def setDefault(pool):
+    '''
+    Replaces the default source, e.g. with EntropyPool(seed=0) for reproducible benchmarks.
+    :param pool: EntropyPool().
+    :return:
+    '''
+    global defaultPool
+    assert isinstance(pool, EntropyPool)
+    defaultPool = pool
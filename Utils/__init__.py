@@ -13,10 +13,25 @@ See the License for the specific language governing permissions and limitations
 '''
 
 # Dependencies:
-import random
+from Utils import Random
+from Utils import Order
+import logging
+import json
+import sys
 
 
 class ModularArithmetics:
+    __random = None  # Random.EntropyPool(); None uses Random.getDefault().
+
+    def __init__(self, randomSource=None):
+        '''
+        :param randomSource: Random.EntropyPool() [optional]; default is the shared Random.getDefault() pool.
+        '''
+        assert randomSource is None or isinstance(randomSource, Random.EntropyPool)
+        self.__random = randomSource
+
+    def getRandomSource(self):
+        return self.__random if self.__random is not None else Random.getDefault()
 
     def changeToPositive(self, x, m):
         '''
@@ -33,7 +48,7 @@ class ModularArithmetics:
 
     def isPrime(self, num):
         '''
-        Verifies if num is prime.
+        Verifies if num is prime (Miller-Rabin, see Order.isProbablePrime).
         :param num: integer.
         :return: boolean.
         '''
@@ -42,10 +57,26 @@ class ModularArithmetics:
         if num < 2:
             return True
         else:
-            for i in range(2, num):
-                if (num % i) == 0:
-                    return False
-            return True
+            return Order.isProbablePrime(num)
+
+    def multiplicativeOrder(self, a, p):
+        '''
+        Computes the order of a (mod p), factoring p - 1 only once for each p.
+        :param a: integer.
+        :param p: integer (a prime number).
+        :return: integer.
+        '''
+        return Order.multiplicativeOrder(a, p)
+
+    def isGenerator(self, a, p):
+        '''
+        Verifies that a is a primitive root (mod p), or at least that it is not in a small subgroup if p - 1 can not be
+        fully factored.
+        :param a: integer.
+        :param p: integer (a prime number).
+        :return: boolean.
+        '''
+        return Order.isGenerator(a, p)
 
     def findPrimitiveRootsOfPrime(self, primeNumber): # Time consuming!!!
         '''
@@ -67,7 +98,17 @@ class ModularArithmetics:
         '''
         assert isinstance(infBound, int)
         assert isinstance(supBound, int)
-        return random.randint(infBound, supBound)
+        return self.getRandomSource().randomInteger(infBound, supBound)
+
+    def randomIntegers(self, infBound, supBound, count):
+        '''
+        Gives count random integers between infBound and supBound, drawn from the entropy pool at once.
+        :param infBound: integer.
+        :param supBound: integer.
+        :param count: integer.
+        :return: list of integers.
+        '''
+        return self.getRandomSource().randomIntegers(infBound, supBound, count)
 
     def randomPrime(self, infBound=1, supBound=10):
         '''
@@ -78,9 +119,10 @@ class ModularArithmetics:
         '''
         assert isinstance(infBound, int)
         assert isinstance(supBound, int)
-        candidatePrime = random.randint(infBound, supBound)
+        source = self.getRandomSource()
+        candidatePrime = source.randomInteger(infBound, supBound)
         while not self.isPrime(candidatePrime):
-            candidatePrime = random.randint(infBound, supBound)
+            candidatePrime = source.randomInteger(infBound, supBound)
         return candidatePrime
 
     def randomPrimeFromFile(self, filePath='primes50.txt'):
@@ -98,7 +140,7 @@ class ModularArithmetics:
             linePrimes = line.split(' ')
             for p in linePrimes:
                 primes.append(p)
-        return int(random.choice(primes))
+        return int(self.getRandomSource().choice(primes))
 
     def randomPrimitiveRoot(self, primeNumber): # Uses a time consuming function to find primitive roots!!!
         '''
@@ -108,7 +150,7 @@ class ModularArithmetics:
         '''
         assert isinstance(primeNumber, int)
         primitiveRoots = self.findPrimitiveRootsOfPrime(primeNumber)
-        return random.choice(primitiveRoots)
+        return self.getRandomSource().choice(primitiveRoots)
 
     def listOfPrimesFromFile(self, filePath='smallPrimes.txt'):
         '''
@@ -163,6 +205,51 @@ class ModularArithmetics:
             a = (a * a) % m
         return res
 
+    def fixedBaseTable(self, a, m, bits, window=4):
+        '''
+        Precomputes a^(j * 2^(window * i)) (mod m), for fixedBasePower.
+        :param a: integer; the fixed base.
+        :param m: integer.
+        :param bits: integer; the maximum bit length of the exponents.
+        :param window: integer; the number of exponent bits consumed by each table row.
+        :return: list of lists of integers.
+        '''
+        assert isinstance(a, int)
+        assert isinstance(m, int)
+        assert isinstance(bits, int)
+        assert isinstance(window, int)
+        table = []
+        rowBase = a % m  # a^(2^(window * i))
+        for _ in range(0, (bits + window - 1) // window):
+            row = [1]
+            for _ in range(1, 1 << window):
+                row.append(row[-1] * rowBase % m)
+            table.append(row)
+            rowBase = row[-1] * rowBase % m
+        return table
+
+    def fixedBasePower(self, table, e, m, window=4):
+        '''
+        Computes a^(e) (mod m) with the table of fixedBaseTable: one multiplication per window of e, no squarings.
+        :param table: list of lists of integers.
+        :param e: non negative integer, shorter than the bits of the table.
+        :param m: integer.
+        :param window: integer; the window of the table.
+        :return: integer.
+        '''
+        assert isinstance(e, int)
+        assert 0 <= e and e.bit_length() <= len(table) * window
+        res = 1
+        mask = (1 << window) - 1
+        i = 0
+        while e > 0:
+            digit = e & mask
+            if digit:
+                res = res * table[i][digit] % m
+            e >>= window
+            i += 1
+        return res
+
 
     def findGCD(self, x, y):
         '''
@@ -211,6 +298,43 @@ class ModularArithmetics:
         else:
             return x % m
 
+class JsonFormatter(logging.Formatter):
+    '''
+    Formats log records as one JSON object per line.
+    '''
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configureLogging(level=logging.INFO, jsonOutput=False, stream=None):
+    '''
+    Routes the diagnostics of ElGamal, IndexCalculusDiscreteLogSolver and Redis to stream.
+    Without this call only warnings and errors are shown, and debug messages are never formatted.
+    :param level: integer; the logging level (e.g. logging.DEBUG).
+    :param jsonOutput: boolean; if True, one JSON object per line is written.
+    :param stream: file-like object [optional]; default is stderr.
+    :return: logging.Handler; the installed handler.
+    '''
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    if jsonOutput:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
+
+
 ##################################TEST############################
 
 
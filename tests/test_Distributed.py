@@ -0,0 +1,110 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import threading
+import time
+import unittest
+import Redis
+from IndexCalculusDiscreteLogSolver import IndexCalculus
+from IndexCalculusDiscreteLogSolver.Distributed import IndexCalculusCoordinator, IndexCalculusWorker
+from Redis.LocalServer import LocalRedisServer
+
+A, B, P = 45, 2930230, 15485863  # The example of the README.
+
+
+class DistributedTest(unittest.TestCase):
+    '''
+    The coordinator and its workers, against the in-process Redis stand-in.
+    '''
+    server = None
+    serialX = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalRedisServer().start()
+        cls.serialX = IndexCalculus(A, B, P).solveDiscreteLog(r=20, maxRounds=200)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def connect(self):
+        channel = Redis.RedisChannel(port=self.server.getPort(), outChannel='IndexCalculus')
+        channel.connect()
+        return channel
+
+    def startWorkers(self, number, jobName):
+        workers = [threading.Thread(target=IndexCalculusWorker(self.connect(), jobName=jobName).run,
+                                    kwargs={'pollInterval': 0.01}, daemon=True) for _ in range(0, number)]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    def solve(self, workers, unitSize, jobName, a=A, b=B):
+        threads = self.startWorkers(workers, jobName)
+        coordinator = IndexCalculusCoordinator(a, b, P, self.connect(), jobName=jobName)
+        x = coordinator.solveDiscreteLog(r=20, maxRounds=200, unitSize=unitSize, stallTimeout=10.0)
+        for thread in threads:
+            thread.join(timeout=10)
+            self.assertFalse(thread.is_alive())
+        return x
+
+    def testSerialResult(self):
+        self.assertEqual(self.serialX, 20)
+        self.assertEqual(pow(A, self.serialX, P), B)
+
+    def testOneWorker(self):
+        x = self.solve(1, 1000, 'OneWorker')
+        self.assertIsInstance(x, int)
+        self.assertEqual(x, self.serialX)
+
+    def testThreeWorkers(self):
+        x = self.solve(3, 200, 'ThreeWorkers')
+        self.assertIsInstance(x, int)
+        self.assertEqual(x, self.serialX)
+
+    def testResultIsChecked(self):
+        a, b = 1520, 15203215
+        x = self.solve(3, 200, 'Checked', a, b)
+        self.assertEqual(x, IndexCalculus(a, b, P).solveDiscreteLog(r=20, maxRounds=200))
+        self.assertEqual(pow(a, x, P), b)
+
+    def testJobNameReused(self):
+        # The workers of the second run start while the "done" of the first one is still set.
+        self.assertEqual(self.solve(2, 500, 'Reused'), self.serialX)
+        self.assertEqual(self.solve(2, 500, 'Reused'), self.serialX)
+
+    def testNoWorker(self):
+        coordinator = IndexCalculusCoordinator(A, B, P, self.connect(), jobName='NoWorker')
+        with self.assertRaises(TimeoutError):
+            coordinator.solveDiscreteLog(r=20, unitSize=500, stallTimeout=0.5)
+
+    def testDeadWorkers(self):
+        coordinator = IndexCalculusCoordinator(A, B, P, self.connect(), jobName='DeadWorkers')
+        channel = self.connect()
+        job = coordinator.getJob()
+
+        def crash():  # Each "worker" claims a unit and dies without acknowledging it; a new one starts after a requeue.
+            while True:
+                if channel.getRedisQueueLength(job.getProcessingQueue()) == 0:
+                    channel.claimFromRedisQueue(job.getUnitsQueue(), job.getProcessingQueue(), count=1)
+                time.sleep(0.01)
+
+        threading.Thread(target=crash, daemon=True).start()
+        with self.assertRaises(TimeoutError):
+            coordinator.solveDiscreteLog(r=20, unitSize=500, stallTimeout=0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import io
+import unittest
+import ElGamal as eg
+from ElGamal import Stream
+
+
+class ZeroBytesTest(unittest.TestCase):
+    '''
+    Zero bytes must round trip and must not show up as zero limbs in the ciphertext.
+    '''
+    encryption = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.encryption = eg.ElGamalEncryption(keyBounds=[2 ** 31, 2 ** 32])
+
+    def assertNoZeroLimb(self, ciphertext):
+        width = ciphertext.getLimbWidth()
+        data = ciphertext.getData()
+        for i in range(0, len(data), width):
+            self.assertNotEqual(data[i:i + width], bytes(width))
+
+    def testBytesRoundTrip(self):
+        publicKey = self.encryption.getKeys().getPublicKey()
+        for data in [b'', b'\x00', b'\x00' * 3, b'\x00' * 1000, b'ab\x00\x00\x00\x00cd', bytes(range(256)) * 4]:
+            ciphertext = self.encryption.encryptBytes(data, publicKey)
+            self.assertNoZeroLimb(ciphertext)
+            self.assertEqual(self.encryption.decryptBytes(ciphertext, len(data)), data)
+
+    def testTextRoundTrip(self):
+        publicKey = self.encryption.getKeys().getPublicKey()
+        text = 'ciao\x00\x00\x00\x00\x00\x00!'
+        ciphertext = self.encryption.encrypt(text, publicKey)
+        self.assertNoZeroLimb(ciphertext)
+        self.assertEqual(self.encryption.decrypt(ciphertext).rstrip(' '), text)
+
+    def testStreamRoundTrip(self):
+        keys = self.encryption.getKeys()
+        data = b'\x00' * 10000 + b'tail'
+        encrypted = io.BytesIO()
+        Stream.encryptStream(io.BytesIO(data), encrypted, keys.getPublicKey(), chunkSize=999)
+        decrypted = io.BytesIO()
+        Stream.decryptStream(io.BytesIO(encrypted.getvalue()), decrypted, keys.getPublicKey(), keys.getPrivateKey())
+        self.assertEqual(decrypted.getvalue(), data)
+
+    def testZeroGroupsDoNotRepeat(self):
+        publicKey = self.encryption.getKeys().getPublicKey()
+        ciphertext = self.encryption.encryptBytes(b'\x00' * 300, publicKey)
+        width = ciphertext.getLimbWidth()
+        data = ciphertext.getData()
+        self.assertGreater(len(set(data[i:i + width] for i in range(0, len(data), width))), 1)
+
+    def testEncodedBlocksInRange(self):
+        p = self.encryption.getKeys().getPublicKey().getP()
+        values = [0, 1, 2 ** 24 - 1] * 100
+        blocks = self.encryption.encodeBlocks(values, p)
+        self.assertTrue(all(0 < block < p for block in blocks))
+        self.assertEqual(self.encryption.decodeBlocks(blocks), values)
+
+    def testZeroBlockRejected(self):
+        with self.assertRaises(AssertionError):
+            self.encryption.encryptBlocks([0], self.encryption.getKeys().getPublicKey())
+
+
+class CiphertextTest(unittest.TestCase):
+    '''
+    Ciphertext behaves like the list [r, tVector], and blockCount gives the length of tVector.
+    '''
+
+    def testListBehaviour(self):
+        ciphertext = eg.Ciphertext(5, [1, 2, 3], 4)
+        r, tVector = ciphertext
+        self.assertEqual(len(ciphertext), len(list(ciphertext)))
+        self.assertEqual((r, tVector), (ciphertext[0], ciphertext[1]))
+        self.assertEqual(tVector, [1, 2, 3])
+        self.assertEqual(ciphertext.blockCount(), 3)
+
+    def testBytesRoundTrip(self):
+        for tVector in [[], [7], list(range(1, 100))]:
+            ciphertext = eg.Ciphertext(5, tVector, 4)
+            self.assertEqual(eg.Ciphertext.fromBytes(ciphertext.toBytes()), ciphertext)
+            self.assertEqual(eg.Ciphertext.fromBytes(ciphertext.toBytes()).blockCount(), len(tVector))
+
+
+class HomomorphismTest(unittest.TestCase):
+    '''
+    Products of ciphertexts of raw group elements decrypt to the blockwise products.
+    '''
+
+    def testMultiplyBlocks(self):
+        encryption = eg.ElGamalEncryption(keyBounds=[2 ** 31, 2 ** 32])
+        publicKey = encryption.getKeys().getPublicKey()
+        p = publicKey.getP()
+        left, right = [2, 3, p - 1], [5, 7, p - 1]
+        relay = eg.ElGamalEncryption(keys=(publicKey, None))
+        product = relay.multiplyCiphertexts(encryption.encryptBlocks(left, publicKey),
+                                            encryption.encryptBlocks(right, publicKey), publicKey)
+        self.assertEqual(encryption.decryptBlocks(product), [10, 21, 1])
+        fresh = relay.rerandomizeBatch([product], publicKey)[0]
+        self.assertNotEqual(fresh, product)
+        self.assertEqual(encryption.decryptBlocks(fresh), [10, 21, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import os
+import random
+import tempfile
+import unittest
+import Redis
+from IndexCalculusDiscreteLogSolver import CongruenceSystem, FileCheckpoint, IndexCalculus, LinearSieve, RedisCheckpoint
+from Redis.LocalServer import LocalRedisServer
+from Utils import Order
+
+# p - 1 = 2^3 * 3 * 11 * q1 * q2, with q1 and q2 primes of 90 bits: beyond the Pollard rho budget.
+UNFACTORED_P = 166027410136462190672849806634400030839864990935798326649
+
+
+class OrderFallbackTest(unittest.TestCase):
+    '''
+    Exponents are reduced modulo p - 1 when the order of a cannot be computed.
+    '''
+
+    def testUnfactoredPMinusOne(self):
+        with self.assertRaises(Exception):
+            Order.multiplicativeOrder(3, UNFACTORED_P)
+        ic = IndexCalculus(3, 5, UNFACTORED_P)
+        self.assertEqual(ic.getOrder(), UNFACTORED_P - 1)
+
+    def testFactoredPMinusOne(self):
+        p = 15485863
+        self.assertEqual(IndexCalculus(45, 2930230, p).getOrder(), Order.multiplicativeOrder(45, p))
+
+
+class CongruenceSystemTest(unittest.TestCase):
+    '''
+    Logarithms are solved modulo each factor of the order, not over the rationals.
+    '''
+
+    def testSolvesModuloComposite(self):
+        moduli = [2, 3, 7 ** 2, 52673]  # 15485863 - 1.
+        n = 15485862
+        generator = random.Random(0)
+        logs = [generator.randrange(0, n) for _ in range(0, 8)]
+        system = CongruenceSystem(len(logs), moduli)
+        while not system.isComplete():
+            row = [generator.randrange(0, 4) for _ in logs]
+            system.addRow(row + [sum(e * log for e, log in zip(row, logs)) % n])
+        self.assertEqual(system.solve(), logs)
+
+    def testUndeterminedLogarithm(self):
+        system = CongruenceSystem(2, [7])
+        self.assertTrue(system.addRow([1, 0, 3]))
+        self.assertFalse(system.addRow([2, 0, 6]))  # Linearly dependent.
+        self.assertFalse(system.isComplete())
+        self.assertEqual(system.solve(), [3, None])
+
+    def testSerialSolver(self):
+        for a, b, p, x in [(7, 343, 15485863, 3), (45, 2930230, 15485863, 20), (1520, 15203215, 15485863, 30)]:
+            result = IndexCalculus(a, b, p).solveDiscreteLog(r=20, maxRounds=200)
+            self.assertIsInstance(result, int)
+            self.assertEqual(result, x)
+
+
+class LinearSieveTest(unittest.TestCase):
+    '''
+    Sieve relations hold modulo p, and solve the problem when used as the relation source.
+    '''
+
+    def testRelationsHold(self):
+        p = 15485863
+        base = IndexCalculus(45, 2930230, p).generateBase(50)
+        sieve = LinearSieve(p, base, 60)
+        extendedBase = [sieve.getH() + c for c in range(0, 60)] + base
+        rows = list(sieve.relations(base))
+        self.assertGreater(len(rows), 0)
+        for row in rows:
+            self.assertEqual(row[-1], 0)
+            left = 1
+            right = 1
+            for q, e in zip(extendedBase, row[0:-1]):
+                if e < 0:
+                    left = left * pow(q, -e, p) % p
+                else:
+                    right = right * pow(q, e, p) % p
+            self.assertEqual(left, right)
+
+    def testSieveSolver(self):
+        for a, b, p, x in [(45, 2930230, 15485863, 20), (1520, 15203215, 15485863, 30)]:
+            serial = IndexCalculus(a, b, p).solveDiscreteLog(r=20, maxRounds=200)
+            result = IndexCalculus(a, b, p).solveDiscreteLog(r=50, maxRounds=200, sieveWidth=60)
+            self.assertIsInstance(result, int)
+            self.assertEqual(result, serial)
+            self.assertEqual(result, x)
+
+
+class CheckpointTest(unittest.TestCase):
+    '''
+    A computation stopped after its relations and base logarithms resumes from the snapshot, on both stores.
+    '''
+    a, b, p, x = 1520, 15203215, 15485863, 30
+
+    def interruptAndResume(self, checkpoint):
+        ic = IndexCalculus(self.a, self.b, self.p)
+        ic.setCheckpoint(checkpoint, interval=0)
+        self.assertIsNone(ic.solveDiscreteLog(r=20, maxRounds=2))  # The descent gives up: the snapshot is kept.
+        state = IndexCalculus.loadCheckpoint(checkpoint)
+        self.assertEqual(state['phase'], 'descent')
+        self.assertEqual((state['a'], state['b'], state['p']), (self.a, self.b, self.p))
+        self.assertEqual(IndexCalculus.resume(checkpoint, maxRounds=200, interval=0), self.x)
+
+    def testFileCheckpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = FileCheckpoint(os.path.join(directory, 'snapshot'))
+            self.interruptAndResume(checkpoint)
+            self.assertEqual(os.listdir(directory), ['snapshot'])  # The temporary file was renamed.
+
+    def testRedisCheckpoint(self):
+        with LocalRedisServer() as server:
+            channel = Redis.RedisChannel(port=server.getPort())
+            channel.connect()
+            self.interruptAndResume(RedisCheckpoint(channel, varName='CheckpointTest'))
+
+
+class SolveManyTest(unittest.TestCase):
+    '''
+    solveMany agrees with the serial solver for every target, duplicates included.
+    '''
+
+    def testTargets(self):
+        a, p = 45, 15485863
+        xs = [20, 1, 12345, 777777, 20]
+        results = IndexCalculus(a, 1, p).solveMany([pow(a, x, p) for x in xs], r=20, maxRounds=5000)
+        self.assertEqual(len(results), 4)
+        for x in xs:
+            self.assertEqual(pow(a, results[pow(a, x, p)], p), pow(a, x, p))
+        serial = IndexCalculus(a, pow(a, 20, p), p).solveDiscreteLog(r=20, maxRounds=200)
+        self.assertEqual(results[pow(a, 20, p)], serial)
+
+    def testNotFound(self):
+        a, p = 45, 15485863
+        b = pow(a, 777777, p)
+        self.assertEqual(IndexCalculus(a, 1, p).solveMany([b], r=20, maxRounds=0), {b: None})
+
+
+if __name__ == '__main__':
+    unittest.main()
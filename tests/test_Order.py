@@ -0,0 +1,91 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import math
+import unittest
+import sympy
+from Utils import Order
+
+# p - 1 = 2^3 * 3 * 11 * q1 * q2, with q1 and q2 primes of 90 bits: beyond the Pollard rho budget.
+UNFACTORED_P = 166027410136462190672849806634400030839864990935798326649
+
+
+class IsProbablePrimeTest(unittest.TestCase):
+    '''
+    Miller-Rabin agrees with an exact test, including on Carmichael numbers and strong pseudoprimes to small bases.
+    '''
+
+    def testSmallNumbers(self):
+        for n in range(-5, 5000):
+            self.assertEqual(Order.isProbablePrime(n), bool(sympy.isprime(n)), n)
+
+    def testPseudoprimes(self):
+        for n in [561, 1105, 1729, 2047, 3215031751, 3825123056546413051, 318665857834031151167461]:
+            self.assertFalse(Order.isProbablePrime(n), n)
+
+    def testBigPrimes(self):
+        for n in [2 ** 61 - 1, 2 ** 89 - 1, 2 ** 127 - 1, 15485863]:
+            self.assertTrue(Order.isProbablePrime(n), n)
+        self.assertFalse(Order.isProbablePrime((2 ** 61 - 1) * (2 ** 89 - 1)))
+
+
+class FactorizeTest(unittest.TestCase):
+    '''
+    p - 1 is split into prime powers, and what Pollard rho cannot split is returned apart.
+    '''
+
+    def testFullyFactored(self):
+        for n in [1, 2, 15485862, 2 ** 20 * 3 ** 5, (2 ** 31 - 1) * (2 ** 61 - 1) * 12]:
+            factors, unfactored = Order.factorize(n)
+            self.assertEqual(unfactored, 1)
+            self.assertEqual(math.prod(q ** e for q, e in factors.items()), n)
+            self.assertTrue(all(sympy.isprime(q) for q in factors.keys()))
+
+    def testUnfactoredPart(self):
+        factors, unfactored = Order.groupOrderFactors(UNFACTORED_P)
+        self.assertEqual(factors, {2: 3, 3: 1, 11: 1})
+        self.assertEqual(math.prod(q ** e for q, e in factors.items()) * unfactored, UNFACTORED_P - 1)
+        self.assertFalse(Order.isProbablePrime(unfactored))
+
+    def testRegisteredFactorization(self):
+        p = Order.generatePrime(256)
+        factors, unfactored = Order.groupOrderFactors(p)
+        self.assertEqual(unfactored, 1)
+        self.assertEqual(math.prod(q ** e for q, e in factors.items()), p - 1)
+        self.assertTrue(sympy.isprime(p))
+
+
+class IsGeneratorTest(unittest.TestCase):
+    '''
+    isGenerator accepts exactly the primitive roots when p - 1 is factored.
+    '''
+
+    def testPrimitiveRoots(self):
+        for p in [23, 1009, 65537]:
+            for a in range(0, 200):
+                expected = a % p != 0 and sympy.n_order(a, p) == p - 1
+                self.assertEqual(Order.isGenerator(a, p), expected, (a, p))
+
+    def testOrder(self):
+        p = 15485863
+        for a in [2, 3, 45, 1520, p - 1]:
+            self.assertEqual(Order.multiplicativeOrder(a, p), sympy.n_order(a, p))
+
+    def testSmallSubgroupWithUnfactoredPart(self):
+        self.assertFalse(Order.isGenerator(UNFACTORED_P - 1, UNFACTORED_P))
+        self.assertFalse(Order.isGenerator(pow(3, 2, UNFACTORED_P), UNFACTORED_P))  # A square is never a generator.
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import os
+import unittest
+from Utils import Random
+
+
+class SeededPoolTest(unittest.TestCase):
+    '''
+    A seed makes every draw reproducible.
+    '''
+
+    def draw(self, pool):
+        return (pool.randomBytes(10), pool.randomBits(77), pool.randomBelow(10 ** 30), pool.randomInteger(-5, 5),
+                pool.randomIntegers(0, 2 ** 40, 100), pool.choice('abcdefgh'), pool.randomBytes(10000))
+
+    def testSameSeed(self):
+        self.assertTrue(Random.EntropyPool(seed=3).isSeeded())
+        self.assertEqual(self.draw(Random.EntropyPool(seed=3)), self.draw(Random.EntropyPool(seed=3)))
+
+    def testPoolSizeDoesNotMatterForBytes(self):
+        first = Random.EntropyPool(seed=3, poolSize=16)
+        second = Random.EntropyPool(seed=3, poolSize=16)
+        self.assertEqual([first.randomBytes(5) for _ in range(0, 20)], [second.randomBytes(5) for _ in range(0, 20)])
+
+    def testDifferentSeeds(self):
+        self.assertNotEqual(self.draw(Random.EntropyPool(seed=3)), self.draw(Random.EntropyPool(seed=4)))
+
+    def testBounds(self):
+        pool = Random.EntropyPool(seed=0, poolSize=64)
+        values = pool.randomIntegers(3, 9, 5000)
+        self.assertEqual(set(values), set(range(3, 10)))
+        self.assertTrue(all(0 <= pool.randomBelow(1000) < 1000 for _ in range(0, 5000)))
+        self.assertTrue(all(pool.randomBits(5) < 32 for _ in range(0, 1000)))
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork()')
+class ForkTest(unittest.TestCase):
+    '''
+    A forked child must not draw the bytes its parent has already buffered.
+    '''
+
+    def testChildDiscardsParentBuffer(self):
+        pool = Random.EntropyPool(poolSize=4096)
+        pool.randomBytes(16)  # Fill the buffer, 4080 bytes are left in it.
+        readEnd, writeEnd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(readEnd)
+                os.write(writeEnd, pool.randomBytes(64))
+            finally:
+                os._exit(0)
+        os.close(writeEnd)
+        childBytes = b''
+        while len(childBytes) < 64:
+            chunk = os.read(readEnd, 64 - len(childBytes))
+            if not chunk:
+                break
+            childBytes += chunk
+        os.close(readEnd)
+        os.waitpid(pid, 0)
+        self.assertEqual(len(childBytes), 64)
+        self.assertNotEqual(childBytes, pool.randomBytes(64))
+
+    def testOnlyUnseededPoolsAreDiscarded(self):
+        self.assertNotIn(Random.EntropyPool(seed=1), Random.livePools)  # Its draws must stay reproducible.
+        self.assertIn(Random.EntropyPool(), Random.livePools)
+
+
+if __name__ == '__main__':
+    unittest.main()
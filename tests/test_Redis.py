@@ -0,0 +1,189 @@
+'''
+Copyright 2019 Agnese Salutari.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and limitations under the License
+'''
+
+# Dependencies
+import socket
+import time
+import unittest
+from unittest import mock
+import redis
+import Redis
+from Redis import LocalServer
+from Redis.LocalServer import LocalRedisServer
+
+
+class ScriptsTest(unittest.TestCase):
+    '''
+    The atomic queue scripts of RedisChannel, against the in-process Redis stand-in (which implements them in Python).
+    '''
+    server = None
+    channel = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalRedisServer().start()
+        cls.channel = Redis.RedisChannel(port=cls.server.getPort(), outChannel='ScriptsTest')
+        cls.channel.connect()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.channel.cleanRedisMemory()
+
+    def fill(self, queueName, items):
+        for item in items:
+            self.channel.addToRedisQueue(queueName, item)
+
+    def testClaim(self):
+        self.fill('queue', ['1', '2', '3', '4', '5'])
+        self.assertEqual(self.channel.claimFromRedisQueue('queue', 'processing', count=2), [b'5', b'4'])
+        self.assertEqual(self.channel.readRedisQueue('queue'), [b'1', b'2', b'3'])
+        self.assertEqual(self.channel.readRedisQueue('processing'), [b'4', b'5'])
+        self.assertEqual(self.channel.claimFromRedisQueue('queue', 'processing', count=10), [b'3', b'2', b'1'])
+        self.assertEqual(self.channel.claimFromRedisQueue('queue', 'processing'), [])
+        self.assertEqual(self.channel.getRedisQueueLength('processing'), 5)
+
+    def testAcknowledge(self):
+        self.fill('queue', ['1', '2', '3'])
+        items = self.channel.claimFromRedisQueue('queue', 'processing', count=2)
+        self.channel.acknowledgeRedisQueueItems('processing', items[0:1])
+        self.assertEqual(self.channel.readRedisQueue('processing'), [b'2'])
+
+    def testBoundedPush(self):
+        self.assertEqual(self.channel.addToBoundedRedisQueue('queue', 'a', maxLength=2), 1)
+        self.assertEqual(self.channel.addToBoundedRedisQueue('queue', 'b', maxLength=2), 2)
+        self.assertEqual(self.channel.addToBoundedRedisQueue('queue', 'c', maxLength=2), 0)
+        self.assertEqual(self.channel.readRedisQueue('queue'), [b'a', b'b'])
+        self.assertEqual(self.channel.addToBoundedRedisQueue('queue', 'c', maxLength=3), 3)
+
+    def testRequeue(self):
+        self.fill('queue', [str(i) for i in range(0, 7)])
+        self.channel.claimFromRedisQueue('queue', 'processing', count=5)
+        self.assertEqual(self.channel.requeueRedisQueue('processing', 'queue', batchSize=2), 5)
+        self.assertEqual(self.channel.getRedisQueueLength('processing'), 0)
+        self.assertEqual(sorted(self.channel.readRedisQueue('queue')), [str(i).encode('utf-8') for i in range(0, 7)])
+        self.assertEqual(self.channel.requeueRedisQueue('processing', 'queue'), 0)
+
+    def receive(self, subscriber, timeout=1.0):
+        messages = []
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            message = subscriber.get_message(timeout=0.05)
+            if message is not None:
+                messages.append(message['data'])
+        return messages
+
+    def testPublishIfAbsent(self):
+        subscriber = self.channel.getRedisDirectly().pubsub(ignore_subscribe_messages=True)
+        subscriber.subscribe('ScriptsTest')
+        try:
+            self.assertTrue(self.channel.publishRedisVariable('done', 'first'))
+            self.assertFalse(self.channel.publishRedisVariable('done', 'second'))
+            self.assertEqual(self.channel.getRedisVariable('done'), b'first')
+            self.assertEqual(self.receive(subscriber), [b'first'])
+        finally:
+            subscriber.close()
+
+    def testScriptsReloaded(self):
+        self.channel.getRedisDirectly().script_flush()
+        self.fill('queue', ['1'])
+        self.assertEqual(self.channel.claimFromRedisQueue('queue', 'processing'), [b'1'])
+
+
+class LocalServerTest(unittest.TestCase):
+    '''
+    The stand-in itself: subscribers that do not read, and SCAN while the keyspace changes.
+    '''
+    server = None
+    channel = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalRedisServer().start()
+        cls.channel = Redis.RedisChannel(port=cls.server.getPort(), outChannel='LocalServerTest')
+        cls.channel.connect()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.channel.cleanRedisMemory()
+
+    def silentSubscriber(self):
+        '''
+        :return: socket.socket(); subscribed to LocalServerTest, and never read after the confirmation.
+        '''
+        subscriber = socket.socket()
+        subscriber.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        subscriber.connect((self.server.getHost(), self.server.getPort()))
+        subscriber.sendall(b'*2\r\n$9\r\nSUBSCRIBE\r\n$15\r\nLocalServerTest\r\n')
+        subscriber.recv(1024)
+        return subscriber
+
+    def testSilentSubscriberDoesNotBlockPublish(self):
+        subscriber = self.silentSubscriber()
+        publisher = redis.Redis(port=self.server.getPort(), socket_timeout=5, retry=None)  # A blocked PUBLISH fails.
+        try:
+            message = b'x' * 65536
+            start = time.monotonic()
+            for _ in range(0, 200):  # About 13 MB: far beyond the socket buffers.
+                self.assertEqual(publisher.publish('LocalServerTest', message), 1)
+            self.assertLess(time.monotonic() - start, 10)
+            self.assertEqual(self.channel.getRedisDirectly().ping(), True)  # The other connections are served too.
+        finally:
+            publisher.close()
+            subscriber.close()
+
+    def testSilentSubscriberIsDropped(self):
+        with mock.patch.object(LocalServer, 'SUBSCRIBER_OUTPUT_LIMIT', 1024 * 1024):
+            subscriber = self.silentSubscriber()
+            try:
+                publisher = self.channel.getRedisDirectly()
+                receivers = [publisher.publish('LocalServerTest', b'x' * 65536) for _ in range(0, 100)]
+                deadline = time.monotonic() + 5
+                while publisher.publish('LocalServerTest', b'x') and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(publisher.publish('LocalServerTest', b'x'), 0)
+                self.assertEqual(receivers[0], 1)
+            finally:
+                subscriber.close()
+
+    def testScanWhileKeysChange(self):
+        names = ['key:%03d' % i for i in range(0, 100)]
+        for name in names:
+            self.channel.setRedisVariable(name, 1)
+        client = self.channel.getRedisDirectly()
+        seen = set()
+        cursor, page = client.scan(cursor=0, count=10)
+        seen.update(page)
+        while int(cursor) != 0:
+            for name in list(seen)[0:3]:  # Deleting returned keys must not make SCAN skip the others.
+                client.delete(name)
+            client.set('key:%03d:new' % len(seen), 1)
+            cursor, page = client.scan(cursor=cursor, count=10)
+            seen.update(page)
+        self.assertTrue(set(name.encode('utf-8') for name in names) <= seen)
+
+    def testScanRedisKeys(self):
+        names = ['scan:%d' % i for i in range(0, 50)] + ['other']
+        for name in names:
+            self.channel.setRedisVariable(name, 1)
+        keys = [name for batch in self.channel.scanRedisKeys(pattern='scan:*', count=7) for name in batch]
+        self.assertEqual(sorted(keys), sorted(names[0:-1]))
+
+
+if __name__ == '__main__':
+    unittest.main()